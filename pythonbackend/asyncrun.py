@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import asyncio
+
+import httpx
+
+import run
+
+from run import log
+from run import unexpected_error
+from run import make_cache_key
+from run import RateLimitExceeded
+
+from errors import BackendError
+from errors import InvalidInput
+from errors import UpstreamError
+from errors import UpstreamTimeout
+
+from singleflight import AsyncSingleFlight
+from jsoncodec import ResponseFragment
+
+# The asynchronous application is an alternative to the threaded Flask `run.APP`, where each request
+# waiting for Github is a coroutine instead of a blocked thread. It shares with the Flask application
+# the endpoints queries, validation and results formatting, and the results cache.
+# https://asgi.readthedocs.io/en/latest/specs/www.html
+
+ASYNC_SINGLE_FLIGHT = AsyncSingleFlight()
+
+
+def create_async_client():
+    """
+        The same timeouts and retries used by `run.CONNECTION_POOL`, but with a larger pool, as the
+        connections are not bound to threads anymore.
+    """
+    poolsize = int( os.environ.get( 'GITHUB_RESEARCHER_ASYNC_POOL_SIZE', 100 ) )
+
+    # https://www.python-httpx.org/advanced/resource-limits/
+    # https://www.python-httpx.org/advanced/transports/#http-transport
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(
+            float( os.environ.get( 'GITHUB_RESEARCHER_READ_TIMEOUT', 30 ) ),
+            connect=float( os.environ.get( 'GITHUB_RESEARCHER_CONNECT_TIMEOUT', 5 ) ),
+        ),
+        limits=httpx.Limits( max_connections=poolsize, max_keepalive_connections=poolsize ),
+        transport=httpx.AsyncHTTPTransport( retries=int( os.environ.get( 'GITHUB_RESEARCHER_RETRIES', 3 ) ) ),
+    )
+
+
+async def run_graphql_query(client, graphqlquery, queryvariables={}, priority=run.INTERACTIVE_PRIORITY):
+    """
+        Only the `run.SCHEDULER` rate limit reserves are applied, as the concurrent calls are
+        bounded by the client connections limit. As with `run.post_with_token`, the token is only
+        chosen after waiting for the rate limit reset.
+    """
+    run.CIRCUIT_BREAKER.check()
+
+    for attempt in range( len( run.TOKEN_POOL.tokens ) ):
+        delay = run.SCHEDULER.admit( priority )
+
+        if delay > 0:
+            await asyncio.sleep( delay )
+
+        # Reading and publishing the shared budgets blocks on the shared cache socket
+        shared = run.TOKEN_POOL.sharedbudgets is not None
+
+        if shared:
+            token = await asyncio.get_running_loop().run_in_executor( None, run.TOKEN_POOL.choose )
+
+        else:
+            token = run.TOKEN_POOL.choose()
+
+        payload = run.QUERY_REGISTRY.payload( graphqlquery, queryvariables )
+        request = await post_graphql_query( client, graphqlquery, payload, token.headers )
+
+        if run.QUERY_REGISTRY.needs_document( graphqlquery, payload, request ):
+            payload = run.QUERY_REGISTRY.payload( graphqlquery, queryvariables, withdocument=True )
+            request = await post_graphql_query( client, graphqlquery, payload, token.headers )
+
+        try:
+            if shared:
+                return await asyncio.get_running_loop().run_in_executor(
+                        None, run.check_graphql_response, request, graphqlquery, queryvariables, token.budget )
+
+            return run.check_graphql_response( request, graphqlquery, queryvariables, token.budget )
+
+        except RateLimitExceeded:
+            if attempt + 1 == len( run.TOKEN_POOL.tokens ):
+                raise
+
+
+async def post_graphql_query(client, graphqlquery, payload, headers):
+    """ The same as `run.post_graphql_query`, for the `httpx` exceptions. """
+    queryname = getattr( graphqlquery, "name", "unknown" )
+
+    try:
+        request = await client.post( run.graphql_url, json=payload, headers=headers )
+
+    except httpx.TimeoutException:
+        run.CIRCUIT_BREAKER.record_failure()
+        raise UpstreamTimeout( f"Github did not answer the {queryname} query in time!" ) from None
+
+    except httpx.TransportError as error:
+        run.CIRCUIT_BREAKER.record_failure()
+        raise UpstreamError( f"Could not connect to Github: {type( error ).__name__}!" ) from None
+
+    run.record_upstream_status( request.status_code )
+    return request
+
+
+async def run_cached_graphql_query(client, endpoint, graphqlquery, queryvariables={}):
+    """
+        The same as `run.run_cached_graphql_query`, but awaiting for Github instead of blocking.
+        The cache and the repository store may block on their disk or sockets, then, they are used
+        from the event loop default executor threads.
+    """
+    loop = asyncio.get_running_loop()
+    ttl = run.CACHE_TTLS.get( endpoint, 0 )
+    cachekey = make_cache_key( graphqlquery, queryvariables )
+
+    if ttl > 0:
+        cached = await loop.run_in_executor( None, run.get_cached_results, endpoint, cachekey, graphqlquery, queryvariables )
+
+        if cached is not None:
+            encodedresults, cacheage = cached
+            return ResponseFragment.from_bytes( run.JSON_CODEC, encodedresults ), cacheage
+
+    # The stale stored results are refreshed by the `run.STORE_EXECUTOR` threads
+    if endpoint == "detail_repository":
+        stored = await loop.run_in_executor( None, run.get_stored_repository, queryvariables )
+
+        if stored is not None:
+            run.count_results( endpoint, "store" )
+            return stored
+
+    async def fetch_graphql_query():
+        graphqlresults = await run_graphql_query(
+                client, graphqlquery, queryvariables, priority=run.ENDPOINT_PRIORITIES[endpoint] )
+        encodedresults = run.encode_graphql_results( endpoint, graphqlresults )
+        await loop.run_in_executor( None, save_graphql_results, endpoint, cachekey, queryvariables, graphqlresults, encodedresults )
+        return encodedresults
+
+    encodedresults = await ASYNC_SINGLE_FLIGHT.do( cachekey, fetch_graphql_query )
+    return ResponseFragment.from_bytes( run.JSON_CODEC, encodedresults ), None
+
+
+def save_graphql_results(endpoint, cachekey, queryvariables, graphqlresults, encodedresults):
+    run.set_cached_results( endpoint, cachekey, encodedresults )
+    run.save_fetched_repositories( endpoint, queryvariables, graphqlresults )
+
+
+class AsgiApplication(object):
+    """ Serves the same `run.ENDPOINTS` routes as the Flask application, plus `/stats`. """
+
+    def __init__(self):
+        self.client = None
+
+    async def __call__(self, scope, receive, send):
+
+        if scope["type"] == "lifespan":
+            await self.lifespan( receive, send )
+
+        elif scope["type"] == "http":
+            await self.respond( send, *await self.route( scope, receive ) )
+
+    async def lifespan(self, receive, send):
+        """ https://asgi.readthedocs.io/en/latest/specs/lifespan.html """
+
+        while True:
+            message = await receive()
+
+            if message["type"] == "lifespan.startup":
+                self.client = create_async_client()
+                await send( { "type": "lifespan.startup.complete" } )
+
+            elif message["type"] == "lifespan.shutdown":
+                if self.client is not None:
+                    await self.client.aclose()
+
+                await send( { "type": "lifespan.shutdown.complete" } )
+                return
+
+    async def route(self, scope, receive):
+        endpoint = scope["path"].strip( "/" )
+        method = scope["method"]
+
+        # The same as `flask_cors.CORS( APP )` preflight responses
+        if method == "OPTIONS":
+            return 200, b"", "text/html"
+
+        if endpoint == "health" and method == "GET":
+            return 200, b'{"status": "ok"}', "application/json"
+
+        if endpoint == "ready" and method == "GET":
+            status, results = run.readiness()
+            return status, run.JSON_CODEC.dumps( results ), "application/json"
+
+        if endpoint == "stats" and method == "GET":
+            results = run.collect_stats()
+            results["singleFlight"] = ASYNC_SINGLE_FLIGHT.stats()
+            return 200, run.JSON_CODEC.dumps( results ), "application/json"
+
+        if endpoint not in run.ENDPOINTS:
+            return 404, b"<h1>Not Found</h1><p>The requested URL was not found on the server.</p>", "text/html"
+
+        if method != "POST":
+            return 405, b"<h1>Method Not Allowed</h1>", "text/html"
+
+        return await self.run_endpoint( endpoint, await self.read_body( receive ) )
+
+    async def run_endpoint(self, endpoint, body):
+
+        try:
+            try:
+                search_data = run.JSON_CODEC.loads( body )
+
+            except ValueError:
+                search_data = None
+
+            # The same as `run.get_search_data`
+            if not isinstance( search_data, dict ):
+                raise InvalidInput( "Invalid JSON on your post query!" )
+
+            log( 4, f"search_data {search_data}" )
+
+            graphqlquery, parse_request, format_results = run.ENDPOINTS[endpoint]
+            queryvariables = parse_request( search_data )
+
+            if self.client is None:
+                self.client = create_async_client()
+
+            fragment, cacheage = await run_cached_graphql_query( self.client, endpoint, graphqlquery, queryvariables )
+
+        except BackendError as error:
+            return self.error_response( error )
+
+        except Exception:
+            return self.error_response( unexpected_error( endpoint ) )
+
+        return 200, fragment.body( run.formatratelimit( fragment.ratelimitdata, cacheage ) ), "application/json"
+
+    def error_response(self, error):
+        """ The same as `run.error_response`, with its `Retry-After` header. """
+        headers = []
+
+        if error.retryafter is not None:
+            headers.append( ( b"retry-after", str( int( error.retryafter ) + 1 ).encode( "UTF-8" ) ) )
+
+        return error.status, run.JSON_CODEC.dumps( error.body() ), "application/json", headers
+
+    async def read_body(self, receive):
+        body = []
+
+        while True:
+            message = await receive()
+            body.append( message.get( "body", b"" ) )
+
+            if not message.get( "more_body", False ):
+                return b"".join( body )
+
+    async def respond(self, send, status, body, mimetype, headers=()):
+        await send( {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                ( b"content-type", f"{mimetype}; charset=utf-8".encode( "UTF-8" ) ),
+                ( b"content-length", str( len( body ) ).encode( "UTF-8" ) ),
+                ( b"access-control-allow-origin", b"*" ),
+                ( b"access-control-allow-headers", b"*" ),
+                ( b"access-control-allow-methods", b"GET, POST, OPTIONS" ),
+                *headers,
+            ],
+        } )
+        await send( { "type": "http.response.body", "body": body } )
+
+
+ASGI_APP = AsgiApplication()
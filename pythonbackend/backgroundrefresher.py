@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import threading
+import concurrent.futures
+
+
+class BackgroundRefresher(object):
+    """
+        Runs on background the Github calls which no request is waiting for, as the `Prefetcher`
+        and the `Revalidator` do, where each key is fetched by a single thread at a time.
+
+        Nothing is fetched while the `budget` has less than `minremaining` points left, or while
+        there are already `maxpending` keys waiting to be fetched, so the background calls do not
+        starve the real requests. With `requiresbudget`, nothing is fetched either while the
+        `budget` is not known yet.
+
+        With a `claim( key )` callable, as a lock shared by the worker processes, a key is only
+        fetched when it was claimed, so the workers sharing a cache do not fetch it together.
+    """
+    requiresbudget = False
+
+    def __init__(self, budget, workers=2, minremaining=100, maxpending=32, claim=None, name="background"):
+        self.budget = budget
+        self.minremaining = minremaining
+        self.maxpending = maxpending
+        self.claim = claim
+
+        self.executor = concurrent.futures.ThreadPoolExecutor( max_workers=workers, thread_name_prefix=name )
+
+        self.lock = threading.Lock()
+        self.pending = set()
+
+        self.scheduled = 0
+        self.collapsed = 0
+        self.skipped = 0
+        self.claimed = 0
+        self.failed = 0
+
+    def schedule(self, key, function, *args, **kwargs):
+        """ Calls `function` on background, unless `key` is already being fetched. """
+        remaining = self.budget.remaining_budget()
+
+        with self.lock:
+            if key in self.pending:
+                self.collapsed += 1
+                return
+
+            if remaining is None and self.requiresbudget \
+                    or remaining is not None and remaining < self.minremaining or len( self.pending ) >= self.maxpending:
+                self.skipped += 1
+                return
+
+            self.pending.add( key )
+
+        if self.claim is not None and not self.claim( key ):
+            with self.lock:
+                self.pending.discard( key )
+                self.claimed += 1
+                return
+
+        with self.lock:
+            self.scheduled += 1
+
+        try:
+            self.executor.submit( self._run, key, function, *args, **kwargs )
+
+        except RuntimeError:
+            # The executor was shut down while the worker is stopping
+            with self.lock:
+                self.pending.discard( key )
+
+    def _run(self, key, function, *args, **kwargs):
+        try:
+            function( *args, **kwargs )
+
+        except Exception:
+            with self.lock:
+                self.failed += 1
+
+        finally:
+            with self.lock:
+                self.pending.discard( key )
+
+    def stats(self):
+        with self.lock:
+            return {
+                "pending": len( self.pending ),
+                "scheduled": self.scheduled,
+                "collapsed": self.collapsed,
+                "skipped": self.skipped,
+                "claimed": self.claimed,
+                "failed": self.failed,
+            }
+
+    def shutdown(self):
+        self.executor.shutdown( wait=False )
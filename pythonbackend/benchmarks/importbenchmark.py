@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+    Measures how long a new process takes to import the backend modules, and the modules which
+    take the most time to import, as reported by `python -X importtime`. With `--startup`, also
+    measures how long the production server takes to answer `/health` and `/ready`, against the
+    `tests/fakegithub.py` stand-in.
+
+    python3 benchmarks/importbenchmark.py --output benchmarks/importtime.json
+    python3 benchmarks/importbenchmark.py --compare benchmarks/importtime.json --startup
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+import requests
+
+from loadbenchmark import PYTHONBACKEND_DIRECTORY
+from loadbenchmark import free_port
+from loadbenchmark import stop_processes
+from loadbenchmark import git_revision
+
+MODULES = ( "run", "asyncrun" )
+
+
+def import_times(module):
+    """ Returns the total import microseconds and each top level module cumulative microseconds. """
+    process = subprocess.run( [ sys.executable, "-X", "importtime", "-c", f"import {module}" ],
+            cwd=PYTHONBACKEND_DIRECTORY, capture_output=True, text=True, check=True )
+
+    total = None
+    modules = {}
+
+    for line in process.stderr.splitlines():
+        if not line.startswith( "import time:" ) or "cumulative" in line:
+            continue
+
+        selftime, cumulative, name = line[len( "import time:" ):].split( "|" )
+        depth = len( name ) - len( name.lstrip() )
+
+        # The modules imported by `module` are indented by their import depth, and the ones not
+        # indented were imported by the interpreter startup
+        if depth == 1 and name.strip() == module:
+            total = int( cumulative )
+
+        elif depth == 3:
+            modules[name.strip()] = int( cumulative )
+
+    return total, modules
+
+
+def startup_times():
+    """ Seconds until the production server answers `/health`, and then, `/ready`. """
+    githubport = free_port()
+    backendport = free_port()
+
+    fakegithub = subprocess.Popen( [ sys.executable, os.path.join( PYTHONBACKEND_DIRECTORY, "tests", "fakegithub.py" ),
+            "--port", str( githubport ) ], stdout=subprocess.DEVNULL )
+
+    environment = dict( os.environ )
+    environment.update( {
+        "GITHUB_RESEARCHER_GRAPHQL_URL": f"http://localhost:{githubport}/graphql",
+        "REACT_APP_GITHUB_RESEARCHER_BACKEND_PORT": str( backendport ),
+        "REACT_APP_GITHUB_RESEARCHER_TOKEN": "benchmark",
+        "GITHUB_RESEARCHER_SERVER": "production",
+        "GITHUB_RESEARCHER_WORKERS": "1",
+    } )
+
+    time.sleep( 0.5 )
+    start = time.perf_counter()
+    backend = subprocess.Popen( [ sys.executable, os.path.join( PYTHONBACKEND_DIRECTORY, "productionserver.py" ) ],
+            env=environment, cwd=PYTHONBACKEND_DIRECTORY, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL )
+
+    results = {}
+    try:
+        for endpoint in ( "health", "ready" ):
+            while endpoint not in results:
+                if backend.poll() is not None or time.perf_counter() - start > 60:
+                    raise RuntimeError( f"The backend did not answer /{endpoint}!" )
+
+                try:
+                    if requests.get( f"http://localhost:{backendport}/{endpoint}", timeout=1 ).status_code == 200:
+                        results[endpoint] = round( time.perf_counter() - start, 3 )
+                        continue
+
+                except requests.ConnectionError:
+                    pass
+
+                time.sleep( 0.01 )
+
+    finally:
+        stop_processes( [ backend, fakegithub ] )
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter )
+    parser.add_argument( "--repeat", type=int, default=10, help="new processes by module, where the median is reported" )
+    parser.add_argument( "--top", type=int, default=8, help="how many of the slowest imported modules to report" )
+    parser.add_argument( "--startup", action="store_true", help="also measure the time to answer /health and /ready" )
+    parser.add_argument( "--output", help="where to save the results as JSON" )
+    parser.add_argument( "--compare", help="a previous results JSON file to compare against" )
+    arguments = parser.parse_args()
+
+    results = { "revision": git_revision(), "python": sys.version.split()[0], "modules": {} }
+
+    for module in MODULES:
+        totals = []
+
+        for index in range( arguments.repeat ):
+            total, modules = import_times( module )
+            totals.append( total )
+
+        slowest = sorted( modules.items(), key=lambda item: item[1], reverse=True )[:arguments.top]
+        results["modules"][module] = { "milliseconds": round( statistics.median( totals ) / 1000, 1 ),
+                "slowest": { name: round( microseconds / 1000, 1 ) for name, microseconds in slowest } }
+
+        print( f"{module:>9}: {results['modules'][module]['milliseconds']:6.1f} ms, slowest imports: " +
+                ", ".join( f"{name} {milliseconds} ms" for name, milliseconds in results["modules"][module]["slowest"].items() ) )
+
+    if arguments.startup:
+        results["startup"] = startup_times()
+        print( f"  startup: /health after {results['startup']['health']} seconds, /ready after {results['startup']['ready']} seconds" )
+
+    if arguments.output:
+        with open( arguments.output, "w" ) as outputfile:
+            json.dump( results, outputfile, indent=2, sort_keys=True )
+            outputfile.write( "\n" )
+
+    if arguments.compare:
+        with open( arguments.compare ) as baselinefile:
+            baseline = json.load( baselinefile )
+
+        for module, current in results["modules"].items():
+            previous = baseline["modules"].get( module )
+
+            if previous:
+                print( f"{module:>9}: {current['milliseconds'] - previous['milliseconds']:+6.1f} ms "
+                        f"({( current['milliseconds'] / previous['milliseconds'] - 1 ) * 100:+.1f}%)" )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+    Drives the `/search_github`, `/list_repositories` and `/detail_repository` endpoints at several
+    concurrency levels, against the `tests/fakegithub.py` stand-in, without the Github API, and
+    reports the requests per second and the p50/p95/p99 latencies, saved as a JSON baseline file.
+
+    python3 benchmarks/loadbenchmark.py --output benchmarks/baseline.json
+    python3 benchmarks/loadbenchmark.py --compare benchmarks/baseline.json
+
+    The backend and the fake Github run on their own processes, started with the current
+    `GITHUB_RESEARCHER_*` environment variables, unless `--backend` gives an already running backend.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import argparse
+import threading
+import subprocess
+import concurrent.futures
+
+import requests
+
+PYTHONBACKEND_DIRECTORY = os.path.dirname( os.path.dirname( os.path.realpath( __file__ ) ) )
+
+ENDPOINTS = ( "search_github", "list_repositories", "detail_repository" )
+
+
+def request_data(endpoint, index):
+    """ The `index`th of the request bodies cycled by each endpoint. """
+    if endpoint == "search_github":
+        return { "searchQuery": f"benchmark{index}", "itemsPerPage": 10 }
+
+    if endpoint == "list_repositories":
+        return { "repositoryUser": f"user{index}", "itemsPerPage": 10 }
+
+    return { "repositoryUser": f"user{index}", "repositoryName": f"repository{index}" }
+
+
+def percentile(sortedvalues, percent):
+    """ The nearest rank percentile. """
+    index = max( int( round( percent / 100 * len( sortedvalues ) + 0.5 ) ) - 1, 0 )
+    return sortedvalues[min( index, len( sortedvalues ) - 1 )]
+
+
+def run_load(backend, endpoint, concurrency, requestscount, variants):
+    """ Sends `requestscount` requests from `concurrency` threads, each one with its own connection. """
+    sessions = threading.local()
+    latencies = []
+    errors = []
+
+    def send(index):
+        if not hasattr( sessions, "session" ):
+            sessions.session = requests.Session()
+
+        start = time.perf_counter()
+        response = sessions.session.post( f"{backend}/{endpoint}", json=request_data( endpoint, index % variants ) )
+        latency = time.perf_counter() - start
+
+        if response.status_code == 200:
+            latencies.append( latency )
+
+        else:
+            errors.append( response.status_code )
+
+    start = time.perf_counter()
+
+    with concurrent.futures.ThreadPoolExecutor( max_workers=concurrency ) as executor:
+        for future in [ executor.submit( send, index ) for index in range( requestscount ) ]:
+            future.result()
+
+    seconds = time.perf_counter() - start
+    latencies.sort()
+
+    return {
+        "requests": requestscount,
+        "errors": len( errors ),
+        "requestsPerSecond": round( len( latencies ) / seconds, 1 ),
+        "p50": round( percentile( latencies, 50 ) * 1000, 2 ) if latencies else None,
+        "p95": round( percentile( latencies, 95 ) * 1000, 2 ) if latencies else None,
+        "p99": round( percentile( latencies, 99 ) * 1000, 2 ) if latencies else None,
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind( ( "localhost", 0 ) )
+        return sock.getsockname()[1]
+
+
+def wait_for(url, process, timeout=30):
+    deadline = time.time() + timeout
+
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError( f"The process {process.args} exited with {process.returncode}!" )
+
+        try:
+            requests.get( url, timeout=1 )
+            return
+
+        except requests.ConnectionError:
+            time.sleep( 0.1 )
+
+    raise RuntimeError( f"Could not connect to {url} after {timeout} seconds!" )
+
+
+def start_processes(arguments):
+    """ Returns the backend url and the started processes. """
+    githubport = free_port()
+    backendport = free_port()
+
+    fakegithub = subprocess.Popen( [ sys.executable, os.path.join( PYTHONBACKEND_DIRECTORY, "tests", "fakegithub.py" ),
+            "--port", str( githubport ), "--latency", str( arguments.latency ), "--jitter", str( arguments.jitter ),
+            "--ratelimit", str( 10 ** 9 ) ], stdout=subprocess.DEVNULL )
+
+    environment = dict( os.environ )
+    environment.update( {
+        "GITHUB_RESEARCHER_GRAPHQL_URL": f"http://localhost:{githubport}/graphql",
+        "REACT_APP_GITHUB_RESEARCHER_BACKEND_PORT": str( backendport ),
+        "REACT_APP_GITHUB_RESEARCHER_TOKEN": environment.get( "REACT_APP_GITHUB_RESEARCHER_TOKEN", "benchmark" ),
+        "GITHUB_RESEARCHER_SERVER": environment.get( "GITHUB_RESEARCHER_SERVER", "production" ),
+        "GITHUB_RESEARCHER_STARTUP_PROBE": "disabled",
+    } )
+
+    script = "productionserver.py" if environment["GITHUB_RESEARCHER_SERVER"] == "production" else "run.py"
+    backend = subprocess.Popen( [ sys.executable, os.path.join( PYTHONBACKEND_DIRECTORY, script ) ],
+            env=environment, cwd=PYTHONBACKEND_DIRECTORY, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL )
+
+    processes = [ fakegithub, backend ]
+    try:
+        wait_for( f"http://localhost:{githubport}/graphql", fakegithub )
+        wait_for( f"http://localhost:{backendport}/stats", backend )
+
+    except Exception:
+        stop_processes( processes )
+        raise
+
+    return f"http://localhost:{backendport}", processes
+
+
+def stop_processes(processes):
+    for process in processes:
+        process.terminate()
+
+    for process in processes:
+        try:
+            process.wait( timeout=30 )
+
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def git_revision():
+    try:
+        return subprocess.check_output( [ "git", "rev-parse", "--short", "HEAD" ],
+                cwd=PYTHONBACKEND_DIRECTORY, stderr=subprocess.DEVNULL ).decode( "UTF-8" ).strip()
+
+    except ( OSError, subprocess.CalledProcessError ):
+        return None
+
+
+def compare(baseline, results):
+    """ Prints the change of the requests per second and of the p95 latency against the `baseline`. """
+    for key, current in results["results"].items():
+        previous = baseline["results"].get( key )
+
+        if previous is None or not previous["requestsPerSecond"] or not previous["p95"] or not current["p95"]:
+            continue
+
+        rps = ( current["requestsPerSecond"] / previous["requestsPerSecond"] - 1 ) * 100
+        p95 = ( current["p95"] / previous["p95"] - 1 ) * 100
+        print( f"{key:>24}: {rps:+7.1f}% requests per second, {p95:+7.1f}% p95 latency" )
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter )
+    parser.add_argument( "--backend", help="an already running backend url, instead of starting one" )
+    parser.add_argument( "--endpoints", nargs="+", default=list( ENDPOINTS ), choices=ENDPOINTS )
+    parser.add_argument( "--concurrency", nargs="+", type=int, default=[ 1, 8, 32 ] )
+    parser.add_argument( "--requests", type=int, default=500, help="requests by endpoint and concurrency level" )
+    parser.add_argument( "--variants", type=int, default=50,
+            help="distinct request bodies by endpoint, where the repeated ones may come from the backend cache" )
+    parser.add_argument( "--latency", type=float, default=0.05, help="the fake Github latency in seconds" )
+    parser.add_argument( "--jitter", type=float, default=0.02, help="the fake Github random extra latency in seconds" )
+    parser.add_argument( "--output", help="where to save the results as JSON" )
+    parser.add_argument( "--compare", help="a previous results JSON file to compare against" )
+    arguments = parser.parse_args()
+
+    if arguments.backend:
+        backend, processes = arguments.backend, []
+
+    else:
+        backend, processes = start_processes( arguments )
+
+    results = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "requests": arguments.requests,
+            "variants": arguments.variants,
+            "latency": arguments.latency,
+            "jitter": arguments.jitter,
+            "environment": { name: value for name, value in os.environ.items()
+                    if name.startswith( "GITHUB_RESEARCHER_" ) and "TOKEN" not in name },
+        },
+        "results": {},
+    }
+
+    try:
+        for endpoint in arguments.endpoints:
+            for concurrency in arguments.concurrency:
+                result = run_load( backend, endpoint, concurrency, arguments.requests, arguments.variants )
+                results["results"][f"{endpoint}/{concurrency}"] = result
+
+                print( f"{endpoint:>17} x{concurrency:<3}: {result['requestsPerSecond']:8.1f} requests per second, "
+                        f"p50 {result['p50']} ms, p95 {result['p95']} ms, p99 {result['p99']} ms, {result['errors']} errors" )
+
+    finally:
+        stop_processes( processes )
+
+    if arguments.output:
+        with open( arguments.output, "w" ) as outputfile:
+            json.dump( results, outputfile, indent=2, sort_keys=True )
+            outputfile.write( "\n" )
+
+    if arguments.compare:
+        with open( arguments.compare ) as baselinefile:
+            compare( json.load( baselinefile ), results )
+
+
+if __name__ == "__main__":
+    main()
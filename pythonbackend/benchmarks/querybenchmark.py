@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+    Compares building, hashing and sending the GraphQL queries as plain strings on every request,
+    against the `QUERY_REGISTRY` queries built once at import time.
+
+    python3 benchmarks/querybenchmark.py
+"""
+
+import os
+import sys
+import json
+import timeit
+
+sys.path.append( os.path.dirname( os.path.dirname( os.path.realpath( __file__ ) ) ) )
+
+from debug_tools.utilities import wrap_text
+from graphqlqueries import QueryRegistry
+from responsecache import make_cache_key
+
+import run
+
+REPEAT = 20000
+QUERY_VARIABLES = { "query": "stars:>1", "items": 3, "lastItem": None }
+
+search_github_document = """
+    query SearchRepositories($query: String!, $items: Int!, $lastItem: String) {
+      search(first: $items, query: $query, type: REPOSITORY, after: $lastItem) {
+        pageInfo {
+          hasNextPage
+          endCursor
+        }
+        repositoryCount
+        nodes {
+          ... on Repository {
+            nameWithOwner
+            description
+            stargazers {
+              totalCount
+            }
+          }
+        }
+      }
+      %s
+    }
+"""
+
+
+def build_per_request():
+    graphqlquery = wrap_text( search_github_document ) % run.github_ratelimit_graphql
+    return make_cache_key( graphqlquery, QUERY_VARIABLES ), { 'query': graphqlquery, 'variables': QUERY_VARIABLES }
+
+
+def build_from_registry():
+    graphqlquery = run.search_github_graphqlquery
+    return make_cache_key( graphqlquery, QUERY_VARIABLES ), run.QUERY_REGISTRY.payload( graphqlquery, QUERY_VARIABLES )
+
+
+def request_bytes(payload):
+    return len( json.dumps( payload ).encode( "UTF-8" ) )
+
+
+def main():
+    plainquery = wrap_text( search_github_document ) % run.github_ratelimit_graphql
+
+    persisted = QueryRegistry( persisted=True )
+    registeredquery = persisted.register( plainquery )
+    persisted.payload( registeredquery, QUERY_VARIABLES )
+
+    results = [
+        ( "per request", build_per_request, request_bytes( { 'query': plainquery, 'variables': QUERY_VARIABLES } ) ),
+        ( "registry", build_from_registry, request_bytes( run.QUERY_REGISTRY.payload( registeredquery, QUERY_VARIABLES ) ) ),
+        ( "persisted", build_from_registry, request_bytes( persisted.payload( registeredquery, QUERY_VARIABLES ) ) ),
+    ]
+
+    for name, function, requestbytes in results:
+        seconds = min( timeit.repeat( function, number=REPEAT, repeat=5 ) )
+        print( f"{name:>12}: {seconds / REPEAT * 1e6:7.2f} us by request, {requestbytes:5d} bytes by Github request" )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+    Reports how long the `SearchIndex` takes answering type-ahead queries, from one letter
+    prefixes to whole terms, and adding a Github search page, with a full index of synthetic
+    repositories, and how much memory the index keeps.
+
+    python3 benchmarks/searchindexbenchmark.py --repositories 50000
+"""
+
+import os
+import sys
+import random
+import timeit
+import argparse
+import tracemalloc
+
+sys.path.append( os.path.dirname( os.path.dirname( os.path.realpath( __file__ ) ) ) )
+
+from searchindex import SearchIndex
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+QUERIES = [ "s", "su", "sub", "sublime", "py", "python", "sublime te", "evandrocoan ite" ]
+
+
+def make_words(generator, count):
+    return [ "".join( generator.choice( LETTERS ) for letter in range( generator.randint( 3, 10 ) ) ) for word in range( count ) ]
+
+
+def make_repositories(generator, words, count, start=0):
+    """ The words are picked with a long tail, as the real descriptions, where a few words are on most of them. """
+    return [
+        {
+            "nameWithOwner": f"{generator.choice( words )}{index}/{generator.choice( words )}",
+            "description": " ".join( words[int( generator.paretovariate( 1.2 ) ) % len( words )] for word in range( 8 ) ),
+            "stargazers": { "totalCount": int( generator.paretovariate( 1 ) * 10 ) },
+        }
+        for index in range( start, start + count )
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter )
+    parser.add_argument( "--repositories", type=int, default=50000, help="how many repositories are indexed" )
+    parser.add_argument( "--words", type=int, default=20000, help="how many distinct words the repositories have" )
+    parser.add_argument( "--repeat", type=int, default=200, help="how many times each query is run" )
+    arguments = parser.parse_args()
+
+    generator = random.Random( 0 )
+    words = [ "sublime", "text", "python", "evandrocoan", "ite" ] + make_words( generator, arguments.words )
+    repositories = make_repositories( generator, words, arguments.repositories )
+
+    tracemalloc.start()
+    traced = SearchIndex( maxrepositories=arguments.repositories )
+    traced.add( repositories )
+    indexbytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del traced
+
+    index = SearchIndex( maxrepositories=arguments.repositories )
+    seconds = timeit.timeit( lambda: index.add( repositories ), number=1 )
+
+    print( f"{'indexing':>16}: {seconds * 1000:9.1f} ms for {arguments.repositories} repositories, "
+            f"{indexbytes / 2 ** 20:.1f} MB, {index.stats()['terms']} terms" )
+
+    pages = iter( [ make_repositories( generator, words, 100, start ) for start in range( arguments.repositories, arguments.repositories + 5000, 100 ) ] )
+    seconds = min( timeit.repeat( lambda: index.add( next( pages ) ), number=10, repeat=5 ) )
+    print( f"{'search page':>16}: {seconds / 10 * 1e6:9.1f} us adding 100 repositories, evicting as many" )
+
+    for searchquery in QUERIES:
+        seconds = min( timeit.repeat( lambda: index.search( searchquery, 10 ), number=arguments.repeat, repeat=5 ) )
+        print( f"{searchquery:>16}: {seconds / arguments.repeat * 1e6:9.1f} us, {index.search( searchquery, 10 )[0]:6d} matches" )
+
+
+if __name__ == "__main__":
+    main()
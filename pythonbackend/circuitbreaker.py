@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import time
+import threading
+
+from errors import UpstreamUnavailable
+
+
+class CircuitBreaker(object):
+    """
+        Fails fast while Github is down, instead of every request waiting for its own timeout.
+
+        After `failurethreshold` consecutive failed calls (timeouts, connection errors and `5xx`
+        responses), the circuit opens and the calls are refused for `resettimeout` seconds. Then,
+        one call is let through (half open), and its result closes the circuit or opens it again.
+        When that call never finishes, another one is let through after `resettimeout` seconds.
+        https://martinfowler.com/bliki/CircuitBreaker.html
+    """
+
+    def __init__(self, failurethreshold=5, resettimeout=30, clock=time.monotonic):
+        self.failurethreshold = failurethreshold
+        self.resettimeout = resettimeout
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.openedat = None
+
+        self.opened = 0
+        self.refused = 0
+
+    def check(self):
+        """ Raises `UpstreamUnavailable` when the call must not be sent to Github. """
+        if self.failurethreshold <= 0:
+            return
+
+        with self.lock:
+            if self.state == "closed":
+                return
+
+            elapsed = self.clock() - self.openedat
+
+            if elapsed < self.resettimeout:
+                self.refused += 1
+                raise UpstreamUnavailable( "Github is not answering, the calls are paused!", self.resettimeout - elapsed )
+
+            self.state = "halfopen"
+            self.openedat = self.clock()
+
+    def record_success(self):
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+
+            if self.failurethreshold > 0 and ( self.state == "halfopen" or self.failures >= self.failurethreshold ):
+                if self.state != "open":
+                    self.opened += 1
+
+                self.state = "open"
+                self.openedat = self.clock()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "opened": self.opened,
+                "refused": self.refused,
+            }
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import zlib
+import threading
+
+from responsecache import ResponseCache
+
+try:
+    import brotli
+
+except ImportError:
+    brotli = None
+
+
+class ResponseCompressor(object):
+    """
+        Compresses the responses with `br` (when the `brotli` package is installed) or `gzip`, as
+        negotiated by the request `Accept-Encoding`, skipping the ones smaller than `minsize`.
+
+        The cached responses only differ by their last field (`rateLimit`), then, the `gzip` stream
+        of everything before it is kept by `prefixkey`, within a copy of the compressor state, and
+        each request only compresses its last field. These responses are sent with `gzip` when the
+        request accepts it, even if it prefers `br`. Each compressor state takes about 256 KB, which
+        count towards the `maxbytes` kept, and copying it is slower than compressing a small body,
+        then, only the prefixes with at least `memoizesize` bytes are kept.
+        https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/Accept-Encoding
+        https://docs.python.org/3/library/zlib.html#zlib.Compress.copy
+        https://www.zlib.net/zlib_tech.html
+    """
+
+    def __init__(self, minsize=1024, gziplevel=6, brotliquality=4, memoizesize=8192, maxbytes=32 * 1024 * 1024, ttl=600):
+        self.minsize = minsize
+        self.memoizesize = memoizesize
+        self.gziplevel = gziplevel
+        self.brotliquality = brotliquality
+        self.ttl = ttl
+
+        self.encodings = [ "br", "gzip" ] if brotli is not None else [ "gzip" ]
+        self.prefixes = ResponseCache( maxentries=None, maxbytes=maxbytes )
+
+        # The deflate memory usage: `(1 << (windowBits + 2)) + (1 << (memLevel + 9))`
+        self.statesize = ( 1 << ( zlib.MAX_WBITS + 2 ) ) + ( 1 << ( zlib.DEF_MEM_LEVEL + 9 ) )
+
+        self.lock = threading.Lock()
+        self.compressed = 0
+        self.memoized = 0
+        self.bytesin = 0
+        self.bytesout = 0
+
+    def memoizable(self, prefixkey, prefixsize):
+        return prefixkey is not None and prefixsize >= self.memoizesize
+
+    def choose_encoding(self, acceptencodings, body, prefixkey=None, prefixsize=0):
+        """ `acceptencodings` is the `flask.request.accept_encodings`. """
+        if len( body ) < self.minsize:
+            return None
+
+        if self.memoizable( prefixkey, prefixsize ) and acceptencodings["gzip"]:
+            return "gzip"
+
+        return acceptencodings.best_match( self.encodings )
+
+    def compress(self, body, encoding, prefixkey=None, prefixsize=0):
+
+        if encoding == "br":
+            compressed = brotli.compress( body, quality=self.brotliquality )
+
+        elif self.memoizable( prefixkey, prefixsize ):
+            compressed = self._compress_gzip_suffix( body, prefixkey, prefixsize )
+
+        else:
+            compressor = zlib.compressobj( self.gziplevel, zlib.DEFLATED, 31 )
+            compressed = compressor.compress( body ) + compressor.flush()
+
+        with self.lock:
+            self.compressed += 1
+            self.bytesin += len( body )
+            self.bytesout += len( compressed )
+
+        return compressed
+
+    def _compress_gzip_suffix(self, body, prefixkey, prefixsize):
+        cached = self.prefixes.get( prefixkey )
+
+        if cached is None:
+            compressor = zlib.compressobj( self.gziplevel, zlib.DEFLATED, 31 )
+            prefix = compressor.compress( body[:prefixsize] ) + compressor.flush( zlib.Z_SYNC_FLUSH )
+            self.prefixes.set( prefixkey, ( prefix, compressor ), self.ttl, size=len( prefix ) + self.statesize )
+
+        else:
+            ( prefix, compressor ), age = cached
+
+            with self.lock:
+                self.memoized += 1
+
+        compressor = compressor.copy()
+        return prefix + compressor.compress( body[prefixsize:] ) + compressor.flush()
+
+    def stats(self):
+        prefixes = self.prefixes.stats()
+
+        with self.lock:
+            return {
+                "encodings": self.encodings,
+                "compressed": self.compressed,
+                "memoized": self.memoized,
+                "bytesIn": self.bytesin,
+                "bytesOut": self.bytesout,
+                "prefixes": prefixes["entries"],
+                "prefixesBytes": prefixes["bytes"],
+            }
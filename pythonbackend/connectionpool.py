@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import threading
+
+
+class ConnectionPool(object):
+    """
+        Keep alive and reuse the TCP/TLS connections to the Github API across all Flask threads.
+
+        All threads share the same `HTTPAdapter` (its urllib3 `PoolManager` is thread safe), but
+        each thread gets its own `requests.Session` because sessions are not thread safe.
+        https://requests.readthedocs.io/en/latest/user/advanced/#session-objects
+        https://github.com/psf/requests/issues/2766
+
+        The `requests` package is only imported by the first request, as the asynchronous engine
+        does not use it, and the backend starts faster without it.
+    """
+
+    def __init__(self, poolsize=10, connecttimeout=5.0, readtimeout=30.0, retries=3, backoff=0.5):
+        self.poolsize = poolsize
+        self.timeout = (connecttimeout, readtimeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.adapter = None
+
+        self.threadlocal = threading.local()
+        self.lock = threading.Lock()
+        self.sessions = 0
+        self.requests = 0
+
+    def get_adapter(self):
+        if self.adapter is not None:
+            return self.adapter
+
+        import requests.adapters
+        from urllib3.util.retry import Retry
+
+        with self.lock:
+            if self.adapter is not None:
+                return self.adapter
+
+            # GraphQL queries do not change anything on the server, then, it is safe to retry a POST.
+            # A rate limited `429` is not retried, but returned at once to `check_graphql_response`,
+            # instead of sleeping its `Retry-After` while holding a scheduler slot
+            # https://urllib3.readthedocs.io/en/stable/reference/urllib3.util.html#urllib3.util.Retry
+            retry = Retry(
+                total=self.retries,
+                backoff_factor=self.backoff,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset( ["POST"] ),
+                respect_retry_after_header=False,
+                raise_on_status=False,
+            )
+
+            # `pool_block` caps the number of open connections at `poolsize` instead of opening and
+            # closing extra connections when there are more threads than connections in the pool
+            self.adapter = requests.adapters.HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=self.poolsize,
+                pool_block=True,
+                max_retries=retry,
+            )
+            return self.adapter
+
+    def session(self):
+        session = getattr( self.threadlocal, "session", None )
+
+        if session is None:
+            import requests
+
+            adapter = self.get_adapter()
+            session = requests.Session()
+            session.mount( "https://", adapter )
+            session.mount( "http://", adapter )
+            self.threadlocal.session = session
+
+            with self.lock:
+                self.sessions += 1
+
+        return session
+
+    def post(self, url, **kwargs):
+        kwargs.setdefault( "timeout", self.timeout )
+
+        with self.lock:
+            self.requests += 1
+
+        return self.session().post( url, **kwargs )
+
+    @property
+    def requesterror(self):
+        """ The base exception of a failed `post()`, for an `except` clause. """
+        import requests
+        return requests.exceptions.RequestException
+
+    def is_timeout(self, error):
+        import requests
+        return isinstance( error, requests.exceptions.Timeout )
+
+    def stats(self):
+        """ The connections reused are all requests which did not require opening a new connection. """
+        opened = 0
+        requested = 0
+        idle = 0
+        pools = self.adapter.poolmanager.pools if self.adapter is not None else {}
+
+        for key in pools.keys():
+            pool = pools.get( key )
+            if pool is None: continue
+
+            opened += pool.num_connections
+            requested += pool.num_requests
+            idle += sum( 1 for connection in list( pool.pool.queue ) if connection ) if pool.pool else 0
+
+        return {
+            "poolSize": self.poolsize,
+            "sessions": self.sessions,
+            "requests": self.requests,
+            "connectionsOpened": opened,
+            "connectionsReused": max( requested - opened, 0 ),
+            "connectionsIdle": idle,
+        }
+
+    def close(self):
+        if self.adapter is not None:
+            self.adapter.close()
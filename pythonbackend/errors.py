@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+
+class BackendError(Exception):
+    """
+        An expected failure, answered with its `status` and a compact JSON body, as
+        `{"error": "upstream_timeout", "message": "...", "retryAfter": 30}`, without a stack trace.
+        When `retryafter` is given, the response also has a `Retry-After` header.
+    """
+    status = 500
+    code = "internal_error"
+
+    def __init__(self, message, retryafter=None):
+        super().__init__( message )
+        self.message = message
+        self.retryafter = retryafter
+
+    def body(self):
+        body = { "error": self.code, "message": self.message }
+
+        if self.retryafter is not None:
+            body["retryAfter"] = int( self.retryafter ) + 1
+
+        return body
+
+
+class InvalidInput(BackendError):
+    """ The request is missing a field or has a field of the wrong type. """
+    status = 400
+    code = "invalid_request"
+
+
+class NotFound(BackendError):
+    """ Github does not know the requested user or repository, or the endpoint is disabled. """
+    status = 404
+    code = "not_found"
+
+
+class Disabled(BackendError):
+    """ The backend was configured without the requested feature, as the local search index. """
+    status = 503
+    code = "disabled"
+
+
+class UpstreamError(BackendError):
+    """ Github failed to answer, or answered with an error. """
+    status = 502
+    code = "upstream_error"
+
+
+class UpstreamTimeout(UpstreamError):
+    status = 504
+    code = "upstream_timeout"
+
+
+class UpstreamUnavailable(UpstreamError):
+    """ Github is not called while the `CircuitBreaker` is open. """
+    status = 503
+    code = "upstream_unavailable"
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import re
+import hashlib
+import threading
+
+
+def minify_query(graphqlquery):
+    """ The GraphQL white spaces are only separators, and our queries do not have string literals. """
+    return " ".join( graphqlquery.split() )
+
+
+class GraphqlQuery(str):
+    """
+        A minified GraphQL document, which is still a `str`, plus its `name` and its `sha256` hash,
+        both computed once, when the query is registered.
+    """
+
+    def __new__(cls, document):
+        graphqlquery = super().__new__( cls, minify_query( document ) )
+        graphqlquery.sha256 = hashlib.sha256( graphqlquery.encode( "UTF-8" ) ).hexdigest()
+
+        match = re.match( r"\s*(?:query|mutation)\s+(\w+)", graphqlquery )
+        graphqlquery.name = match.group( 1 ) if match else graphqlquery.sha256[:12]
+        return graphqlquery
+
+
+def is_persisted_query_not_found(result):
+    return any(
+        error.get( "message" ) == "PersistedQueryNotFound"
+        or ( error.get( "extensions" ) or {} ).get( "code" ) == "PERSISTED_QUERY_NOT_FOUND"
+        for error in result.get( "errors", [] )
+    )
+
+
+def is_persisted_query_not_supported(result):
+    """
+        An Automatic Persisted Queries server answers `PersistedQueryNotSupported`, while a server
+        not knowing the protocol, as Github, answers that the query document is missing.
+    """
+    return any(
+        error.get( "message" ) == "PersistedQueryNotSupported"
+        or ( error.get( "extensions" ) or {} ).get( "code" ) == "PERSISTED_QUERY_NOT_SUPPORTED"
+        or re.search( r"query\b.* must be specified|must provide (a )?query", str( error.get( "message" ) ), re.IGNORECASE )
+        for error in result.get( "errors", [] )
+    )
+
+
+class QueryRegistry(object):
+    """
+        Keeps the queries sent to Github, and with `persisted`, sends only their hash instead of
+        the whole document, as the Automatic Persisted Queries protocol, after the upstream knows
+        them. When the upstream does not know a hash, the query is sent again with its document,
+        and when the upstream does not support persisted queries, they are disabled.
+        https://www.apollographql.com/docs/apollo-server/performance/apq/
+    """
+
+    def __init__(self, persisted=False):
+        self.persisted = persisted
+
+        self.lock = threading.Lock()
+        self.queries = {}
+        self.registered = set()
+
+        self.hashonly = 0
+        self.notfound = 0
+
+    def register(self, document):
+        graphqlquery = GraphqlQuery( document )
+
+        with self.lock:
+            return self.queries.setdefault( graphqlquery.sha256, graphqlquery )
+
+    def payload(self, graphqlquery, queryvariables, withdocument=False):
+        """ The `json` body to send `graphqlquery`, where unregistered queries always go with their document. """
+        sha256 = getattr( graphqlquery, "sha256", None )
+
+        if not self.persisted or sha256 is None:
+            return { 'query': graphqlquery, 'variables': queryvariables }
+
+        extensions = { "persistedQuery": { "version": 1, "sha256Hash": sha256 } }
+
+        with self.lock:
+            if withdocument or sha256 not in self.registered:
+                self.registered.add( sha256 )
+                return { 'query': graphqlquery, 'variables': queryvariables, 'extensions': extensions }
+
+            self.hashonly += 1
+
+        return { 'variables': queryvariables, 'extensions': extensions }
+
+    def needs_document(self, graphqlquery, payload, response):
+        """
+            Whether the `response` for a `payload` without the document requires sending it again
+            with the document. Only the persisted queries answers are retried, while any other
+            response, as a rate limited or a server error, is handled as any Github response.
+        """
+        if 'query' in payload:
+            return False
+
+        try:
+            result = response.json()
+
+        except ValueError:
+            return False
+
+        if not isinstance( result, dict ) or result.get( "data" ):
+            return False
+
+        with self.lock:
+            if is_persisted_query_not_found( result ):
+                self.notfound += 1
+                return True
+
+            if is_persisted_query_not_supported( result ):
+                self.persisted = False
+                return True
+
+        return False
+
+    def stats(self):
+        with self.lock:
+            return {
+                "queries": len( self.queries ),
+                "persisted": self.persisted,
+                "hashOnly": self.hashonly,
+                "notFound": self.notfound,
+            }
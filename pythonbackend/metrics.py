@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import re
+import glob
+import json
+import time
+import bisect
+import threading
+import collections
+
+# Seconds, from a cache hit to a slow Github search
+DURATION_BUCKETS = ( 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10 )
+
+# Github GraphQL rate limit points by query
+# https://developer.github.com/v4/guides/resource-limitations/
+COST_BUCKETS = ( 1, 2, 5, 10, 20, 50, 100 )
+
+
+def escape_label(value):
+    return str( value ).replace( "\\", "\\\\" ).replace( "\n", "\\n" ).replace( '"', '\\"' )
+
+
+def is_alive(pid):
+    """ Whether the process `pid` is running, on this host. """
+    try:
+        os.kill( pid, 0 )
+
+    except ProcessLookupError:
+        return False
+
+    except PermissionError:
+        pass
+
+    return True
+
+
+def clear_shared_metrics(directory):
+    """ Removes the metrics shared by the worker processes of a previous server run. """
+    os.makedirs( directory, exist_ok=True )
+
+    for path in glob.glob( os.path.join( directory, "*.json" ) ):
+        os.remove( path )
+
+
+def format_sample(name, labels, value):
+    if labels:
+        labels = ",".join( f'{key}="{escape_label( label )}"' for key, label in labels.items() )
+        return f"{name}{{{labels}}} {value}"
+
+    return f"{name} {value}"
+
+
+class Counter(object):
+    """ A value by labels values, which only goes up. """
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+        self.lock = threading.Lock()
+        self.values = collections.defaultdict( int )
+
+    def inc(self, *labelvalues, amount=1):
+        with self.lock:
+            self.values[labelvalues] += amount
+
+    def snapshot(self):
+        with self.lock:
+            return [ [ list( labelvalues ), value ] for labelvalues, value in self.values.items() ]
+
+    def merge(self, snapshot):
+        with self.lock:
+            for labelvalues, value in snapshot:
+                self.values[tuple( labelvalues )] += value
+
+    def samples(self):
+        with self.lock:
+            values = list( self.values.items() )
+
+        for labelvalues, value in values:
+            yield self.name, dict( zip( self.labelnames, labelvalues ) ), value
+
+
+class Gauge(Counter):
+    """ A value by labels values, which goes up and down. """
+    kind = "gauge"
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc( *labelvalues, amount=-amount )
+
+
+class Histogram(object):
+    """ Counts the observed values by `buckets` upper bounds, plus their sum and count. """
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.sums = collections.defaultdict( float )
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left( self.buckets, value )
+
+        with self.lock:
+            counts = self.counts.get( labelvalues )
+
+            if counts is None:
+                counts = self.counts[labelvalues] = [ 0 ] * ( len( self.buckets ) + 1 )
+
+            counts[index] += 1
+            self.sums[labelvalues] += value
+
+    def snapshot(self):
+        with self.lock:
+            return [ [ list( labelvalues ), list( counts ), self.sums[labelvalues] ] for labelvalues, counts in self.counts.items() ]
+
+    def merge(self, snapshot):
+        with self.lock:
+            for labelvalues, counts, total in snapshot:
+                labelvalues = tuple( labelvalues )
+                merged = self.counts.setdefault( labelvalues, [ 0 ] * ( len( self.buckets ) + 1 ) )
+
+                for index, count in enumerate( counts ):
+                    merged[index] += count
+
+                self.sums[labelvalues] += total
+
+    def samples(self):
+        with self.lock:
+            values = [ ( labelvalues, list( counts ), self.sums[labelvalues] ) for labelvalues, counts in self.counts.items() ]
+
+        for labelvalues, counts, total in values:
+            labels = dict( zip( self.labelnames, labelvalues ) )
+            cumulative = 0
+
+            for bound, count in zip( self.buckets + ( "+Inf", ), counts ):
+                cumulative += count
+                yield f"{self.name}_bucket", dict( labels, le=bound ), cumulative
+
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class BackendMetrics(object):
+    """
+        The backend hot path metrics, plus the values of `collect_stats()`, which are only read when
+        the metrics are scraped, on the Prometheus text format.
+        https://prometheus.io/docs/instrumenting/exposition_formats/
+
+        With a `directory`, each worker process writes its metrics there, at most once each
+        `interval` seconds, and renders the sum of the metrics of all workers, as the Prometheus
+        client multiprocess mode. The gauges of the stopped workers are not summed, and the
+        `collect_stats()` values are the ones of the worker answering the scrape.
+        https://prometheus.github.io/client_python/multiprocess/
+    """
+
+    def __init__(self, collect_stats=None, prefix="githubresearcher", directory=None, interval=5, clock=time.monotonic):
+        self.collect_stats = collect_stats
+        self.prefix = prefix
+        self.directory = directory
+        self.interval = interval
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        self.sharedat = None
+
+        self.requestduration = Histogram( f"{prefix}_request_duration_seconds",
+                "Time spent by the backend on each request, until its response starts.", ( "endpoint", "method", "status" ) )
+        self.requestsinflight = Gauge( f"{prefix}_requests_in_flight",
+                "Requests being processed by the backend." )
+        self.upstreamduration = Histogram( f"{prefix}_upstream_duration_seconds",
+                "Time spent by each Github request, without waiting on the scheduler.", ( "query", ) )
+        self.upstreamresponses = Counter( f"{prefix}_upstream_responses_total",
+                "Github responses by their HTTP status code.", ( "query", "status" ) )
+        self.graphqlcost = Histogram( f"{prefix}_graphql_cost",
+                "Github rate limit points spent by each query.", ( "query", ), buckets=COST_BUCKETS )
+        self.jsonduration = Histogram( f"{prefix}_json_duration_seconds",
+                "Time spent decoding the Github responses and encoding the results.", ( "operation", ) )
+        self.results = Counter( f"{prefix}_results_total",
+                "Endpoints results by where they came from: cache, stale, store, prefetch or github.", ( "endpoint", "source" ) )
+
+        self.metrics = [
+            self.requestduration,
+            self.requestsinflight,
+            self.upstreamduration,
+            self.upstreamresponses,
+            self.graphqlcost,
+            self.jsonduration,
+            self.results,
+        ]
+
+    def snapshot(self):
+        return { metric.name: metric.snapshot() for metric in self.metrics }
+
+    def merge(self, snapshot, gauges=True):
+        for metric in self.metrics:
+            if gauges or metric.kind != "gauge":
+                metric.merge( snapshot.get( metric.name, [] ) )
+
+    def share(self, force=False):
+        """ Writes this worker metrics on the `directory`, unless they were written less than `interval` seconds ago. """
+        if self.directory is None:
+            return
+
+        with self.lock:
+            now = self.clock()
+
+            if not force and self.sharedat is not None and now - self.sharedat < self.interval:
+                return
+
+            self.sharedat = now
+
+        path = os.path.join( self.directory, f"{os.getpid()}.json" )
+
+        # Replaced at once, so the other workers never read a partial file
+        with open( path + ".tmp", "w", encoding="UTF-8" ) as file:
+            json.dump( self.snapshot(), file )
+
+        os.replace( path + ".tmp", path )
+
+    def aggregate(self):
+        """ Returns the metrics of all workers summed, where this worker metrics are the current ones. """
+        aggregated = BackendMetrics( prefix=self.prefix )
+        aggregated.merge( self.snapshot() )
+
+        for path in glob.glob( os.path.join( self.directory, "*.json" ) ):
+            pid = int( os.path.basename( path )[:-len( ".json" )] )
+
+            if pid == os.getpid():
+                continue
+
+            try:
+                with open( path, encoding="UTF-8" ) as file:
+                    snapshot = json.load( file )
+
+            except ( OSError, ValueError ):
+                continue
+
+            aggregated.merge( snapshot, gauges=is_alive( pid ) )
+
+        return aggregated
+
+    def render(self):
+        lines = []
+        metrics = self.aggregate().metrics if self.directory is not None else self.metrics
+
+        for metric in metrics:
+            lines.append( f"# HELP {metric.name} {metric.documentation}" )
+            lines.append( f"# TYPE {metric.name} {metric.kind}" )
+            lines.extend( format_sample( *sample ) for sample in metric.samples() )
+
+        if self.collect_stats is not None:
+            lines.extend( self.render_stats( self.collect_stats() ) )
+
+        return "\n".join( lines ) + "\n"
+
+    def render_stats(self, stats):
+        """
+            Each number on `stats`, as `{"responseCache": {"hits": 10}}`, is a gauge, as
+            `githubresearcher_response_cache_hits 10`, and each dictionary of numbers, as
+            `{"scheduler": {"waiting": {"search": 2}}}`, is a gauge with a `name` label, as
+            `githubresearcher_scheduler_waiting{name="search"} 2`.
+        """
+
+        def isnumber(value):
+            return isinstance( value, ( int, float ) ) and not isinstance( value, bool )
+
+        for component, values in stats.items():
+            for key, value in ( values or {} ).items():
+                name = self.prefix + "_" + re.sub( r"(?<!^)(?=[A-Z])", "_", f"{component}_{key}" ).lower()
+
+                if isnumber( value ):
+                    yield f"# TYPE {name} gauge"
+                    yield format_sample( name, {}, value )
+
+                elif isinstance( value, dict ) and value and all( isnumber( item ) for item in value.values() ):
+                    yield f"# TYPE {name} gauge"
+                    yield from ( format_sample( name, { "name": label }, item ) for label, item in value.items() )
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+from responsecache import ResponseCache
+from backgroundrefresher import BackgroundRefresher
+
+
+class Prefetcher(BackgroundRefresher):
+    """
+        Fetches on background the pages users are likely to request next, and keeps them for a few
+        seconds, until they are taken by the follow up request. Pages fetched by a `function` which
+        already caches its results are scheduled with `keep=False`, so they are not stored twice.
+        Nothing is prefetched before the `budget` is known.
+    """
+    requiresbudget = True
+
+    def __init__(self, budget, workers=2, ttl=30, minremaining=1000, maxpending=8, maxentries=200):
+        super().__init__( budget, workers, minremaining, maxpending, name="prefetcher" )
+        self.ttl = ttl
+        self.cache = ResponseCache( maxentries=maxentries )
+        self.taken = 0
+
+    def schedule(self, key, function, *args, keep=True, **kwargs):
+        """ The encoded results returned by `function` are kept under `key`, unless `keep` is False. """
+        super().schedule( key, self._prefetch, key, keep, function, *args, **kwargs )
+
+    def _prefetch(self, key, keep, function, *args, **kwargs):
+        encodedresults = function( *args, **kwargs )
+
+        if keep:
+            self.cache.set( key, encodedresults, self.ttl )
+
+    def take(self, key):
+        """ Returns a tuple `(encodedresults, age in seconds)` or None, when the page was not prefetched. """
+        cached = self.cache.get( key )
+
+        if cached is not None:
+            self.cache.delete( key )
+
+            with self.lock:
+                self.taken += 1
+
+        return cached
+
+    def stats(self):
+        stats = super().stats()
+
+        with self.lock:
+            stats["taken"] = self.taken
+
+        stats["entries"] = self.cache.stats()["entries"]
+        return stats
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import multiprocessing
+
+import gunicorn.util
+import gunicorn.arbiter
+import gunicorn.app.base
+
+import metrics
+
+
+class ProductionServer(gunicorn.app.base.BaseApplication):
+    """
+        Pre-forked multi process server, where each worker process imports its own copy of the
+        application, so the connection pool, cache and threads are not shared across a fork.
+        https://docs.gunicorn.org/en/stable/custom.html
+        https://docs.gunicorn.org/en/stable/settings.html
+    """
+
+    def __init__(self, applicationpath, options):
+        self.applicationpath = applicationpath
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set( key, value )
+
+    def load(self):
+        return gunicorn.util.import_app( self.applicationpath )
+
+
+def post_worker_init(worker):
+    """
+        Each worker probes Github for its `/ready` endpoint, after it was forked, where a failed
+        `blocking` probe stops the server, as the master process does not import `run`.
+    """
+    import run
+
+    if run.STARTUP_PROBE == 'blocking':
+        try:
+            run.probe_github()
+
+        except Exception:
+            sys.exit( gunicorn.arbiter.Arbiter.WORKER_BOOT_ERROR )
+
+    run.start_startup_probe()
+
+
+def worker_exit(server, worker):
+    """ Closes the worker open connections after its requests are finished by a graceful shutdown. """
+    import run
+    run.shutdown()
+
+
+def run_production_server(engine, host, port):
+    """
+        The threaded engine runs each worker with `GITHUB_RESEARCHER_THREADS` threads, while the
+        asynchronous engine runs each worker as an `uvicorn` event loop.
+        https://www.uvicorn.org/deployment/#gunicorn
+    """
+    isasync = engine == 'async'
+
+    options = {
+        "bind": f"{host}:{port}",
+        "workers": int( os.environ.get( 'GITHUB_RESEARCHER_WORKERS', multiprocessing.cpu_count() * 2 + 1 ) ),
+        "threads": int( os.environ.get( 'GITHUB_RESEARCHER_THREADS', 8 ) ),
+        "worker_class": "uvicorn.workers.UvicornWorker" if isasync else "gthread",
+        "timeout": int( os.environ.get( 'GITHUB_RESEARCHER_WORKER_TIMEOUT', 60 ) ),
+        "graceful_timeout": int( os.environ.get( 'GITHUB_RESEARCHER_GRACEFUL_TIMEOUT', 30 ) ),
+        "keepalive": int( os.environ.get( 'GITHUB_RESEARCHER_KEEPALIVE', 5 ) ),
+        "post_worker_init": post_worker_init,
+        "worker_exit": worker_exit,
+    }
+
+    # The workers of the previous run are gone, and their metrics would be summed forever
+    if os.environ.get( 'GITHUB_RESEARCHER_METRICS_DIRECTORY' ):
+        metrics.clear_shared_metrics( os.environ['GITHUB_RESEARCHER_METRICS_DIRECTORY'] )
+
+    ProductionServer( "asyncrun:ASGI_APP" if isasync else "run:APP", options ).run()
+
+
+def main():
+    """ `run_backend.sh` starts the production server from here, so its master process does not import `run`. """
+    run_production_server(
+        os.environ.get( 'GITHUB_RESEARCHER_ENGINE', 'threaded' ),
+        "0.0.0.0",
+        int( os.environ["REACT_APP_GITHUB_RESEARCHER_BACKEND_PORT"] ),
+    )
+
+
+if __name__ == "__main__":
+    main()
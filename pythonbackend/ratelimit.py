@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import time
+import datetime
+import threading
+
+from errors import BackendError
+
+
+def parse_resetat(resetat):
+    """ Github `resetAt` as `2020-01-01T00:00:00Z` to seconds since the epoch. """
+    return datetime.datetime.fromisoformat( resetat.replace( "Z", "+00:00" ) ).timestamp()
+
+
+class RateLimitExceeded(BackendError):
+    """ Raised instead of calling Github when there is no budget left for the call. """
+    status = 429
+    code = "rate_limited"
+
+    def __init__(self, retryafter):
+        super().__init__( f"The Github rate limit was exceeded, retry after {retryafter:.0f} seconds!", retryafter )
+
+
+class RateLimitBudget(object):
+    """
+        Tracks the Github GraphQL rate limit from the `rateLimit` block every query requests.
+        https://developer.github.com/v4/guides/resource-limitations/
+
+        The `listener` is called after each `update()` and `exhaust()`, as to share the budget with
+        the other worker processes, which give their budgets back with `merge()`.
+    """
+
+    def __init__(self, clock=time.time, listener=None):
+        self.clock = clock
+        self.listener = listener
+        self.lock = threading.Lock()
+
+        self.limit = None
+        self.remaining = None
+        self.resetat = None
+        self.lastcost = None
+        self.updatedat = None
+
+    def update(self, ratelimit):
+        if not ratelimit:
+            return
+
+        with self.lock:
+            self.limit = ratelimit["limit"]
+            self.remaining = ratelimit["remaining"]
+            self.resetat = parse_resetat( ratelimit["resetAt"] )
+            self.lastcost = ratelimit["cost"]
+            self.updatedat = self.clock()
+
+        if self.listener is not None:
+            self.listener()
+
+    def spend(self, cost=1):
+        """ Discounts a call before its response arrives, so concurrent calls see a closer budget. """
+        with self.lock:
+            if self.remaining is not None:
+                self.remaining = max( self.remaining - cost, 0 )
+
+    def exhaust(self, retryafter):
+        """ Github refused a call, then, there is no budget left until `retryafter` seconds. """
+        with self.lock:
+            self.remaining = 0
+            self.resetat = self.clock() + retryafter
+            self.updatedat = self.clock()
+
+        if self.listener is not None:
+            self.listener()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "limit": self.limit,
+                "remaining": self.remaining,
+                "resetAt": self.resetat,
+                "lastCost": self.lastcost,
+                "updatedAt": self.updatedat,
+            }
+
+    def merge(self, snapshot):
+        """ Takes a `snapshot()` from another process, when it is newer. Returns whether it was taken. """
+        with self.lock:
+            if snapshot["updatedAt"] is None or ( self.updatedat is not None and self.updatedat >= snapshot["updatedAt"] ):
+                return False
+
+            self.limit = snapshot["limit"] if snapshot["limit"] is not None else self.limit
+            self.remaining = snapshot["remaining"]
+            self.resetat = snapshot["resetAt"]
+            self.lastcost = snapshot["lastCost"]
+            self.updatedat = snapshot["updatedAt"]
+            return True
+
+    def remaining_budget(self):
+        """ Returns None while the limit is not known yet, and the full limit after the reset time. """
+        with self.lock:
+            if self.remaining is None:
+                return None
+
+            if self.clock() >= self.resetat:
+                return self.limit
+
+            return self.remaining
+
+    def seconds_to_reset(self):
+        with self.lock:
+            if self.resetat is None:
+                return 0
+            return max( self.resetat - self.clock(), 0 )
+
+    def stats(self):
+        remaining = self.remaining_budget()
+
+        with self.lock:
+            return {
+                "limit": self.limit,
+                "remaining": remaining,
+                "lastCost": self.lastcost,
+                "resetAt": self.resetat,
+                "updatedAt": self.updatedat,
+            }
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import json
+import time
+import sqlite3
+import threading
+
+
+class RepositoryStore(object):
+    """
+        Keeps on a SQLite database the repositories fields fetched by all endpoints, indexed by
+        their `nameWithOwner`, so they survive the backend restarts.
+
+        The `createdAt` never changes, while the open issues count and main language change
+        rarely, then, `/detail_repository` results are served from the store while they are newer
+        than `maxage` seconds, and refreshed on background when older than `staleafter` seconds.
+        https://www.sqlite.org/wal.html
+    """
+
+    def __init__(self, path, staleafter=3600, maxage=7 * 24 * 3600, clock=time.time):
+        self.path = path
+        self.staleafter = staleafter
+        self.maxage = maxage
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        # Each worker process has its own connection, shared by its threads under `self.lock`
+        self.connection = sqlite3.connect( path, check_same_thread=False, isolation_level=None )
+        self.connection.execute( "PRAGMA journal_mode=WAL" )
+        self.connection.execute( "PRAGMA synchronous=NORMAL" )
+        self.connection.execute( """
+            CREATE TABLE IF NOT EXISTS repositories (
+                nameWithOwner TEXT PRIMARY KEY COLLATE NOCASE,
+                description TEXT,
+                stargazers INTEGER,
+                createdAt TEXT,
+                openIssues INTEGER,
+                language TEXT,
+                rateLimit TEXT,
+                detailsFetchedAt REAL,
+                updatedAt REAL NOT NULL
+            )
+        """ )
+
+    def save(self, endpoint, queryvariables, graphqlresults):
+        """ Saves the repositories fields from any endpoint results. """
+        data = graphqlresults["data"]
+
+        if endpoint == "search_github":
+            self.save_search( data["search"]["nodes"] )
+
+        elif endpoint == "list_repositories" and data.get( "repositoryOwner" ):
+            self.save_names( queryvariables["user"], data["repositoryOwner"]["repositories"]["nodes"] )
+
+        elif endpoint == "detail_repository" and data.get( "repository" ):
+            self.save_details( [ ( f"{queryvariables['user']}/{queryvariables['repo']}", data["repository"] ) ], data )
+
+    def save_search(self, repositories):
+        rows = [
+            ( repository["nameWithOwner"], repository["description"], repository["stargazers"]["totalCount"], self.clock() )
+            for repository in repositories if repository
+        ]
+
+        self._executemany( """
+            INSERT INTO repositories (nameWithOwner, description, stargazers, updatedAt) VALUES (?, ?, ?, ?)
+            ON CONFLICT (nameWithOwner) DO UPDATE SET
+                description=excluded.description, stargazers=excluded.stargazers, updatedAt=excluded.updatedAt
+        """, rows )
+
+    def save_names(self, owner, repositories):
+        rows = [ ( f"{owner}/{repository['name']}", self.clock() ) for repository in repositories if repository ]
+
+        self._executemany( """
+            INSERT INTO repositories (nameWithOwner, updatedAt) VALUES (?, ?)
+            ON CONFLICT (nameWithOwner) DO NOTHING
+        """, rows )
+
+    def save_details(self, repositories, ratelimitdata):
+        """
+            The `repositories` are `(nameWithOwner, repository)` pairs fetched together, and the
+            `ratelimitdata` has the `rateLimit` and `viewer` fields fetched with them.
+        """
+        ratelimit = json.dumps( { "rateLimit": ratelimitdata["rateLimit"], "viewer": ratelimitdata["viewer"] } )
+        now = self.clock()
+        rows = []
+
+        for namewithowner, repository in repositories:
+            languages = repository["languages"]["nodes"]
+            rows.append( ( namewithowner, repository["createdAt"], repository["issues"]["totalCount"],
+                    languages[0]["name"] if languages else None, ratelimit, now, now ) )
+
+        self._executemany( """
+            INSERT INTO repositories (nameWithOwner, createdAt, openIssues, language, rateLimit, detailsFetchedAt, updatedAt)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (nameWithOwner) DO UPDATE SET
+                createdAt=excluded.createdAt, openIssues=excluded.openIssues, language=excluded.language,
+                rateLimit=excluded.rateLimit, detailsFetchedAt=excluded.detailsFetchedAt, updatedAt=excluded.updatedAt
+        """, rows )
+
+    def _executemany(self, statement, rows):
+        """
+            The connection is on autocommit mode, then, the rows are written on a single explicit
+            transaction, instead of one transaction and one WAL commit by row.
+            https://www.sqlite.org/lang_transaction.html
+        """
+        with self.lock:
+            self.connection.execute( "BEGIN" )
+
+            try:
+                self.connection.executemany( statement, rows )
+
+            except BaseException:
+                self.connection.execute( "ROLLBACK" )
+                raise
+
+            self.connection.execute( "COMMIT" )
+
+    def search_nodes(self, limit):
+        """ Returns the `limit` most recently stored search results, from the oldest to the newest one. """
+        with self.lock:
+            rows = self.connection.execute( """
+                SELECT nameWithOwner, description, stargazers FROM repositories
+                WHERE stargazers IS NOT NULL ORDER BY updatedAt DESC LIMIT ?
+            """, ( limit, ) ).fetchall()
+
+        return [
+            { "nameWithOwner": namewithowner, "description": description, "stargazers": { "totalCount": stars } }
+            for namewithowner, description, stars in reversed( rows )
+        ]
+
+    def get_details(self, namewithowner):
+        """
+            Returns a tuple `(graphqlresults, age in seconds)` shaped as the `/detail_repository`
+            query results, or None, when the details were never fetched or are older than `maxage`.
+        """
+        with self.lock:
+            row = self.connection.execute( """
+                SELECT createdAt, openIssues, language, rateLimit, detailsFetchedAt FROM repositories
+                WHERE nameWithOwner = ? AND detailsFetchedAt IS NOT NULL
+            """, ( namewithowner, ) ).fetchone()
+
+            age = self.clock() - row[4] if row else None
+
+            if row is None or age > self.maxage:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+
+        createdat, openissues, language, ratelimit, detailsfetchedat = row
+        data = json.loads( ratelimit )
+        data["repository"] = {
+            "createdAt": createdat,
+            "issues": { "totalCount": openissues },
+            "languages": { "nodes": [ { "name": language } ] if language is not None else [] },
+        }
+        return { "data": data }, age
+
+    def stats(self):
+        with self.lock:
+            repositories, details = self.connection.execute(
+                "SELECT COUNT(*), COUNT(detailsFetchedAt) FROM repositories" ).fetchone()
+
+            return {
+                "repositories": repositories,
+                "repositoriesWithDetails": details,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import json
+import time
+import hashlib
+import threading
+import collections
+
+
+def make_cache_key(graphqlquery, queryvariables):
+    """
+        Queries only differing by white spaces and variables only differing by order share the same
+        key. The registered queries (`graphqlqueries.GraphqlQuery`) already carry their hash.
+    """
+    querysha256 = getattr( graphqlquery, "sha256", None )
+
+    if querysha256 is None:
+        querysha256 = hashlib.sha256( " ".join( graphqlquery.split() ).encode( "UTF-8" ) ).hexdigest()
+
+    normalizedvariables = json.dumps( queryvariables, sort_keys=True, separators=(",", ":") )
+    return hashlib.sha256( f"{querysha256}\n{normalizedvariables}".encode( "UTF-8" ) ).hexdigest()
+
+
+class ResponseCache(object):
+    """
+        A thread safe least recently used cache, where each entry expires after its own time to live.
+
+        The cache is bounded by `maxentries` (unless it is None) and by `maxbytes`, where the size of
+        each entry is the length of its (already encoded) value plus its key.
+        https://docs.python.org/3/library/collections.html#ordereddict-examples-and-recipes
+    """
+
+    def __init__(self, maxentries=1000, maxbytes=64 * 1024 * 1024, clock=time.monotonic):
+        self.maxentries = maxentries
+        self.maxbytes = maxbytes
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """ Returns a tuple `(value, age in seconds)` or None when the key is missing or expired. """
+        with self.lock:
+            entry = self.entries.get( key )
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, storedat, expiresat = entry
+            now = self.clock()
+
+            if now >= expiresat:
+                self._remove( key )
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end( key )
+            self.hits += 1
+            return value, now - storedat
+
+    def __contains__(self, key):
+        """ Unlike `get()`, it does not change the entries order nor the counters. """
+        with self.lock:
+            entry = self.entries.get( key )
+            return entry is not None and self.clock() < entry[3]
+
+    def set(self, key, value, ttl, size=None):
+        if size is None:
+            size = len( value )
+        size += len( key )
+
+        with self.lock:
+            if key in self.entries:
+                self._remove( key )
+
+            if ttl <= 0 or size > self.maxbytes:
+                return
+
+            now = self.clock()
+            self.entries[key] = ( value, size, now, now + ttl )
+            self.bytes += size
+
+            while self.bytes > self.maxbytes or self.maxentries is not None and len( self.entries ) > self.maxentries:
+                self._remove( next( iter( self.entries ) ) )
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            if key in self.entries:
+                self._remove( key )
+
+    def _remove(self, key):
+        value, size, storedat, expiresat = self.entries.pop( key )
+        self.bytes -= size
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len( self.entries ),
+                "bytes": self.bytes,
+                "maxEntries": self.maxentries,
+                "maxBytes": self.maxbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
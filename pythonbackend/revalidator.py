@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+from backgroundrefresher import BackgroundRefresher
+
+
+class Revalidator(BackgroundRefresher):
+    """
+        Refreshes on background the cached results which are being served stale, so the requests
+        arriving after their time to live do not wait for Github. A key is only refreshed when a
+        request asks for it, then, the keys nobody requests anymore are not refreshed, and expire
+        at the end of their stale window, as do the ones skipped by the `BackgroundRefresher`.
+        https://datatracker.ietf.org/doc/html/rfc5861#section-3
+    """
+
+    def __init__(self, budget, workers=2, minremaining=100, maxpending=32, claim=None):
+        super().__init__( budget, workers, minremaining, maxpending, claim, name="revalidator" )
@@ -2,24 +2,248 @@
 # -*- coding: UTF-8 -*-
 
 import os
-import json
-import requests
 
 import sys
+import time
+import hashlib
+import textwrap
 import traceback
 import functools
+import threading
+import concurrent.futures
 
 import flask
-import flask_cors
 
-from debug_tools import getLogger
-from debug_tools.utilities import wrap_text
-
-log = getLogger( os.environ.get( 'REACT_APP_GITHUB_RESEARCHER_DEBUG_LEVEL' ), 'researcher' )
+from connectionpool import ConnectionPool
+from responsecache import ResponseCache
+from responsecache import make_cache_key
+from sharedcache import SharedCache
+from sharedcache import SharedBudgets
+from sharedcache import create_backend
+from singleflight import SingleFlight
+from tokenpool import TokenPool
+from ratelimit import RateLimitExceeded
+from errors import BackendError
+from errors import NotFound
+from errors import Disabled
+from errors import InvalidInput
+from errors import UpstreamError
+from errors import UpstreamTimeout
+from circuitbreaker import CircuitBreaker
+from scheduler import UpstreamScheduler
+from scheduler import INTERACTIVE_PRIORITY
+from scheduler import SEARCH_PRIORITY
+from scheduler import PREFETCH_PRIORITY
+from prefetcher import Prefetcher
+from revalidator import Revalidator
+from repositorystore import RepositoryStore
+from searchindex import SearchIndex
+from graphqlqueries import QueryRegistry
+from jsoncodec import create_codec
+from jsoncodec import ResponseFragment
+from compression import ResponseCompressor
+from metrics import BackendMetrics
+from startup import LazyLogger
+from startup import Readiness
+
+log = LazyLogger( os.environ.get( 'REACT_APP_GITHUB_RESEARCHER_DEBUG_LEVEL' ), 'researcher' )
+
+# The startup work running on background, while the backend already accepts connections, where
+# `/ready` answers when all of it has finished, and `/health` answers as soon as the backend starts
+READINESS = Readiness()
+STARTUP_PROBE = os.environ.get( 'GITHUB_RESEARCHER_STARTUP_PROBE', 'background' )
+
+# Decodes the Github responses and encodes the endpoints results, where `json` has the same output as
+# `json.dumps()`, and `auto` uses the faster `orjson` when it is installed
+JSON_CODEC = create_codec( os.environ.get( 'GITHUB_RESEARCHER_JSON_CODEC', 'auto' ) )
 
 # https://gist.github.com/gbaman/b3137e18c739e0cf98539bf4ec4366ad
-graphql_url = "https://api.github.com/graphql"
-headers = { "Authorization": f"Bearer {os.environ.get( 'REACT_APP_GITHUB_RESEARCHER_TOKEN' )}" }
+# Another url, as the `tests/fakegithub.py` stand-in, runs the backend without the Github API
+graphql_url = os.environ.get( 'GITHUB_RESEARCHER_GRAPHQL_URL', "https://api.github.com/graphql" )
+
+# Shared by all threads, so each request does not pay a new TCP/TLS handshake with Github
+CONNECTION_POOL = ConnectionPool(
+    poolsize=int( os.environ.get( 'GITHUB_RESEARCHER_POOL_SIZE', 10 ) ),
+    connecttimeout=float( os.environ.get( 'GITHUB_RESEARCHER_CONNECT_TIMEOUT', 5 ) ),
+    readtimeout=float( os.environ.get( 'GITHUB_RESEARCHER_READ_TIMEOUT', 30 ) ),
+    retries=int( os.environ.get( 'GITHUB_RESEARCHER_RETRIES', 3 ) ),
+    backoff=float( os.environ.get( 'GITHUB_RESEARCHER_RETRY_BACKOFF', 0.5 ) ),
+)
+
+# After several consecutive Github failures, the calls fail fast for a while, instead of each request
+# waiting for its own timeout, where 0 failures disables it
+CIRCUIT_BREAKER = CircuitBreaker(
+    failurethreshold=int( os.environ.get( 'GITHUB_RESEARCHER_CIRCUIT_FAILURES', 5 ) ),
+    resettimeout=float( os.environ.get( 'GITHUB_RESEARCHER_CIRCUIT_RESET', 30 ) ),
+)
+
+# How many seconds each endpoint results can be reused, where 0 disables the cache for the endpoint
+CACHE_TTLS = {
+    "search_github": float( os.environ.get( 'GITHUB_RESEARCHER_CACHE_TTL_SEARCH', 60 ) ),
+    "list_repositories": float( os.environ.get( 'GITHUB_RESEARCHER_CACHE_TTL_LIST', 120 ) ),
+    "detail_repository": float( os.environ.get( 'GITHUB_RESEARCHER_CACHE_TTL_DETAIL', 300 ) ),
+    "owner_portfolio": float( os.environ.get( 'GITHUB_RESEARCHER_CACHE_TTL_PORTFOLIO', 120 ) ),
+}
+
+# For how many seconds after its time to live each endpoint results are still served from the cache,
+# while they are refreshed on background, where 0 makes the requests wait for Github after the TTL
+STALE_TTLS = {
+    "search_github": float( os.environ.get( 'GITHUB_RESEARCHER_CACHE_STALE_SEARCH', 30 ) ),
+    "list_repositories": float( os.environ.get( 'GITHUB_RESEARCHER_CACHE_STALE_LIST', 60 ) ),
+    "detail_repository": float( os.environ.get( 'GITHUB_RESEARCHER_CACHE_STALE_DETAIL', 300 ) ),
+    "owner_portfolio": float( os.environ.get( 'GITHUB_RESEARCHER_CACHE_STALE_PORTFOLIO', 60 ) ),
+}
+
+# With several worker processes or replicas, the results and the rate limit budgets can be shared
+# by all of them, on a Redis compatible server or on a SQLite database on a memory file system
+SHARED_CACHE_URL = os.environ.get( 'GITHUB_RESEARCHER_SHARED_CACHE' )
+
+RESPONSE_CACHE = SharedCache(
+    create_backend( SHARED_CACHE_URL ),
+    prefix=os.environ.get( 'GITHUB_RESEARCHER_SHARED_CACHE_PREFIX', 'githubresearcher:' ),
+) if SHARED_CACHE_URL else ResponseCache(
+    maxentries=int( os.environ.get( 'GITHUB_RESEARCHER_CACHE_ENTRIES', 1000 ) ),
+    maxbytes=int( os.environ.get( 'GITHUB_RESEARCHER_CACHE_BYTES', 64 * 1024 * 1024 ) ),
+)
+
+# Concurrent requests for the same query and variables wait for a single Github request
+SINGLE_FLIGHT = SingleFlight()
+
+# Each call uses the token with the most remaining budget, updated by each Github response `rateLimit`
+TOKEN_POOL = TokenPool.from_environment( os.environ.get( 'REACT_APP_GITHUB_RESEARCHER_TOKEN' ) )
+
+if SHARED_CACHE_URL:
+    TOKEN_POOL.share( SharedBudgets( RESPONSE_CACHE,
+            interval=float( os.environ.get( 'GITHUB_RESEARCHER_SHARED_BUDGET_INTERVAL', 1 ) ) ) )
+
+# All Github calls go through the scheduler, which runs the interactive calls first, and delays or
+# sheds the less important ones when the rate limit is running out
+ENDPOINT_PRIORITIES = {
+    "detail_repository": INTERACTIVE_PRIORITY,
+    "search_github": SEARCH_PRIORITY,
+    "list_repositories": SEARCH_PRIORITY,
+    "owner_portfolio": SEARCH_PRIORITY,
+}
+
+SCHEDULER = UpstreamScheduler(
+    TOKEN_POOL,
+    maxconcurrent=int( os.environ.get( 'GITHUB_RESEARCHER_SCHEDULER_CONCURRENCY', CONNECTION_POOL.poolsize ) ),
+    reserves={
+        INTERACTIVE_PRIORITY: 0,
+        SEARCH_PRIORITY: int( os.environ.get( 'GITHUB_RESEARCHER_SEARCH_RESERVE', 100 ) ),
+        PREFETCH_PRIORITY: int( os.environ.get( 'GITHUB_RESEARCHER_PREFETCH_MIN_REMAINING', 1000 ) ),
+    },
+    maxdelay=float( os.environ.get( 'GITHUB_RESEARCHER_SCHEDULER_MAX_DELAY', 10 ) ),
+)
+
+# After serving a page, fetch its next page on background, as users usually ask for it right after
+PREFETCH_ENDPOINTS = { "search_github", "list_repositories" }
+PREFETCHER = Prefetcher(
+    TOKEN_POOL,
+    workers=int( os.environ.get( 'GITHUB_RESEARCHER_PREFETCH_WORKERS', 2 ) ),
+    ttl=float( os.environ.get( 'GITHUB_RESEARCHER_PREFETCH_TTL', 30 ) ),
+    minremaining=int( os.environ.get( 'GITHUB_RESEARCHER_PREFETCH_MIN_REMAINING', 1000 ) ),
+    maxpending=int( os.environ.get( 'GITHUB_RESEARCHER_PREFETCH_MAX_PENDING', 8 ) ),
+) if os.environ.get( 'GITHUB_RESEARCHER_PREFETCH', 'disabled' ) == 'enabled' else None
+
+# Repositories fetched by all endpoints are kept on disk, so `/detail_repository` results are
+# served from it after a restart, and refreshed on background when they are older than `staleafter`
+REPOSITORY_STORE = RepositoryStore(
+    os.environ['GITHUB_RESEARCHER_STORE_PATH'],
+    staleafter=float( os.environ.get( 'GITHUB_RESEARCHER_STORE_STALE_AFTER', 3600 ) ),
+    maxage=float( os.environ.get( 'GITHUB_RESEARCHER_STORE_MAX_AGE', 7 * 24 * 3600 ) ),
+) if os.environ.get( 'GITHUB_RESEARCHER_STORE_PATH' ) else None
+
+# The repositories received from the Github search, for the type-ahead `/search_local` queries
+SEARCH_INDEX_SIZE = int( os.environ.get( 'GITHUB_RESEARCHER_SEARCH_INDEX_SIZE', 50000 ) )
+SEARCH_INDEX = SearchIndex( maxrepositories=SEARCH_INDEX_SIZE ) if SEARCH_INDEX_SIZE > 0 else None
+
+if SEARCH_INDEX is not None and REPOSITORY_STORE is not None:
+    READINESS.start( "searchIndex", lambda: SEARCH_INDEX.add( REPOSITORY_STORE.search_nodes( SEARCH_INDEX_SIZE ) ) )
+
+STORE_REFRESHING = set()
+STORE_REFRESHING_LOCK = threading.Lock()
+STORE_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int( os.environ.get( 'GITHUB_RESEARCHER_STORE_WORKERS', 2 ) ),
+    thread_name_prefix="repository_store",
+)
+
+# How many repositories `/detail_repositories` accepts and fetches by Github request, and how many
+# of these Github requests are run concurrently
+BATCH_MAX_REPOSITORIES = int( os.environ.get( 'GITHUB_RESEARCHER_BATCH_MAX_REPOSITORIES', 500 ) )
+BATCH_CHUNK_SIZE = int( os.environ.get( 'GITHUB_RESEARCHER_BATCH_CHUNK_SIZE', 50 ) )
+BATCH_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int( os.environ.get( 'GITHUB_RESEARCHER_BATCH_WORKERS', 4 ) ),
+    thread_name_prefix="detail_repositories",
+)
+
+# `/search_github_stream` default page size, maximum items by request, and how many pages are
+# prefetched concurrently across all streams
+STREAM_PAGE_SIZE = int( os.environ.get( 'GITHUB_RESEARCHER_STREAM_PAGE_SIZE', 25 ) )
+STREAM_MAX_ITEMS = int( os.environ.get( 'GITHUB_RESEARCHER_STREAM_MAX_ITEMS', 1000 ) )
+STREAM_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int( os.environ.get( 'GITHUB_RESEARCHER_STREAM_WORKERS', 8 ) ),
+    thread_name_prefix="search_github_stream",
+)
+
+# With a shared cache, each stale result is refreshed by the first worker process claiming it
+REVALIDATE_CLAIM_TTL = float( os.environ.get( 'GITHUB_RESEARCHER_REVALIDATE_CLAIM_TTL', 10 ) )
+
+REVALIDATOR = Revalidator(
+    TOKEN_POOL,
+    workers=int( os.environ.get( 'GITHUB_RESEARCHER_REVALIDATE_WORKERS', 2 ) ),
+    minremaining=int( os.environ.get( 'GITHUB_RESEARCHER_REVALIDATE_MIN_REMAINING', 100 ) ),
+    maxpending=int( os.environ.get( 'GITHUB_RESEARCHER_REVALIDATE_MAX_PENDING', 32 ) ),
+    claim=( lambda cachekey: claim_revalidation( cachekey ) ) if SHARED_CACHE_URL else None,
+)
+
+# `/owner_portfolio` page size, which Github accepts up to 100, and maximum repositories by request
+PORTFOLIO_PAGE_SIZE = int( os.environ.get( 'GITHUB_RESEARCHER_PORTFOLIO_PAGE_SIZE', 100 ) )
+PORTFOLIO_MAX_ITEMS = int( os.environ.get( 'GITHUB_RESEARCHER_PORTFOLIO_MAX_ITEMS', 1000 ) )
+
+# How many seconds browsers and proxies can reuse each endpoint response, as `Cache-Control: max-age`
+# https://developer.mozilla.org/en-US/docs/Web/HTTP/Caching
+HTTP_MAX_AGES = {
+    "search_github": int( os.environ.get( 'GITHUB_RESEARCHER_HTTP_MAX_AGE_SEARCH', 60 ) ),
+    "list_repositories": int( os.environ.get( 'GITHUB_RESEARCHER_HTTP_MAX_AGE_LIST', 120 ) ),
+    "detail_repository": int( os.environ.get( 'GITHUB_RESEARCHER_HTTP_MAX_AGE_DETAIL', 300 ) ),
+}
+
+# Responses with at least `minsize` bytes are compressed as negotiated by the request `Accept-Encoding`
+RESPONSE_COMPRESSOR = ResponseCompressor(
+    minsize=int( os.environ.get( 'GITHUB_RESEARCHER_COMPRESSION_MIN_SIZE', 1024 ) ),
+    gziplevel=int( os.environ.get( 'GITHUB_RESEARCHER_GZIP_LEVEL', 6 ) ),
+    brotliquality=int( os.environ.get( 'GITHUB_RESEARCHER_BROTLI_QUALITY', 4 ) ),
+    memoizesize=int( os.environ.get( 'GITHUB_RESEARCHER_COMPRESSION_MEMOIZE_SIZE', 8192 ) ),
+    maxbytes=int( os.environ.get( 'GITHUB_RESEARCHER_COMPRESSION_BYTES', 32 * 1024 * 1024 ) ),
+) if os.environ.get( 'GITHUB_RESEARCHER_COMPRESSION', 'enabled' ) == 'enabled' else None
+
+# The GET requests send the same fields as the POST requests JSON, but as query arguments strings
+QUERY_ARGUMENT_TYPES = {
+    "itemsPerPage": int,
+    "maxItems": int,
+    "mergeLocal": bool,
+}
+
+# https://developer.mozilla.org/en-US/docs/Web/API/Server-sent_events/Using_server-sent_events
+STREAM_FORMATS = {
+    "ndjson": ( "application/x-ndjson", lambda event, data: JSON_CODEC.dumps( data ) + b"\n" ),
+    "sse": ( "text/event-stream", lambda event, data: b"event: %s\ndata: %s\n\n" % ( event.encode( "UTF-8" ), JSON_CODEC.dumps( data ) ) ),
+}
+
+# Each query is minified and hashed once, and with `GITHUB_RESEARCHER_PERSISTED_QUERIES`, only their
+# hash is sent to an upstream supporting persisted queries
+QUERY_REGISTRY = QueryRegistry(
+    persisted=os.environ.get( 'GITHUB_RESEARCHER_PERSISTED_QUERIES', 'disabled' ) == 'enabled',
+)
+
+# The `/metrics` endpoint, where the requests and the Github calls are only timed when it is enabled,
+# and with `GITHUB_RESEARCHER_METRICS_DIRECTORY`, the metrics of all worker processes are summed
+METRICS = BackendMetrics(
+    collect_stats=lambda: collect_stats(),
+    directory=os.environ.get( 'GITHUB_RESEARCHER_METRICS_DIRECTORY' ) or None,
+    interval=float( os.environ.get( 'GITHUB_RESEARCHER_METRICS_INTERVAL', 5 ) ),
+) if os.environ.get( 'GITHUB_RESEARCHER_METRICS', 'disabled' ) == 'enabled' else None
 
 # https://stackoverflow.com/questions/15117416/capture-arbitrary-path-in-flask-route
 # https://stackoverflow.com/questions/44209978/serving-a-front-end-created-with-create-react-app-with-flask
@@ -29,11 +253,15 @@ APP = flask.Flask(
     template_folder="reactfrontend/build",
 )
 
+# Flask does not accept new request hooks after the first request, then, `flask_cors` cannot be set up
+# later, but it is only imported when the frontend is served from another origin
 # https://stackoverflow.com/questions/25594893/how-to-enable-cors-in-flask-and-heroku
 # https://stackoverflow.com/questions/43871637/no-access-control-allow-origin-header-is-present
-flask_cors.CORS( APP )
+if os.environ.get( 'GITHUB_RESEARCHER_CORS', 'enabled' ) == 'enabled':
+    import flask_cors
+    flask_cors.CORS( APP )
 
-github_ratelimit_graphql = wrap_text( """
+github_ratelimit_graphql = textwrap.dedent( """
     rateLimit {
         limit
         cost
@@ -45,23 +273,180 @@ github_ratelimit_graphql = wrap_text( """
     }
 """ )
 
+github_repository_details_graphql = textwrap.dedent( """
+    createdAt
+    issues(states:OPEN) {
+        totalCount
+    }
+    languages(first: 1) {
+        nodes {
+            name
+        }
+    }
+""" )
+
+# https://github.community/t5/GitHub-API-Development-and/graphql-search-query-format/td-p/19238
+search_github_graphqlquery = QUERY_REGISTRY.register( textwrap.dedent( """
+    query SearchRepositories($query: String!, $items: Int!, $lastItem: String) {
+      search(first: $items, query: $query, type: REPOSITORY, after: $lastItem) {
+        pageInfo {
+          hasNextPage
+          endCursor
+        }
+        repositoryCount
+        nodes {
+          ... on Repository {
+            nameWithOwner
+            description
+            stargazers {
+              totalCount
+            }
+          }
+        }
+      }
+      %s
+    }
+""" ) % github_ratelimit_graphql )
+
+# https://stackoverflow.com/questions/39551325/github-graphql-orderby
+# https://stackoverflow.com/questions/48116781/github-api-v4-how-can-i-traverse-with-pagination-graphql
+list_repositories_graphqlquery = QUERY_REGISTRY.register( textwrap.dedent( """
+    query ListRepositories($user: String!, $items: Int!, $lastItem: String) {
+      repositoryOwner(login: $user) {
+        repositories(first: $items, after: $lastItem, orderBy: {field: STARGAZERS, direction: DESC}) {
+          pageInfo {
+            hasNextPage
+            endCursor
+          }
+          nodes {
+            name
+          }
+        }
+      }
+      %s
+    }
+""" ) % github_ratelimit_graphql )
+
+# Shared by `/detail_repository` and `/detail_repositories`, so both use the same cache keys
+# https://graphql.org/learn/queries/
+detail_repository_graphqlquery = QUERY_REGISTRY.register( textwrap.dedent( """
+    query GetRepository($user: String!, $repo: String!) {
+      repository(owner: $user, name: $repo) {
+        %s
+      }
+      %s
+    }
+""" ) % ( github_repository_details_graphql, github_ratelimit_graphql ) )
+
+# The `/list_repositories` and `/detail_repository` fields of each repository on a single query
+owner_portfolio_graphqlquery = QUERY_REGISTRY.register( textwrap.dedent( """
+    query OwnerPortfolio($user: String!, $items: Int!, $lastItem: String) {
+      repositoryOwner(login: $user) {
+        repositories(first: $items, after: $lastItem, orderBy: {field: STARGAZERS, direction: DESC}) {
+          totalCount
+          pageInfo {
+            hasNextPage
+            endCursor
+          }
+          nodes {
+            name
+            nameWithOwner
+            description
+            stargazers {
+              totalCount
+            }
+            %s
+          }
+        }
+      }
+      %s
+    }
+""" ) % ( github_repository_details_graphql, github_ratelimit_graphql ) )
+
+ratelimit_graphqlquery = QUERY_REGISTRY.register( f"query RateLimit {{{github_ratelimit_graphql}}}" )
+
 def main():
-    log( f"headers {str(headers)[:30]}..." )
+    log( f"tokens {', '.join( str( token ) for token in TOKEN_POOL.tokens )}..." )
     log( f"REACT_APP_GITHUB_RESEARCHER_BACKEND_PORT {os.environ.get( 'REACT_APP_GITHUB_RESEARCHER_BACKEND_PORT' )}..." )
 
-    graphqlresults = run_graphql_query( f"{{{github_ratelimit_graphql}}}" )
-    log( formatratelimit( graphqlresults["data"] ) )
+    host = "0.0.0.0"
+    port = int( os.environ["REACT_APP_GITHUB_RESEARCHER_BACKEND_PORT"] )
+    engine = os.environ.get( 'GITHUB_RESEARCHER_ENGINE', 'threaded' )
 
-    APP.run(
-        threaded=True,
-        debug=True,
-        host="0.0.0.0",
-        port=os.environ["REACT_APP_GITHUB_RESEARCHER_BACKEND_PORT"]
-    )
+    # The production server master process should not keep the state of this module, which each
+    # worker process creates after it is forked, then, this process is replaced by it, as when
+    # `run_backend.sh` starts the `productionserver.py` directly
+    if os.environ.get( 'GITHUB_RESEARCHER_SERVER', 'development' ) == 'production':
+        productionserver = os.path.join( os.path.dirname( os.path.realpath( __file__ ) ), "productionserver.py" )
+        os.execv( sys.executable, [ sys.executable, productionserver ] )
+
+    if STARTUP_PROBE == 'blocking':
+        probe_github()
+
+    start_startup_probe()
+
+    # https://www.uvicorn.org/deployment/#running-programmatically
+    if engine == 'async':
+        import uvicorn
+        import asyncrun
 
+        uvicorn.run(
+            asyncrun.ASGI_APP,
+            host=host,
+            port=port,
+        )
 
-def formatratelimit(resultdata):
-    return (
+    else:
+        APP.run(
+            threaded=True,
+            debug=True,
+            host=host,
+            port=port
+        )
+
+
+def probe_github():
+    """ Logs the Github rate limit, which fails the startup when blocking, otherwise, it is retried on background. """
+
+    try:
+        graphqlresults = run_graphql_query( ratelimit_graphqlquery )
+        log( formatratelimit( graphqlresults["data"] ) )
+
+    except Exception as error:
+        log.error( f"Could not fetch the Github rate limit! {type( error ).__name__}: {error}" )
+        raise
+
+
+def start_startup_probe():
+    """ Called once by each process serving requests, where `/ready` waits for Github to answer. """
+
+    if STARTUP_PROBE != 'disabled':
+        READINESS.start( "githubProbe", probe_github )
+
+
+def shutdown():
+    """ Called by the production server when a worker is gracefully stopped. """
+    BATCH_EXECUTOR.shutdown( wait=True )
+    STREAM_EXECUTOR.shutdown( wait=True )
+    STORE_EXECUTOR.shutdown( wait=True )
+
+    REVALIDATOR.shutdown()
+
+    if PREFETCHER is not None:
+        PREFETCHER.shutdown()
+
+    CONNECTION_POOL.close()
+
+    if REPOSITORY_STORE is not None:
+        REPOSITORY_STORE.close()
+
+    if METRICS is not None:
+        METRICS.share( force=True )
+
+
+def formatratelimit(resultdata, cacheage=None):
+    """ When the results come from the cache, `cacheage` tells how many seconds ago they were fetched. """
+    ratelimit = (
         f"{resultdata['viewer']['login']}, "
         f"limit {resultdata['rateLimit']['remaining']}, "
         f"cost {resultdata['rateLimit']['cost']}, "
@@ -69,34 +454,81 @@ def formatratelimit(resultdata):
         f"{resultdata['rateLimit']['resetAt']}, "
     )
 
+    if cacheage is not None:
+        ratelimit += f"stale, cached {cacheage:.0f} seconds ago, "
+
+    return ratelimit
+
 
 def getstacktrace():
     return "".join( traceback.format_exception( *sys.exc_info() ) )
 
 
 def catch_remote_exceptions(wrapped_function):
-    """ https://stackoverflow.com/questions/6126007/python-getting-a-traceback-from-a-multiprocessing-process """
+    """
+        Logs the stack trace of unexpected exceptions, which are still raised as they are.
+        https://stackoverflow.com/questions/6126007/python-getting-a-traceback-from-a-multiprocessing-process
+    """
 
     @functools.wraps(wrapped_function)
     def new_function(*args, **kwargs):
         try:
             return wrapped_function(*args, **kwargs)
 
-        except:
-            raise Exception( getstacktrace() )
+        except Exception:
+            log.error( f"Unexpected error on {wrapped_function.__name__}!\n{getstacktrace()}" )
+            raise
 
     return new_function
 
 
-class InvalidRequest(Exception):
-    def __init__(self, flaskResponse):
-        self.flaskResponse = flaskResponse
+def error_response(error):
+    """ The compact JSON body of a `BackendError`, where its stack trace is never sent. """
+    headers = {}
+
+    if error.retryafter is not None:
+        headers["Retry-After"] = str( int( error.retryafter ) + 1 )
+
+    return flask.Response( JSON_CODEC.dumps( error.body() ), status=error.status, mimetype='application/json', headers=headers )
+
+
+def unexpected_error(name):
+    """ Logs the stack trace of the exception being handled, returning a generic `BackendError`. """
+    log.error( f"Unexpected error on {name}!\n{getstacktrace()}" )
+    return BackendError( "The backend could not process the request!" )
+
+
+def get_search_data():
+    """ Returns the POST request JSON, or the GET request query arguments converted to their types. """
+
+    if flask.request.method != 'GET':
+        search_data = flask.request.get_json( silent=True )
+
+        if not isinstance( search_data, dict ):
+            raise InvalidInput( "Invalid JSON on your post query!" )
+
+        return search_data
+
+    search_data = {}
+    for keyword, value in flask.request.args.items():
+        datatype = QUERY_ARGUMENT_TYPES.get( keyword, str )
+
+        try:
+            if datatype is bool:
+                search_data[keyword] = { "true": True, "false": False }[value.lower()]
+
+            else:
+                search_data[keyword] = datatype( value )
+
+        except ( KeyError, ValueError ):
+            raise InvalidInput( f"'{keyword}={value}' must be of type {datatype}!" )
+
+    return search_data
 
 
 def validate_request_data(keyword, dictionary, datatype):
     if keyword not in dictionary:
-        raise InvalidRequest( flask.Response(
-            f"Error: Missing '{keyword}' on your post query!", status=400, mimetype='text/plain' ) )
+        raise InvalidInput( f"Missing '{keyword}' on your post query!" )
 
     validate_request_dictionary(keyword, dictionary, datatype)
 
@@ -106,198 +538,988 @@ def validate_request_dictionary(keyword, dictionary, datatype):
         container = dictionary[keyword]
 
         if not isinstance( container, datatype ):
-            raise InvalidRequest( flask.Response(
-                f"Error: '{keyword}={container}' must be of type {datatype}!", status=400, mimetype='text/plain' ) )
+            raise InvalidInput( f"'{keyword}={container}' must be of type {datatype}!" )
+
+
+def collect_stats():
+    return {
+        "connectionPool": CONNECTION_POOL.stats(),
+        "responseCache": RESPONSE_CACHE.stats(),
+        "singleFlight": SINGLE_FLIGHT.stats(),
+        "rateLimit": TOKEN_POOL.stats(),
+        "scheduler": SCHEDULER.stats(),
+        "prefetcher": PREFETCHER.stats() if PREFETCHER else None,
+        "revalidator": REVALIDATOR.stats(),
+        "searchIndex": SEARCH_INDEX.stats() if SEARCH_INDEX else None,
+        "queryRegistry": QUERY_REGISTRY.stats(),
+        "compression": RESPONSE_COMPRESSOR.stats() if RESPONSE_COMPRESSOR else None,
+        "repositoryStore": dict( REPOSITORY_STORE.stats(), refreshing=len( STORE_REFRESHING ) ) if REPOSITORY_STORE else None,
+        "circuitBreaker": CIRCUIT_BREAKER.stats(),
+    }
+
+
+@APP.route('/rate_limit', endpoint='rate_limit', methods=['GET'])
+def rate_limit():
+    results = {
+        "rateLimit": TOKEN_POOL.stats(),
+        "scheduler": SCHEDULER.stats(),
+    }
+
+    dumped_json = JSON_CODEC.dumps( results )
+    return flask.Response( dumped_json, status=200, mimetype='application/json' )
+
+
+@APP.route('/health', endpoint='health', methods=['GET'])
+def health():
+    """ Liveness, which does not depend on Github or on the startup work. """
+    return flask.Response( b'{"status": "ok"}', status=200, mimetype='application/json' )
+
+
+@APP.route('/ready', endpoint='ready', methods=['GET'])
+def ready():
+    status, results = readiness()
+    return flask.Response( JSON_CODEC.dumps( results ), status=status, mimetype='application/json' )
+
+
+def readiness():
+    """ Returns the `/ready` status code and results, shared by both engines. """
+    results = READINESS.stats()
+    results["circuitBreaker"] = CIRCUIT_BREAKER.stats()["state"]
+    return 200 if results["ready"] else 503, results
+
+
+@APP.route('/metrics', endpoint='metrics', methods=['GET'])
+def metrics():
+
+    if METRICS is None:
+        return error_response( NotFound( "The metrics are disabled!" ) )
 
+    return flask.Response( METRICS.render(), status=200, mimetype='text/plain; version=0.0.4' )
 
+
+@APP.before_request
+def start_request_metrics():
+
+    if METRICS is not None:
+        flask.g.requeststart = time.perf_counter()
+        METRICS.requestsinflight.inc()
+
+
+# The `after_request` functions run in the reverse order they were registered, then, this one is
+# registered before `compress_response`, so the request duration includes the compression time
+@APP.after_request
+def observe_request_metrics(response):
+    """ The streamed responses are observed when they start, not when they finish. """
+
+    if METRICS is not None and "requeststart" in flask.g:
+        METRICS.requestduration.observe( time.perf_counter() - flask.g.requeststart,
+                flask.request.endpoint or "unknown", flask.request.method, str( response.status_code ) )
+        METRICS.share()
+
+    return response
+
+
+@APP.teardown_request
+def finish_request_metrics(error=None):
+
+    if METRICS is not None and "requeststart" in flask.g:
+        METRICS.requestsinflight.dec()
+
+
+@APP.route('/stats', endpoint='stats', methods=['GET'])
+def stats():
+    dumped_json = JSON_CODEC.dumps( collect_stats() )
+    return flask.Response( dumped_json, status=200, mimetype='application/json' )
+
+
+def parse_search_github(search_data):
+    validate_request_data( "searchQuery", search_data, str )
+    validate_request_dictionary( "lastItemId", search_data, (str, type(None)) )
+    validate_request_dictionary( "itemsPerPage", search_data, int )
+    validate_request_dictionary( "mergeLocal", search_data, bool )
+
+    return {
+        "query": search_data["searchQuery"],
+        "items": search_data.get( "itemsPerPage", 3 ),
+        "lastItem": search_data.get( "lastItemId", None ),
+    }
+
+
+def format_search_github(graphqlresults):
+    results = {}
+    results["repositoryCount"] = graphqlresults["data"]["search"]["repositoryCount"]
+    results["repositories"] = graphqlresults["data"]["search"]["nodes"]
+    results["lastItemId"] = graphqlresults["data"]["search"]["pageInfo"]["endCursor"]
+    results["hasMorePages"] = graphqlresults["data"]["search"]["pageInfo"]["hasNextPage"]
+    return results
+
+
+def parse_list_repositories(search_data):
+    validate_request_data( "repositoryUser", search_data, str )
+    validate_request_dictionary( "lastItemId", search_data, (str, type(None)) )
+    validate_request_dictionary( "itemsPerPage", search_data, int )
+
+    return {
+        "user": search_data["repositoryUser"],
+        "lastItem": search_data.get( "lastItemId", None ),
+        "items": search_data.get( "itemsPerPage", 3 ),
+    }
+
+
+def format_list_repositories(graphqlresults):
+    results = {}
+    results["repositories"] = graphqlresults["data"]["repositoryOwner"]["repositories"]["nodes"]
+    results["lastItemId"] = graphqlresults["data"]["repositoryOwner"]["repositories"]["pageInfo"]["endCursor"]
+    results["hasMorePages"] = graphqlresults["data"]["repositoryOwner"]["repositories"]["pageInfo"]["hasNextPage"]
+    return results
+
+
+def parse_detail_repository(search_data):
+    validate_request_data( "repositoryUser", search_data, str )
+    validate_request_data( "repositoryName", search_data, str )
+
+    return {
+        "user": search_data["repositoryUser"],
+        "repo": search_data["repositoryName"],
+    }
+
+
+def format_detail_repository(graphqlresults):
+    return graphqlresults["data"]["repository"]
+
+
+def parse_owner_portfolio(search_data):
+    validate_request_data( "repositoryUser", search_data, str )
+    validate_request_dictionary( "lastItemId", search_data, (str, type(None)) )
+    validate_request_dictionary( "itemsPerPage", search_data, int )
+
+    return {
+        "user": search_data["repositoryUser"],
+        "lastItem": search_data.get( "lastItemId", None ),
+        "items": min( search_data.get( "itemsPerPage", PORTFOLIO_PAGE_SIZE ), 100 ),
+    }
+
+
+def format_owner_portfolio(graphqlresults):
+    owner = graphqlresults["data"]["repositoryOwner"]
+
+    if owner is None:
+        raise NotFound( "Github could not find the requested user!" )
+
+    results = {}
+    results["repositoryCount"] = owner["repositories"]["totalCount"]
+    results["repositories"] = owner["repositories"]["nodes"]
+    results["lastItemId"] = owner["repositories"]["pageInfo"]["endCursor"]
+    results["hasMorePages"] = owner["repositories"]["pageInfo"]["hasNextPage"]
+    return results
+
+
+# The query, request parser and results formatter of each endpoint, shared by the threaded
+# Flask application and the asynchronous application on `asyncrun.py`. The formatted results do
+# not have the `rateLimit` field, as it is added to their encoded bytes by `ResponseFragment.body()`
+ENDPOINTS = {
+    "search_github": ( search_github_graphqlquery, parse_search_github, format_search_github ),
+    "list_repositories": ( list_repositories_graphqlquery, parse_list_repositories, format_list_repositories ),
+    "detail_repository": ( detail_repository_graphqlquery, parse_detail_repository, format_detail_repository ),
+}
+
+# The same for the pages of the endpoints which fetch several pages by request, as `/owner_portfolio`
+PAGED_ENDPOINTS = {
+    "owner_portfolio": ( owner_portfolio_graphqlquery, parse_owner_portfolio, format_owner_portfolio ),
+}
+
+
+def run_endpoint(endpoint):
+
+    try:
+        search_data = get_search_data()
+        log( 4, f"search_data {search_data}" )
+
+        graphqlquery, parse_request, format_results = ENDPOINTS[endpoint]
+        queryvariables = parse_request( search_data )
+
+        fragment, cacheage = run_cached_graphql_query( endpoint, graphqlquery, queryvariables )
+        prefetch_next_page( endpoint, queryvariables, fragment )
+
+        if endpoint == "search_github" and search_data.get( "mergeLocal" ):
+            fragment = merge_local_search( queryvariables, fragment )
+
+    except BackendError as error:
+        return error_response( error )
+
+    except Exception:
+        return error_response( unexpected_error( endpoint ) )
+
+    return cacheable_response( endpoint, fragment, cacheage )
+
+
+def cacheable_response(endpoint, fragment, cacheage):
+    """
+        The `ETag` is weak, as it is computed over the results without their `rateLimit` field,
+        which changes by request, and when it matches the request `If-None-Match`, the response
+        is a `304 Not Modified` without the results.
+        https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/ETag
+    """
+    etag = hashlib.sha256( fragment.fragment ).hexdigest()[:32]
+    headers = {
+        "Cache-Control": f"public, max-age={HTTP_MAX_AGES[endpoint]}",
+        "Vary": "Accept-Encoding",
+    }
+
+    # https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/Cache-Control#stale-while-revalidate
+    if STALE_TTLS[endpoint] > 0:
+        headers["Cache-Control"] += f", stale-while-revalidate={int( STALE_TTLS[endpoint] )}"
+
+    # https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/Age
+    if cacheage is not None:
+        headers["Age"] = str( int( cacheage ) )
+
+    if flask.request.if_none_match.contains_weak( etag ):
+        response = flask.Response( status=304, headers=headers )
+
+    else:
+        dumped_json = fragment.body( formatratelimit( fragment.ratelimitdata, cacheage ) )
+        response = flask.Response( dumped_json, status=200, mimetype='application/json', headers=headers )
+
+        # All responses with this `etag` start with the same bytes, the results before their `rateLimit`
+        flask.g.compressionprefix = ( etag, len( fragment.fragment ) - 1 )
+
+    response.set_etag( etag, weak=True )
+    return response
+
+
+@APP.after_request
+def compress_response(response):
+    """ The streamed responses are not compressed, so each event is sent as soon as it is ready. """
+
+    if RESPONSE_COMPRESSOR is None or response.status_code != 200 \
+            or response.is_streamed or response.direct_passthrough or "Content-Encoding" in response.headers:
+        return response
+
+    body = response.get_data()
+    prefixkey, prefixsize = flask.g.get( "compressionprefix", ( None, 0 ) )
+    encoding = RESPONSE_COMPRESSOR.choose_encoding( flask.request.accept_encodings, body, prefixkey, prefixsize )
+    response.vary.add( "Accept-Encoding" )
+
+    if encoding is not None:
+        response.set_data( RESPONSE_COMPRESSOR.compress( body, encoding, prefixkey, prefixsize ) )
+        response.headers["Content-Encoding"] = encoding
+
+    return response
+
+
+@APP.route('/search_github', endpoint='search_github', methods=['POST', 'GET'])
 @catch_remote_exceptions
-@APP.route('/search_github', endpoint='search_github', methods=['POST'])
 def search_github():
+    return run_endpoint( "search_github" )
+
+
+@APP.route('/list_repositories', endpoint='list_repositories', methods=['POST', 'GET'])
+@catch_remote_exceptions
+def list_repositories():
+    return run_endpoint( "list_repositories" )
+
+
+@APP.route('/detail_repository', endpoint='detail_repository', methods=['POST', 'GET'])
+@catch_remote_exceptions
+def detail_repository():
+    return run_endpoint( "detail_repository" )
+
+
+@APP.route('/search_local', endpoint='search_local', methods=['POST', 'GET'])
+@catch_remote_exceptions
+def search_local():
     results = {}
 
     try:
-        search_data = flask.request.json
+        search_data = get_search_data()
         log( 4, f"search_data {search_data}" )
 
         validate_request_data( "searchQuery", search_data, str )
-        validate_request_dictionary( "lastItemId", search_data, (str, type(None)) )
         validate_request_dictionary( "itemsPerPage", search_data, int )
+        items = search_data.get( "itemsPerPage", 10 )
 
-        queryvariables = {
-            "query": search_data["searchQuery"],
-            "items": search_data.get( "itemsPerPage", 3 ),
-            "lastItem": search_data.get( "lastItemId", None ),
-        }
+        if items < 1:
+            raise InvalidInput( f"'itemsPerPage={items}' must be at least 1!" )
 
-        # https://github.community/t5/GitHub-API-Development-and/graphql-search-query-format/td-p/19238
-        search_github_graphqlquery = wrap_text( """
-            query SearchRepositories($query: String!, $items: Int!, $lastItem: String) {
-              search(first: $items, query: $query, type: REPOSITORY, after: $lastItem) {
-                pageInfo {
-                  hasNextPage
-                  endCursor
-                }
-                repositoryCount
-                nodes {
-                  ... on Repository {
-                    nameWithOwner
-                    description
-                    stargazers {
-                      totalCount
-                    }
-                  }
-                }
-              }
-              %s
-            }
-        """ ) % github_ratelimit_graphql
-        graphqlresults = run_graphql_query( search_github_graphqlquery, queryvariables )
+        if SEARCH_INDEX is None:
+            raise Disabled( "The local search index is disabled!" )
 
-        results["repositoryCount"] = graphqlresults["data"]["search"]["repositoryCount"]
-        results["repositories"] = graphqlresults["data"]["search"]["nodes"]
-        results["lastItemId"] = graphqlresults["data"]["search"]["pageInfo"]["endCursor"]
-        results["hasMorePages"] = graphqlresults["data"]["search"]["pageInfo"]["hasNextPage"]
-        results["rateLimit"] = formatratelimit( graphqlresults["data"] )
+        results["repositoryCount"], results["repositories"] = SEARCH_INDEX.search( search_data["searchQuery"], items )
 
-    except InvalidRequest as error:
-        return error.flaskResponse
+    except BackendError as error:
+        return error_response( error )
 
     except Exception:
-        return flask.Response( getstacktrace(), status=500, mimetype='text/plain' )
+        return error_response( unexpected_error( "search_local" ) )
 
-    dumped_json = json.dumps( results )
+    dumped_json = JSON_CODEC.dumps( results )
     return flask.Response( dumped_json, status=200, mimetype='application/json' )
 
 
+def merge_local_search(queryvariables, fragment):
+    """
+        Appends to the first page of `/search_github` results the local index repositories which
+        are not on it yet, so repositories already seen show up while Github ranks the results.
+    """
+    if SEARCH_INDEX is None or queryvariables["lastItem"] is not None:
+        return fragment
+
+    results = fragment.results()
+    upstream = { repository["nameWithOwner"].lower() for repository in results["repositories"] if repository }
+    localcount, localrepositories = SEARCH_INDEX.search( queryvariables["query"], queryvariables["items"] + len( upstream ) )
+    localrepositories = [ repository for repository in localrepositories if repository["nameWithOwner"].lower() not in upstream ]
+
+    results["repositories"] = results["repositories"] + localrepositories[:queryvariables["items"]]
+    return ResponseFragment.from_results( JSON_CODEC, fragment.ratelimitdata, results )
+
+
+@APP.route('/search_github_stream', endpoint='search_github_stream', methods=['POST'])
 @catch_remote_exceptions
-@APP.route('/list_repositories', endpoint='list_repositories', methods=['POST'])
-def list_repositories():
+def search_github_stream():
+
+    try:
+        search_data = get_search_data()
+        log( 4, f"search_data {search_data}" )
+
+        queryvariables = parse_search_github( search_data )
+        validate_request_dictionary( "maxItems", search_data, int )
+        validate_request_dictionary( "format", search_data, str )
+
+        maxitems = min( search_data.get( "maxItems", 100 ), STREAM_MAX_ITEMS )
+        streamformat = search_data.get( "format", "ndjson" )
+
+        if streamformat not in STREAM_FORMATS:
+            raise InvalidInput( f"'format={streamformat}' must be one of {list( STREAM_FORMATS )}!" )
+
+        if "itemsPerPage" not in search_data:
+            queryvariables["items"] = STREAM_PAGE_SIZE
+
+    except BackendError as error:
+        return error_response( error )
+
+    return stream_response( "search_github", search_github_graphqlquery, queryvariables, maxitems, streamformat )
+
+
+def stream_response(endpoint, graphqlquery, queryvariables, maxitems, streamformat):
+    mimetype, encode_event = STREAM_FORMATS[streamformat]
+    return flask.Response(
+        stream_repositories( endpoint, graphqlquery, queryvariables, maxitems, encode_event ),
+        status=200,
+        mimetype=mimetype,
+        headers={ "Cache-Control": "no-cache", "X-Accel-Buffering": "no" },
+    )
+
+
+def fetch_pages(endpoint, graphqlquery, queryvariables, maxitems):
+    """
+        Yields a tuple `(results, fragment, cacheage)` for each page of the `endpoint` results,
+        until `maxitems` repositories, where the last page `repositories` are cut to `maxitems`.
+        While the repositories of a page are used, the next page is already being fetched.
+    """
+    sentitems = 0
+
+    def fetch_page(queryvariables):
+        queryvariables = dict( queryvariables, items=min( queryvariables["items"], maxitems - sentitems ) )
+        return STREAM_EXECUTOR.submit( run_cached_graphql_query, endpoint, graphqlquery, queryvariables )
+
+    nextpage = fetch_page( queryvariables ) if maxitems > 0 else None
+
+    while nextpage is not None:
+        fragment, cacheage = nextpage.result()
+        nextpage = None
+
+        results = fragment.results()
+        results["repositories"] = results["repositories"][:maxitems - sentitems]
+        sentitems += len( results["repositories"] )
+
+        if results["hasMorePages"] and sentitems < maxitems and results["repositories"]:
+            nextpage = fetch_page( dict( queryvariables, lastItem=results["lastItemId"] ) )
+
+        yield results, fragment, cacheage
+
+
+def stream_repositories(endpoint, graphqlquery, queryvariables, maxitems, encode_event):
+    """
+        Yields each repository as its own event, and then, an `end` event with the same fields as
+        the `endpoint` results, except the `repositories`.
+    """
     results = {}
 
     try:
-        search_data = flask.request.json
+        for results, fragment, cacheage in fetch_pages( endpoint, graphqlquery, queryvariables, maxitems ):
+
+            for repository in results.pop( "repositories" ):
+                yield encode_event( "repository", { "repository": repository } )
+
+            results["rateLimit"] = formatratelimit( fragment.ratelimitdata, cacheage )
+
+        yield encode_event( "end", results )
+
+    except BackendError as error:
+        yield encode_event( "error", error.body() )
+
+    except Exception:
+        yield encode_event( "error", unexpected_error( f"{endpoint}_stream" ).body() )
+
+
+@APP.route('/owner_portfolio', endpoint='owner_portfolio', methods=['POST'])
+@catch_remote_exceptions
+def owner_portfolio():
+
+    try:
+        search_data = get_search_data()
         log( 4, f"search_data {search_data}" )
 
-        validate_request_data( "repositoryUser", search_data, str )
-        validate_request_dictionary( "lastItemId", search_data, (str, type(None)) )
-        validate_request_dictionary( "itemsPerPage", search_data, int )
+        queryvariables = parse_owner_portfolio( search_data )
+        validate_request_dictionary( "maxItems", search_data, int )
+        validate_request_dictionary( "format", search_data, str )
 
-        queryvariables = {
-            "user": search_data["repositoryUser"],
-            "lastItem": search_data.get( "lastItemId", None ),
-            "items": search_data.get( "itemsPerPage", 3 ),
-        }
+        maxitems = min( search_data.get( "maxItems", PORTFOLIO_MAX_ITEMS ), PORTFOLIO_MAX_ITEMS )
+        streamformat = search_data.get( "format", "json" )
 
-        # https://stackoverflow.com/questions/39551325/github-graphql-orderby
-        # https://stackoverflow.com/questions/48116781/github-api-v4-how-can-i-traverse-with-pagination-graphql
-        list_repositories_graphqlquery = wrap_text( """
-            query ListRepositories($user: String!, $items: Int!, $lastItem: String) {
-              repositoryOwner(login: $user) {
-                repositories(first: $items, after: $lastItem, orderBy: {field: STARGAZERS, direction: DESC}) {
-                  pageInfo {
-                    hasNextPage
-                    endCursor
-                  }
-                  nodes {
-                    name
-                  }
-                }
-              }
-              %s
-            }
-        """ ) % github_ratelimit_graphql
-        graphqlresults = run_graphql_query( list_repositories_graphqlquery, queryvariables )
+        if streamformat != "json" and streamformat not in STREAM_FORMATS:
+            raise InvalidInput( f"'format={streamformat}' must be one of {[ 'json' ] + list( STREAM_FORMATS )}!" )
+
+        if streamformat != "json":
+            return stream_response( "owner_portfolio", owner_portfolio_graphqlquery, queryvariables, maxitems, streamformat )
+
+        repositories = []
+        results = {}
 
-        results["repositories"] = graphqlresults["data"]["repositoryOwner"]["repositories"]["nodes"]
-        results["lastItemId"] = graphqlresults["data"]["repositoryOwner"]["repositories"]["pageInfo"]["endCursor"]
-        results["hasMorePages"] = graphqlresults["data"]["repositoryOwner"]["repositories"]["pageInfo"]["hasNextPage"]
-        results["rateLimit"] = formatratelimit( graphqlresults["data"] )
+        for results, fragment, cacheage in fetch_pages( "owner_portfolio", owner_portfolio_graphqlquery, queryvariables, maxitems ):
+            repositories.extend( results["repositories"] )
+            results["rateLimit"] = formatratelimit( fragment.ratelimitdata, cacheage )
 
-    except InvalidRequest as error:
-        return error.flaskResponse
+        results["repositories"] = repositories
+
+    except BackendError as error:
+        return error_response( error )
 
     except Exception:
-        return flask.Response( getstacktrace(), status=500, mimetype='text/plain' )
+        return error_response( unexpected_error( "owner_portfolio" ) )
 
-    dumped_json = json.dumps( results )
+    dumped_json = JSON_CODEC.dumps( results )
     return flask.Response( dumped_json, status=200, mimetype='application/json' )
 
 
+@APP.route('/detail_repositories', endpoint='detail_repositories', methods=['POST'])
 @catch_remote_exceptions
-@APP.route('/detail_repository', endpoint='detail_repository', methods=['POST'])
-def detail_repository():
+def detail_repositories():
     results = {}
 
     try:
-        search_data = flask.request.json
+        search_data = get_search_data()
         log( 4, f"search_data {search_data}" )
 
-        validate_request_data( "repositoryUser", search_data, str )
-        validate_request_data( "repositoryName", search_data, str )
+        validate_request_data( "repositories", search_data, list )
 
-        queryvariables = {
-            "user": search_data["repositoryUser"],
-            "repo": search_data["repositoryName"],
-        }
+        for repository in search_data["repositories"]:
+            if not isinstance( repository, dict ):
+                raise InvalidInput( f"'repositories' item '{repository}' must be of type {dict}!" )
 
-        # https://graphql.org/learn/queries/
-        detail_repository_graphqlquery = wrap_text( """
-            query GetRepository($user: String!, $repo: String!) {
-              repository(owner: $user, name: $repo) {
-                createdAt
-                issues(states:OPEN) {
-                  totalCount
-                }
-                languages(first: 1) {
-                  nodes {
-                    name
-                  }
-                }
-              }
-              %s
+            validate_request_data( "repositoryUser", repository, str )
+            validate_request_data( "repositoryName", repository, str )
+
+        if len( search_data["repositories"] ) > BATCH_MAX_REPOSITORIES:
+            raise InvalidInput( f"'repositories' must have at most {BATCH_MAX_REPOSITORIES} items!" )
+
+        repositories = {}
+        for repository in search_data["repositories"]:
+            repositories[f"{repository['repositoryUser']}/{repository['repositoryName']}"] = {
+                "user": repository["repositoryUser"],
+                "repo": repository["repositoryName"],
             }
-        """ ) % github_ratelimit_graphql
-        graphqlresults = run_graphql_query( detail_repository_graphqlquery, queryvariables )
-        results = graphqlresults["data"]["repository"]
-        results["rateLimit"] = formatratelimit( graphqlresults["data"] )
 
-    except InvalidRequest as error:
-        return error.flaskResponse
+        results["repositories"], ratelimitdata, cacheage = fetch_repositories_details( repositories )
+        results["rateLimit"] = formatratelimit( ratelimitdata, cacheage ) if ratelimitdata else ""
+
+    except BackendError as error:
+        return error_response( error )
 
     except Exception:
-        return flask.Response( getstacktrace(), status=500, mimetype='text/plain' )
+        return error_response( unexpected_error( "detail_repositories" ) )
 
-    dumped_json = json.dumps( results )
+    dumped_json = JSON_CODEC.dumps( results )
     return flask.Response( dumped_json, status=200, mimetype='application/json' )
 
 
-# A simple function to use requests.post to make the API call. Note the json= section.
+@functools.lru_cache( maxsize=None )
+def build_detail_repositories_graphqlquery(repositoriescount):
+    """ Fetch several repositories within a single query by giving each `repository` field an alias. """
+    queryvariables = ", ".join(
+        f"$user{index}: String!, $repo{index}: String!" for index in range( repositoriescount ) )
+
+    queryfields = "\n".join(
+        f"repository{index}: repository(owner: $user{index}, name: $repo{index}) {{ ...RepositoryDetails }}"
+        for index in range( repositoriescount ) )
+
+    return QUERY_REGISTRY.register(
+        f"query GetRepositories({queryvariables}) {{\n{queryfields}\n{github_ratelimit_graphql}\n}}\n"
+        f"fragment RepositoryDetails on Repository {{\n{github_repository_details_graphql}\n}}"
+    )
+
+
+def fetch_repositories_details(repositories):
+    """
+        Given a dictionary `{nameWithOwner: {"user": user, "repo": repo}}`, returns a tuple
+        `(details, ratelimitdata, cacheage)`, where `details` maps each `nameWithOwner` to its
+        repository details or to `{"error": message}`, when it could not be fetched.
+
+        Cached repositories are reused from `/detail_repository` cache or from the repository
+        store, and the missing ones are fetched with at most `BATCH_CHUNK_SIZE` repositories by
+        Github request.
+    """
+    details = {}
+    missing = []
+    ratelimitdata = None
+    cacheage = None
+    ttl = CACHE_TTLS["detail_repository"]
+
+    for namewithowner, queryvariables in repositories.items():
+        cached = get_cached_results( "detail_repository", make_cache_key( detail_repository_graphqlquery, queryvariables ),
+                detail_repository_graphqlquery, queryvariables ) if ttl > 0 else None
+        cached = ( ResponseFragment.from_bytes( JSON_CODEC, cached[0] ), cached[1] ) if cached is not None else get_stored_repository( queryvariables )
+
+        if cached is None:
+            missing.append( namewithowner )
+            continue
+
+        fragment, age = cached
+        details[namewithowner] = fragment.results()
+
+        if ratelimitdata is None or age < cacheage:
+            ratelimitdata, cacheage = fragment.ratelimitdata, age
+
+    chunks = [ missing[index:index + BATCH_CHUNK_SIZE] for index in range( 0, len( missing ), BATCH_CHUNK_SIZE ) ]
+
+    def fetch_chunk(chunk):
+        queryvariables = {}
+
+        for index, namewithowner in enumerate( chunk ):
+            queryvariables[f"user{index}"] = repositories[namewithowner]["user"]
+            queryvariables[f"repo{index}"] = repositories[namewithowner]["repo"]
+
+        return run_graphql_query( build_detail_repositories_graphqlquery( len( chunk ) ), queryvariables, allowpartial=True )
+
+    # Each chunk fails by its own, then, a Github error only reaches the repositories on its chunk
+    futures = [ BATCH_EXECUTOR.submit( fetch_chunk, chunk ) for chunk in chunks ]
+    failures = []
+
+    for chunk, future in zip( chunks, futures ):
+
+        try:
+            graphqlresults = future.result()
+
+        except Exception as error:
+            if not isinstance( error, BackendError ):
+                error = unexpected_error( "detail_repositories" )
+
+            failures.append( error )
+            for namewithowner in chunk:
+                details[namewithowner] = { "error": error.message }
+
+            continue
+
+        ratelimitdata, cacheage = graphqlresults["data"], None
+
+        errors = {}
+        for error in graphqlresults.get( "errors", [] ):
+            if error.get( "path" ):
+                errors[error["path"][0]] = error.get( "message", "Unknown error!" )
+
+        for index, namewithowner in enumerate( chunk ):
+            repository = graphqlresults["data"].get( f"repository{index}" )
+
+            if repository is None:
+                details[namewithowner] = { "error": errors.get( f"repository{index}", "Repository not found!" ) }
+                continue
+
+            details[namewithowner] = repository
+            repositoryresults = { "data": {
+                "repository": repository,
+                "rateLimit": graphqlresults["data"]["rateLimit"],
+                "viewer": graphqlresults["data"]["viewer"],
+            } }
+            encodedresults = encode_graphql_results( "detail_repository", repositoryresults )
+            set_cached_results( "detail_repository", make_cache_key( detail_repository_graphqlquery, repositories[namewithowner] ), encodedresults )
+            save_fetched_repositories( "detail_repository", repositories[namewithowner], repositoryresults )
+
+    # When no repository could be found, the request fails as the first chunk, keeping its status and `Retry-After`
+    if failures and len( failures ) == len( chunks ) and len( missing ) == len( repositories ):
+        raise failures[0]
+
+    return { namewithowner: details[namewithowner] for namewithowner in repositories }, ratelimitdata, cacheage
+
+
+def run_cached_graphql_query(endpoint, graphqlquery, queryvariables={}):
+    """
+        Returns a tuple `(fragment, cacheage)`, where `fragment` is a `ResponseFragment` with the
+        endpoint formatted results, and `cacheage` is None when the results were just fetched from
+        Github, otherwise, how many seconds ago they were cached, prefetched or stored on the
+        `REPOSITORY_STORE`.
+
+        The results are shared already encoded between the cache and the concurrent callers waiting
+        for the same query, so a cache hit does not decode nor encode them again.
+    """
+    ttl = CACHE_TTLS.get( endpoint, 0 )
+    cachekey = make_cache_key( graphqlquery, queryvariables )
+
+    if ttl > 0:
+        cached = get_cached_results( endpoint, cachekey, graphqlquery, queryvariables )
+
+        if cached is not None:
+            encodedresults, cacheage = cached
+            return ResponseFragment.from_bytes( JSON_CODEC, encodedresults ), cacheage
+
+    if endpoint == "detail_repository":
+        stored = get_stored_repository( queryvariables )
+
+        if stored is not None:
+            count_results( endpoint, "store" )
+            return stored
+
+    # With caching enabled, the prefetched pages are only kept by the `RESPONSE_CACHE`
+    if PREFETCHER is not None and endpoint in PREFETCH_ENDPOINTS and ttl <= 0:
+        prefetched = PREFETCHER.take( cachekey )
+
+        if prefetched is not None:
+            count_results( endpoint, "prefetch" )
+            encodedresults, cacheage = prefetched
+            return ResponseFragment.from_bytes( JSON_CODEC, encodedresults ), cacheage
+
+    count_results( endpoint, "github" )
+    encodedresults = fetch_graphql_query( endpoint, cachekey, graphqlquery, queryvariables )
+    return ResponseFragment.from_bytes( JSON_CODEC, encodedresults ), None
+
+
+def get_cached_results(endpoint, cachekey, graphqlquery, queryvariables):
+    """
+        Returns the tuple `(encodedresults, cacheage)` from `RESPONSE_CACHE`, or None. Results
+        older than their `CACHE_TTLS` are still returned while they are within their `STALE_TTLS`,
+        and are refreshed on background for the next requests.
+    """
+    cached = RESPONSE_CACHE.get( cachekey )
+
+    if cached is None:
+        return None
+
+    if cached[1] < CACHE_TTLS[endpoint]:
+        count_results( endpoint, "cache" )
+
+    else:
+        count_results( endpoint, "stale" )
+        REVALIDATOR.schedule( cachekey, fetch_graphql_query, endpoint, cachekey, graphqlquery, queryvariables, PREFETCH_PRIORITY )
+
+    return cached
+
+
+def claim_revalidation(cachekey):
+    """ Whether this worker process refreshes `cachekey`, instead of the other workers sharing `RESPONSE_CACHE`. """
+    return RESPONSE_CACHE.claim( f"revalidating:{cachekey}", REVALIDATE_CLAIM_TTL )
+
+
+def set_cached_results(endpoint, cachekey, encodedresults):
+    """ The results are kept for their endpoint `CACHE_TTLS` plus `STALE_TTLS` seconds. """
+    ttl = CACHE_TTLS.get( endpoint, 0 )
+    RESPONSE_CACHE.set( cachekey, encodedresults, ttl + STALE_TTLS.get( endpoint, 0 ) if ttl > 0 else 0 )
+
+
+def count_results(endpoint, source):
+    if METRICS is not None:
+        METRICS.results.inc( endpoint, source )
+
+
+def fetch_graphql_query(endpoint, cachekey, graphqlquery, queryvariables, priority=None):
+    """ Returns the encoded results, waiting for an identical query already running, if any. """
+
+    if priority is None:
+        priority = ENDPOINT_PRIORITIES[endpoint]
+
+    def fetch_and_cache():
+        graphqlresults = run_graphql_query( graphqlquery, queryvariables, priority=priority )
+        encodedresults = encode_graphql_results( endpoint, graphqlresults )
+        set_cached_results( endpoint, cachekey, encodedresults )
+        save_fetched_repositories( endpoint, queryvariables, graphqlresults )
+        return encodedresults
+
+    return SINGLE_FLIGHT.do( cachekey, fetch_and_cache )
+
+
+def encode_graphql_results(endpoint, graphqlresults):
+    """ Returns the `endpoint` formatted results, as the `ResponseFragment` bytes kept by the cache. """
+    format_results = ( ENDPOINTS.get( endpoint ) or PAGED_ENDPOINTS[endpoint] )[2]
+    start = time.perf_counter()
+    encodedresults = ResponseFragment.from_results( JSON_CODEC, graphqlresults["data"], format_results( graphqlresults ) ).to_bytes()
+
+    if METRICS is not None:
+        METRICS.jsonduration.observe( time.perf_counter() - start, "encode" )
+
+    return encodedresults
+
+
+def get_stored_repository(queryvariables):
+    """
+        Returns a tuple `(fragment, storeage)` with the `/detail_repository` results from the
+        `REPOSITORY_STORE`, or None, when they are not there. Results older than `staleafter` are
+        still returned, while they are refreshed on background for the next requests.
+    """
+    if REPOSITORY_STORE is None:
+        return None
+
+    stored = REPOSITORY_STORE.get_details( f"{queryvariables['user']}/{queryvariables['repo']}" )
+
+    if stored is not None and stored[1] > REPOSITORY_STORE.staleafter:
+        cachekey = make_cache_key( detail_repository_graphqlquery, queryvariables )
+
+        with STORE_REFRESHING_LOCK:
+            isrefreshing = cachekey in STORE_REFRESHING
+            STORE_REFRESHING.add( cachekey )
+
+        if not isrefreshing:
+            STORE_EXECUTOR.submit( refresh_stored_repository, cachekey, queryvariables )
+
+    if stored is None:
+        return None
+
+    graphqlresults, storeage = stored
+    return ResponseFragment( JSON_CODEC, graphqlresults["data"], JSON_CODEC.dumps( format_detail_repository( graphqlresults ) ) ), storeage
+
+
+def refresh_stored_repository(cachekey, queryvariables):
+
+    try:
+        fetch_graphql_query( "detail_repository", cachekey, detail_repository_graphqlquery, queryvariables, PREFETCH_PRIORITY )
+
+    except Exception:
+        log.error( f"Could not refresh the stored repository {queryvariables}!\n{getstacktrace()}" )
+
+    finally:
+        with STORE_REFRESHING_LOCK:
+            STORE_REFRESHING.discard( cachekey )
+
+
+def save_fetched_repositories(endpoint, queryvariables, graphqlresults):
+    """ The results are already fetched, then, do not fail their request when they cannot be stored. """
+
+    try:
+        if SEARCH_INDEX is not None and endpoint == "search_github":
+            SEARCH_INDEX.add( graphqlresults["data"]["search"]["nodes"] )
+
+        if REPOSITORY_STORE is not None:
+            REPOSITORY_STORE.save( endpoint, queryvariables, graphqlresults )
+
+        # The portfolio has up to `maxItems` repositories to cache and store, which are not needed
+        # by its own request
+        if endpoint == "owner_portfolio":
+            STORE_EXECUTOR.submit( save_portfolio_repositories, graphqlresults )
+
+    except Exception:
+        log.error( f"Could not store the {endpoint} results!\n{getstacktrace()}" )
+
+
+def save_portfolio_repositories(graphqlresults):
+    """
+        Each `/owner_portfolio` repository is also saved as its `/detail_repository` and
+        `/search_github` results, so they are not fetched again when the user opens one of them.
+        It runs on the `STORE_EXECUTOR`, after the portfolio request was answered.
+    """
+    try:
+        data = graphqlresults["data"]
+        owner = data["repositoryOwner"]
+
+        if owner is None:
+            return
+
+        repositories = [ repository for repository in owner["repositories"]["nodes"] if repository ]
+
+        if SEARCH_INDEX is not None:
+            SEARCH_INDEX.add( repositories )
+
+        if REPOSITORY_STORE is not None:
+            REPOSITORY_STORE.save_search( repositories )
+            REPOSITORY_STORE.save_details( [ ( repository["nameWithOwner"], repository ) for repository in repositories ], data )
+
+        if CACHE_TTLS["detail_repository"] > 0:
+
+            for repository in repositories:
+                user, repo = repository["nameWithOwner"].split( "/", 1 )
+                repositoryresults = { "data": {
+                    "repository": { field: repository[field] for field in ( "createdAt", "issues", "languages" ) },
+                    "rateLimit": data["rateLimit"],
+                    "viewer": data["viewer"],
+                } }
+                encodedresults = encode_graphql_results( "detail_repository", repositoryresults )
+                set_cached_results( "detail_repository", make_cache_key( detail_repository_graphqlquery, { "user": user, "repo": repo } ), encodedresults )
+
+    except Exception:
+        log.error( f"Could not store the owner_portfolio repositories!\n{getstacktrace()}" )
+
+
+def prefetch_next_page(endpoint, queryvariables, fragment):
+    """ A follow up request arriving while its page is being prefetched waits for it on `SINGLE_FLIGHT`. """
+
+    if PREFETCHER is None or endpoint not in PREFETCH_ENDPOINTS:
+        return
+
+    results = fragment.results()
+    if not results["hasMorePages"]:
+        return
+
+    graphqlquery = ENDPOINTS[endpoint][0]
+    nextvariables = dict( queryvariables, lastItem=results["lastItemId"] )
+    cachekey = make_cache_key( graphqlquery, nextvariables )
+
+    if cachekey not in RESPONSE_CACHE:
+
+        # The current page results are already fetched, then, do not fail its request
+        try:
+            PREFETCHER.schedule( cachekey, fetch_graphql_query, endpoint, cachekey, graphqlquery, nextvariables, PREFETCH_PRIORITY,
+                    keep=CACHE_TTLS.get( endpoint, 0 ) <= 0 )
+
+        except Exception:
+            log.error( f"Could not prefetch the next page!\n{getstacktrace()}" )
+
+
+# A simple function to use the pooled requests session to make the API call. Note the json= section.
 # https://developer.github.com/v4/explorer/
-def run_graphql_query(graphqlquery, queryvariables={}):
-    request = requests.post( graphql_url, json={'query': graphqlquery, 'variables': queryvariables}, headers=headers )
+def run_graphql_query(graphqlquery, queryvariables={}, allowpartial=False, priority=INTERACTIVE_PRIORITY):
+    """
+        With `allowpartial`, results with some `errors` are accepted when they still have some `data`.
+        When Github refuses a token by its rate limit, the call is retried with the next token.
+    """
+    CIRCUIT_BREAKER.check()
+
+    for attempt in range( len( TOKEN_POOL.tokens ) ):
+        token, request = SCHEDULER.run( priority, post_with_token, graphqlquery, queryvariables )
+
+        try:
+            return check_graphql_response( request, graphqlquery, queryvariables, token.budget, allowpartial )
+
+        except RateLimitExceeded:
+            if attempt + 1 == len( TOKEN_POOL.tokens ):
+                raise
+
+
+def post_with_token(graphqlquery, queryvariables):
+    """
+        Returns a tuple `(token, request)`. The token is only chosen when the scheduler lets the call
+        run, after it waited for the rate limit reset, when all tokens were out of budget.
+    """
+    token = TOKEN_POOL.choose()
+    payload = QUERY_REGISTRY.payload( graphqlquery, queryvariables )
+    request = post_graphql_query( graphqlquery, payload, token.headers )
+
+    if QUERY_REGISTRY.needs_document( graphqlquery, payload, request ):
+        payload = QUERY_REGISTRY.payload( graphqlquery, queryvariables, withdocument=True )
+        request = post_graphql_query( graphqlquery, payload, token.headers )
+
+    return token, request
+
+
+def post_graphql_query(graphqlquery, payload, headers):
+    """
+        Times the Github request itself, without the time it waited on the scheduler queue, and
+        tells the `CIRCUIT_BREAKER` whether Github answered.
+    """
+    queryname = getattr( graphqlquery, "name", "unknown" )
+    start = time.perf_counter()
+    status = "error"
+
+    try:
+        request = CONNECTION_POOL.post( graphql_url, json=payload, headers=headers )
+        status = str( request.status_code )
+
+    except CONNECTION_POOL.requesterror as error:
+        CIRCUIT_BREAKER.record_failure()
+
+        if CONNECTION_POOL.is_timeout( error ):
+            raise UpstreamTimeout( f"Github did not answer the {queryname} query in time!" ) from None
+
+        raise UpstreamError( f"Could not connect to Github: {type( error ).__name__}!" ) from None
+
+    finally:
+        if METRICS is not None:
+            METRICS.upstreamduration.observe( time.perf_counter() - start, queryname )
+            METRICS.upstreamresponses.inc( queryname, status )
+
+    record_upstream_status( request.status_code )
+    return request
+
+
+def record_upstream_status(statuscode):
+    if statuscode >= 500:
+        CIRCUIT_BREAKER.record_failure()
+
+    else:
+        CIRCUIT_BREAKER.record_success()
+
+
+def check_graphql_response(request, graphqlquery, queryvariables, budget, allowpartial=False):
+    """
+        Accepts either a `requests` or a `httpx` response, as both have `status_code`, `headers` and
+        `json()`, and updates the `budget` of the token used by the request.
+    """
+
+    # https://developer.github.com/v3/#rate-limiting
+    # https://developer.github.com/v3/guides/best-practices-for-integrators/#dealing-with-abuse-rate-limits
+    if request.status_code in ( 403, 429 ) and (
+            "Retry-After" in request.headers or request.headers.get( "X-RateLimit-Remaining" ) == "0" ):
+
+        if "Retry-After" in request.headers:
+            retryafter = float( request.headers["Retry-After"] )
+
+        elif "X-RateLimit-Reset" in request.headers:
+            retryafter = max( float( request.headers["X-RateLimit-Reset"] ) - time.time(), 1 )
+
+        else:
+            retryafter = budget.seconds_to_reset() or 60
+
+        budget.exhaust( retryafter )
+        raise RateLimitExceeded( budget.seconds_to_reset() )
 
     if request.status_code == 200:
-        result = request.json()
+        start = time.perf_counter()
+        result = JSON_CODEC.loads( request.content )
+
+        if METRICS is not None:
+            METRICS.jsonduration.observe( time.perf_counter() - start, "decode" )
+
+        # https://developer.github.com/v4/guides/resource-limitations/
+        if any( error.get( "type" ) == "RATE_LIMITED" for error in result.get( "errors", [] ) ):
+            budget.update( ( result.get( "data" ) or {} ).get( "rateLimit" ) )
+            budget.exhaust( budget.seconds_to_reset() or 60 )
+            raise RateLimitExceeded( budget.seconds_to_reset() )
 
-        if "data" not in result or "errors" in result:
-            raise Exception( wrap_text( f"""
-                There were errors while processing the query!
-                {graphqlquery}
-                {queryvariables}
-                '{json.dumps( result, indent=2, sort_keys=True )}'
-            """ ) )
+        if not result.get( "data" ) or ( "errors" in result and not allowpartial ):
+            raise graphql_errors( result, graphqlquery, queryvariables )
+
+        budget.update( result["data"].get( "rateLimit" ) )
+
+        if METRICS is not None and result["data"].get( "rateLimit" ):
+            METRICS.graphqlcost.observe( result["data"]["rateLimit"]["cost"], getattr( graphqlquery, "name", "unknown" ) )
 
     else:
-        raise Exception( wrap_text(
-            f"""Query failed to run by returning code of {request.status_code}.
-            queryvariables:
-            {queryvariables}
-            graphqlquery:
-            {graphqlquery}
-        """ ) )
+        log.error( f"Github answered {getattr( graphqlquery, 'name', 'unknown' )} {queryvariables} with {request.status_code}!" )
+        raise UpstreamError( f"Github answered with the status code {request.status_code}!" )
 
     return result
 
 
+def graphql_errors(result, graphqlquery, queryvariables):
+    """
+        The exception for a Github response with `errors`, where the whole response is only logged.
+        https://docs.github.com/en/graphql/overview/resource-limitations
+    """
+    errors = result.get( "errors" ) or []
+    log.error( f"Github errors on {getattr( graphqlquery, 'name', 'unknown' )} {queryvariables}: {JSON_CODEC.dumps( errors ).decode( 'UTF-8' )}" )
+
+    for error in errors:
+        if error.get( "type" ) == "NOT_FOUND":
+            return NotFound( error.get( "message" ) or "Github could not find the requested item!" )
+
+    message = errors[0].get( "message" ) if errors else None
+    return UpstreamError( f"Github could not run the query: {message or 'it returned no data'}" )
+
 if __name__ == "__main__":
     main()
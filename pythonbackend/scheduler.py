@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import time
+import heapq
+import itertools
+import threading
+
+from ratelimit import RateLimitExceeded
+
+# Lower values run first
+INTERACTIVE_PRIORITY = 0
+SEARCH_PRIORITY = 1
+PREFETCH_PRIORITY = 2
+
+PRIORITY_NAMES = {
+    INTERACTIVE_PRIORITY: "interactive",
+    SEARCH_PRIORITY: "search",
+    PREFETCH_PRIORITY: "prefetch",
+}
+
+
+class UpstreamScheduler(object):
+    """
+        Runs at most `maxconcurrent` Github calls at once, where the waiting calls are started by
+        priority, and then, by arrival order.
+
+        Each priority keeps a `reserves` of rate limit points only higher priorities can use. When the
+        remaining budget falls to a priority reserve, its calls wait for the rate limit reset, if it
+        is within `maxdelay` seconds, otherwise, they are shed with `RateLimitExceeded`.
+    """
+
+    def __init__(self, budget, maxconcurrent=10, reserves=None, maxdelay=10):
+        self.budget = budget
+        self.maxconcurrent = maxconcurrent
+        self.reserves = reserves or { INTERACTIVE_PRIORITY: 0, SEARCH_PRIORITY: 100, PREFETCH_PRIORITY: 1000 }
+        self.maxdelay = maxdelay
+
+        self.condition = threading.Condition()
+        self.sequence = itertools.count()
+        self.waiting = []
+        self.running = 0
+
+        self.started = { priority: 0 for priority in PRIORITY_NAMES }
+        self.delayed = { priority: 0 for priority in PRIORITY_NAMES }
+        self.shed = { priority: 0 for priority in PRIORITY_NAMES }
+
+    def admit(self, priority):
+        """ Returns how many seconds the call has to wait before running, or raises `RateLimitExceeded`. """
+        remaining = self.budget.remaining_budget()
+
+        if remaining is None or remaining > self.reserves.get( priority, 0 ):
+            return 0
+
+        secondstoreset = self.budget.seconds_to_reset()
+
+        with self.condition:
+            if secondstoreset > self.maxdelay:
+                self.shed[priority] += 1
+                raise RateLimitExceeded( secondstoreset )
+
+            self.delayed[priority] += 1
+            return secondstoreset
+
+    def run(self, priority, function, *args, **kwargs):
+        delay = self.admit( priority )
+
+        if delay > 0:
+            time.sleep( delay )
+
+        self.acquire( priority )
+
+        try:
+            return function( *args, **kwargs )
+
+        finally:
+            self.release()
+
+    def acquire(self, priority):
+        with self.condition:
+            ticket = ( priority, next( self.sequence ) )
+            heapq.heappush( self.waiting, ticket )
+
+            while self.running >= self.maxconcurrent or self.waiting[0] != ticket:
+                self.condition.wait()
+
+            heapq.heappop( self.waiting )
+            self.running += 1
+            self.started[priority] += 1
+
+            # The next waiting call may also have a free slot to run
+            self.condition.notify_all()
+
+    def release(self):
+        with self.condition:
+            self.running -= 1
+            self.condition.notify_all()
+
+    def stats(self):
+        with self.condition:
+            waiting = { name: 0 for name in PRIORITY_NAMES.values() }
+
+            for priority, sequence in self.waiting:
+                waiting[PRIORITY_NAMES[priority]] += 1
+
+            return {
+                "maxConcurrent": self.maxconcurrent,
+                "running": self.running,
+                "waiting": waiting,
+                "started": { PRIORITY_NAMES[priority]: count for priority, count in self.started.items() },
+                "delayed": { PRIORITY_NAMES[priority]: count for priority, count in self.delayed.items() },
+                "shed": { PRIORITY_NAMES[priority]: count for priority, count in self.shed.items() },
+                "reserves": { PRIORITY_NAMES[priority]: count for priority, count in self.reserves.items() },
+            }
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import re
+import array
+import bisect
+import heapq
+import operator
+import functools
+import itertools
+import threading
+import collections
+
+
+def tokenize(text):
+    """ Lower case words and numbers, where `evandrocoan/ITE-Sublime` has `evandrocoan`, `ite` and `sublime`. """
+    return re.findall( r"[^\W_]+", text.lower() )
+
+
+def tokenize_query(searchquery):
+    """ Github search qualifiers as `stars:>1` or `language:python` are not free text, then, they are ignored. """
+    return [ term for word in searchquery.split() if ":" not in word for term in tokenize( word ) ]
+
+
+# The postings codes have the stars on their high bits and the repository id on their low bits
+MAX_STARS = 2 ** 31 - 1
+ID_MASK = 2 ** 32 - 1
+
+# The terms on at least this many repositories keep their repositories ids as the bits of a bytearray
+BITMAP_SIZE = 1024
+
+
+class SearchIndex(object):
+    """
+        An inverted index over the repositories already received from the Github search, for
+        type-ahead queries, where each query term matches all indexed terms starting with it, and
+        the matching repositories are ranked by their stars.
+
+        The term dictionary is a sorted list, so a prefix is found with a binary search, where the
+        new terms are merged on the next search, instead of being inserted one by one. Each rare
+        term points to a compact array of its repositories codes, sorted by most stars. Each
+        frequent term, and each terms first letter, points to a bitmap of its repositories ids,
+        where their matches are counted with a bitwise and, and the best ones are found walking
+        the codes of all repositories, sorted by most stars, until enough of them are on it.
+
+        Each repository keeps its terms as a single string, instead of a set of strings. When there
+        are more than `maxrepositories`, the least recently indexed repositories are removed from
+        the index, and their ids are reused, so the bitmaps are not longer than the index.
+
+        `benchmarks/searchindexbenchmark.py` reports the queries latencies on a full index.
+        https://docs.python.org/3/library/bisect.html
+        https://docs.python.org/3/library/array.html
+    """
+
+    def __init__(self, maxrepositories=50000):
+        self.maxrepositories = maxrepositories
+
+        self.lock = threading.Lock()
+        self.terms = []
+        self.postings = {}
+        self.bitmaps = {}
+        self.bitmapsizes = {}
+
+        # All the repositories codes, sorted by most stars, and the bitmaps of the terms first letters
+        self.ranking = array.array( "q" )
+        self.initials = {}
+        self.initialsizes = {}
+
+        # The terms not merged yet on `self.terms`, and the ones removed but still on it
+        self.newterms = []
+        self.removedterms = set()
+
+        # repository id -> ( nameWithOwner, description, stars, " term1 term2 ..." )
+        self.repositories = collections.OrderedDict()
+        self.ids = {}
+        self.freeids = []
+        self.nextid = 0
+
+        self.queries = 0
+        self.evictions = 0
+
+    def add(self, repositories):
+        """ Indexes the `search` nodes, as `{"nameWithOwner", "description", "stargazers": {"totalCount"}}`. """
+        with self.lock:
+            for repository in repositories:
+                if repository:
+                    self._add( repository["nameWithOwner"], repository["description"], repository["stargazers"]["totalCount"] )
+
+            while len( self.repositories ) > self.maxrepositories:
+                self._remove( next( iter( self.repositories ) ) )
+                self.evictions += 1
+
+    def _add(self, namewithowner, description, stars):
+        key = namewithowner.lower()
+        repositoryid = self.ids.get( key )
+
+        if repositoryid is not None:
+            self._remove( repositoryid )
+
+        if self.freeids:
+            repositoryid = self.freeids.pop()
+
+        else:
+            repositoryid = self.nextid
+            self.nextid += 1
+
+        terms = set( tokenize( namewithowner ) + tokenize( description or "" ) )
+        self.repositories[repositoryid] = ( namewithowner, description, stars, "".join( " " + term for term in terms ) )
+        self.ids[key] = repositoryid
+        code = self._code( repositoryid, stars )
+        bisect.insort( self.ranking, code )
+
+        for term in terms:
+            bitmap = self.bitmaps.get( term )
+
+            if bitmap is not None:
+                self._set_bit( bitmap, repositoryid )
+                self.bitmapsizes[term] += 1
+                continue
+
+            posting = self.postings.get( term )
+
+            if posting is None:
+                posting = self.postings[term] = array.array( "q" )
+
+                if term in self.removedterms:
+                    self.removedterms.discard( term )
+
+                else:
+                    self.newterms.append( term )
+
+            bisect.insort( posting, code )
+
+            if len( posting ) >= BITMAP_SIZE:
+                self.bitmaps[term] = self._make_bitmap( posting )
+                self.bitmapsizes[term] = len( posting )
+                del self.postings[term]
+
+        for initial in { term[0] for term in terms }:
+            bitmap = self.initials.get( initial )
+
+            if bitmap is None:
+                bitmap = self.initials[initial] = bytearray()
+                self.initialsizes[initial] = 0
+
+            self._set_bit( bitmap, repositoryid )
+            self.initialsizes[initial] += 1
+
+    def _remove(self, repositoryid):
+        namewithowner, description, stars, terms = self.repositories.pop( repositoryid )
+        del self.ids[namewithowner.lower()]
+        self.freeids.append( repositoryid )
+
+        code = self._code( repositoryid, stars )
+        del self.ranking[bisect.bisect_left( self.ranking, code )]
+        terms = terms.split()
+
+        for term in terms:
+            bitmap = self.bitmaps.get( term )
+
+            # The bitmap is only dropped well below its size, so it is not built again on the next repository
+            if bitmap is not None:
+                self._clear_bit( bitmap, repositoryid )
+                self.bitmapsizes[term] -= 1
+
+                if self.bitmapsizes[term] < BITMAP_SIZE // 2:
+                    self.postings[term] = array.array( "q", sorted( self._code( other, self.repositories[other][2] ) for other in self._ids( bitmap ) ) )
+                    del self.bitmaps[term]
+                    del self.bitmapsizes[term]
+
+                continue
+
+            posting = self.postings[term]
+            del posting[bisect.bisect_left( posting, code )]
+
+            if not posting:
+                del self.postings[term]
+                self.removedterms.add( term )
+
+        for initial in { term[0] for term in terms }:
+            self._clear_bit( self.initials[initial], repositoryid )
+            self.initialsizes[initial] -= 1
+
+            if not self.initialsizes[initial]:
+                del self.initials[initial]
+                del self.initialsizes[initial]
+
+    @staticmethod
+    def _code(repositoryid, stars):
+        """ Sorting the codes sorts their repositories by most stars, then by their ids. """
+        return ( MAX_STARS - min( stars, MAX_STARS ) ) << 32 | repositoryid
+
+    @staticmethod
+    def _set_bit(bitmap, repositoryid):
+        index = repositoryid >> 3
+
+        if index >= len( bitmap ):
+            bitmap.extend( bytes( index + 1 - len( bitmap ) ) )
+
+        bitmap[index] |= 1 << ( repositoryid & 7 )
+
+    @staticmethod
+    def _clear_bit(bitmap, repositoryid):
+        bitmap[repositoryid >> 3] &= ~( 1 << ( repositoryid & 7 ) ) & 0xff
+
+    @staticmethod
+    def _has_bit(bitmap, repositoryid):
+        index = repositoryid >> 3
+        return index < len( bitmap ) and bitmap[index] >> ( repositoryid & 7 ) & 1
+
+    @staticmethod
+    def _ids(bitmap):
+        return [ index << 3 | bit for index, byte in enumerate( bitmap ) if byte for bit in range( 8 ) if byte >> bit & 1 ]
+
+    @classmethod
+    def _make_bitmap(cls, posting):
+        bitmap = bytearray()
+
+        for code in posting:
+            cls._set_bit( bitmap, code & ID_MASK )
+
+        return bitmap
+
+    def _merge_terms(self):
+        """ The new terms are sorted first, so `sorted` merges both sorted runs on linear time. """
+
+        if self.newterms:
+            self.newterms.sort()
+            self.terms = sorted( self.terms + self.newterms )
+            self.newterms = []
+
+        if len( self.removedterms ) > ( len( self.postings ) + len( self.bitmaps ) ) // 4:
+            self.terms = [ term for term in self.terms if term not in self.removedterms ]
+            self.removedterms.clear()
+
+    def _prefix_terms(self, prefix):
+        start = bisect.bisect_left( self.terms, prefix )
+        end = bisect.bisect_left( self.terms, prefix[:-1] + chr( ord( prefix[-1] ) + 1 ), start )
+        return [ term for term in self.terms[start:end] if term in self.postings or term in self.bitmaps ]
+
+    def _prefix_size(self, prefix, prefixterms):
+        """ How many repositories the `prefix` terms have, where a repository with several of them is counted for each. """
+
+        if len( prefix ) == 1:
+            return self.initialsizes.get( prefix, 0 )
+
+        return sum( len( self.postings[term] ) if term in self.postings else self.bitmapsizes[term] for term in prefixterms )
+
+    def _prefix_bits(self, prefix, prefixterms):
+        """ An int whose bits are the ids of the repositories with a term starting with `prefix`. """
+
+        if len( prefix ) == 1:
+            return int.from_bytes( self.initials.get( prefix, b"" ), "little" )
+
+        bits = 0
+        loose = bytearray()
+
+        for term in prefixterms:
+            bitmap = self.bitmaps.get( term )
+
+            if bitmap is not None:
+                bits |= int.from_bytes( bitmap, "little" )
+
+            else:
+                for code in self.postings[term]:
+                    self._set_bit( loose, code & ID_MASK )
+
+        return bits | int.from_bytes( loose, "little" )
+
+    def search(self, searchquery, items=10):
+        """
+            Returns a tuple `(repositoryCount, repositories)`, with the `items` repositories with most
+            stars, shaped as the Github search nodes, matching all the `searchquery` terms.
+
+            When the term with the fewest repositories only has rare terms, its matches are collected
+            from their arrays, and the other terms are checked against their words. Otherwise, the
+            matches are counted and ranked on the bitmaps.
+        """
+        terms = set( tokenize_query( searchquery ) )
+        items = max( items, 0 )
+
+        with self.lock:
+            self.queries += 1
+
+            if not terms:
+                return 0, []
+
+            self._merge_terms()
+            prefixterms = { term: self._prefix_terms( term ) if len( term ) > 1 else [] for term in terms }
+            sizes = { term: self._prefix_size( term, prefixterms[term] ) for term in terms }
+            first = min( terms, key=sizes.get )
+
+            if len( first ) == 1 or sizes[first] >= BITMAP_SIZE or any( term in self.bitmaps for term in prefixterms[first] ):
+                return self._search_bits( terms, prefixterms, items )
+
+            matches = self._union( self.postings[term] for term in prefixterms[first] )
+            for term in sorted( terms - { first }, key=sizes.get ):
+                matches = [ code for code in matches if self._matches( code, term ) ]
+
+            return len( matches ), [ self._node( code ) for code in heapq.nsmallest( items, matches ) ]
+
+    def _search_bits(self, terms, prefixterms, items):
+        """
+            Walking the ranking finds `items` matches after about `items * len( self.ranking ) / count`
+            codes, while looking up the repository of each match costs about as much as walking a
+            code, then, the fewest matches are looked up instead.
+        """
+        bits = functools.reduce( operator.and_, ( self._prefix_bits( term, prefixterms[term] ) for term in terms ) )
+        count = bin( bits ).count( "1" )
+
+        if not count:
+            return 0, []
+
+        bitmap = bits.to_bytes( ( bits.bit_length() + 7 ) // 8, "little" )
+
+        if count * count < items * len( self.ranking ):
+            best = heapq.nsmallest( items, ( self._code( repositoryid, self.repositories[repositoryid][2] ) for repositoryid in self._ids( bitmap ) ) )
+
+        else:
+            best = itertools.islice( ( code for code in self.ranking if self._has_bit( bitmap, code & ID_MASK ) ), items )
+
+        return count, [ self._node( code ) for code in best ]
+
+    @staticmethod
+    def _union(postings):
+        matches = set()
+
+        for posting in postings:
+            matches.update( posting )
+
+        return matches
+
+    def _matches(self, code, prefix):
+        return " " + prefix in self.repositories[code & ID_MASK][3]
+
+    def _node(self, code):
+        namewithowner, description, stars, terms = self.repositories[code & ID_MASK]
+        return { "nameWithOwner": namewithowner, "description": description, "stargazers": { "totalCount": stars } }
+
+    def stats(self):
+        with self.lock:
+            return {
+                "repositories": len( self.repositories ),
+                "terms": len( self.postings ) + len( self.bitmaps ),
+                "maxRepositories": self.maxrepositories,
+                "queries": self.queries,
+                "evictions": self.evictions,
+            }
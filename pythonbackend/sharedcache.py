@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import json
+import time
+import socket
+import sqlite3
+import hashlib
+import threading
+import urllib.parse
+
+
+class SharedCacheError(Exception):
+    """ The shared cache could not be reached or refused a command. """
+
+
+class CommandError(SharedCacheError):
+    """ The server answered a command with an error reply, as `-ERR unknown command`. """
+
+
+def encode_command(*arguments):
+    """ https://redis.io/docs/reference/protocol-spec/#send-commands-to-a-redis-server """
+    encoded = [ b"*%d\r\n" % len( arguments ) ]
+
+    for argument in arguments:
+        if not isinstance( argument, bytes ):
+            argument = str( argument ).encode( "UTF-8" )
+
+        encoded.append( b"$%d\r\n%s\r\n" % ( len( argument ), argument ) )
+
+    return b"".join( encoded )
+
+
+def read_reply(reader):
+    line = reader.readline()
+
+    if not line.endswith( b"\r\n" ):
+        raise SharedCacheError( "The shared cache closed the connection!" )
+
+    kind, content = line[:1], line[1:-2]
+
+    if kind == b"+":
+        return content.decode( "UTF-8" )
+
+    if kind == b"-":
+        raise CommandError( content.decode( "UTF-8" ) )
+
+    if kind == b":":
+        return int( content )
+
+    if kind == b"$":
+        length = int( content )
+        return None if length < 0 else reader.read( length + 2 )[:-2]
+
+    if kind == b"*":
+        length = int( content )
+        return None if length < 0 else [ read_reply( reader ) for index in range( length ) ]
+
+    raise SharedCacheError( f"Unknown reply {line!r}!" )
+
+
+class RespClient(object):
+    """
+        A minimal client for servers speaking the Redis protocol (RESP2), as Redis, Valkey or
+        KeyDB, keeping up to `maxidle` open connections shared by the threads.
+        https://redis.io/docs/reference/protocol-spec/
+    """
+
+    def __init__(self, host="localhost", port=6379, database=0, password=None, timeout=1.0, maxidle=10):
+        self.host = host
+        self.port = port
+        self.database = database
+        self.password = password
+        self.timeout = timeout
+        self.maxidle = maxidle
+
+        self.lock = threading.Lock()
+        self.idle = []
+        self.connections = 0
+
+    def connect(self):
+        connection = socket.create_connection( ( self.host, self.port ), timeout=self.timeout )
+        connection.setsockopt( socket.IPPROTO_TCP, socket.TCP_NODELAY, 1 )
+        reader = connection.makefile( "rb" )
+
+        try:
+            if self.password:
+                self._send( connection, reader, [ "AUTH", self.password ] )
+
+            if self.database:
+                self._send( connection, reader, [ "SELECT", self.database ] )
+
+        except Exception:
+            self._close( ( connection, reader ) )
+            raise
+
+        with self.lock:
+            self.connections += 1
+
+        return connection, reader
+
+    def _send(self, connection, reader, arguments):
+        connection.sendall( encode_command( *arguments ) )
+        return read_reply( reader )
+
+    def execute(self, *arguments):
+        with self.lock:
+            pooled = self.idle.pop() if self.idle else None
+
+        try:
+            if pooled is None:
+                pooled = self.connect()
+
+            reply = self._send( *pooled, arguments )
+
+        except OSError as error:
+            self._close( pooled )
+            pooled = None
+            raise SharedCacheError( f"Could not reach the shared cache: {type( error ).__name__}!" ) from None
+
+        except CommandError:
+            # An error reply leaves the connection usable
+            raise
+
+        except Exception as error:
+            # Closed by the server or answered with something unexpected, then, its state is unknown
+            self._close( pooled )
+            pooled = None
+
+            if isinstance( error, SharedCacheError ):
+                raise
+
+            raise SharedCacheError( f"Invalid shared cache reply: {type( error ).__name__}!" ) from None
+
+        finally:
+            if pooled is not None:
+                with self.lock:
+                    if len( self.idle ) < self.maxidle:
+                        self.idle.append( pooled )
+                        pooled = None
+
+                self._close( pooled )
+
+        return reply
+
+    def _close(self, pooled):
+        if pooled is not None:
+            connection, reader = pooled
+            reader.close()
+            connection.close()
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+
+        for pooled in idle:
+            self._close( pooled )
+
+
+class RespBackend(object):
+    """ Keeps the shared values on a Redis compatible server, where it expires them. """
+    name = "resp"
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key):
+        return self.client.execute( "GET", key )
+
+    def get_many(self, keys):
+        return self.client.execute( "MGET", *keys ) if keys else []
+
+    def exists(self, key):
+        return self.client.execute( "EXISTS", key ) == 1
+
+    def set(self, key, value, ttl):
+        self.client.execute( "SET", key, value, "PX", max( int( ttl * 1000 ), 1 ) )
+
+    def add(self, key, value, ttl):
+        """ Only sets the key when it does not exist, returning whether it was set. """
+        return self.client.execute( "SET", key, value, "NX", "PX", max( int( ttl * 1000 ), 1 ) ) == "OK"
+
+    def delete(self, key):
+        self.client.execute( "DEL", key )
+
+    def clear(self, prefix):
+        """ Only removes the keys starting with `prefix`, as the server may be shared with other applications. """
+        cursor = b"0"
+
+        while True:
+            cursor, keys = self.client.execute( "SCAN", cursor, "MATCH", prefix + "*", "COUNT", 1000 )
+
+            if keys:
+                self.client.execute( "DEL", *keys )
+
+            if cursor in ( b"0", "0" ):
+                return
+
+    def stats(self):
+        return { "connections": self.client.connections }
+
+    def close(self):
+        self.client.close()
+
+
+class SqliteBackend(object):
+    """
+        Keeps the shared values on a SQLite database, for the worker processes on the same host,
+        which should be on a memory file system, as `/dev/shm`. The expired values are removed
+        after each `purgeinterval` writes.
+        https://www.sqlite.org/wal.html
+    """
+    name = "sqlite"
+
+    def __init__(self, path, clock=time.time, purgeinterval=1000):
+        self.path = path
+        self.clock = clock
+        self.purgeinterval = purgeinterval
+        self.writes = 0
+
+        # Each worker process has its own connection, shared by its threads under `self.lock`
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect( path, check_same_thread=False, isolation_level=None, timeout=5 )
+        self.connection.execute( "PRAGMA journal_mode=WAL" )
+        self.connection.execute( "PRAGMA synchronous=OFF" )
+        self.connection.execute( """
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expiresAt REAL NOT NULL
+            ) WITHOUT ROWID
+        """ )
+
+    def execute(self, sql, parameters=()):
+        try:
+            with self.lock:
+                return self.connection.execute( sql, parameters ).fetchall()
+
+        except sqlite3.Error as error:
+            raise SharedCacheError( f"Could not use the shared cache: {error}!" ) from None
+
+    def get(self, key):
+        rows = self.execute( "SELECT value FROM cache WHERE key = ? AND expiresAt > ?", ( key, self.clock() ) )
+        return rows[0][0] if rows else None
+
+    def get_many(self, keys):
+        return [ self.get( key ) for key in keys ]
+
+    def exists(self, key):
+        return bool( self.execute( "SELECT 1 FROM cache WHERE key = ? AND expiresAt > ?", ( key, self.clock() ) ) )
+
+    def set(self, key, value, ttl):
+        self.execute( "INSERT OR REPLACE INTO cache (key, value, expiresAt) VALUES (?, ?, ?)", ( key, value, self.clock() + ttl ) )
+
+        with self.lock:
+            self.writes += 1
+            purge = self.writes % self.purgeinterval == 0
+
+        if purge:
+            self.execute( "DELETE FROM cache WHERE expiresAt <= ?", ( self.clock(), ) )
+
+    def add(self, key, value, ttl):
+        """ Only sets the key when it does not exist or is expired, returning whether it was set. """
+        now = self.clock()
+
+        try:
+            with self.lock:
+                cursor = self.connection.execute( """
+                    INSERT INTO cache (key, value, expiresAt) VALUES (?, ?, ?)
+                    ON CONFLICT (key) DO UPDATE SET value = excluded.value, expiresAt = excluded.expiresAt
+                    WHERE cache.expiresAt <= ?
+                """, ( key, value, now + ttl, now ) )
+                return cursor.rowcount == 1
+
+        except sqlite3.Error as error:
+            raise SharedCacheError( f"Could not use the shared cache: {error}!" ) from None
+
+    def delete(self, key):
+        self.execute( "DELETE FROM cache WHERE key = ?", ( key, ) )
+
+    def clear(self, prefix):
+        self.execute( "DELETE FROM cache WHERE substr( key, 1, ? ) = ?", ( len( prefix ), prefix ) )
+
+    def stats(self):
+        return { "entries": self.execute( "SELECT COUNT(*) FROM cache" )[0][0] }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def create_backend(url):
+    """ A `redis://[:password@]host[:port][/database]` or `sqlite:///path/to/database` url. """
+    parsed = urllib.parse.urlparse( url )
+
+    if parsed.scheme == "redis":
+        return RespBackend( RespClient(
+            host=parsed.hostname or "localhost",
+            port=parsed.port or 6379,
+            database=int( parsed.path.strip( "/" ) or 0 ),
+            password=urllib.parse.unquote( parsed.password ) if parsed.password else None,
+        ) )
+
+    if parsed.scheme == "sqlite":
+        return SqliteBackend( parsed.path )
+
+    raise ValueError( f"Unknown shared cache '{url}', it must start with 'redis://' or 'sqlite://'!" )
+
+
+class SharedCache(object):
+    """
+        The same interface as `ResponseCache`, but shared by all worker processes through a
+        `backend`, with the same keys and expiration: each entry expires `ttl` seconds after it
+        was set, and `get()` returns its age. The ages use the wall clock, shared by the processes.
+
+        When the backend fails, the cache behaves as empty, so the results are fetched from Github.
+    """
+
+    def __init__(self, backend, prefix="githubresearcher:", clock=time.time):
+        self.backend = backend
+        self.prefix = prefix
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.lasterror = None
+
+    def _failed(self, error):
+        with self.lock:
+            self.errors += 1
+            self.lasterror = str( error )
+
+    def get(self, key):
+        """ Returns a tuple `(value, age in seconds)` or None when the key is missing, expired or the backend failed. """
+        try:
+            stored = self.backend.get( self.prefix + key )
+
+        except SharedCacheError as error:
+            self._failed( error )
+            stored = None
+
+        with self.lock:
+            if stored is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+
+        storedat, newline, value = stored.partition( b"\n" )
+        return value, max( self.clock() - float( storedat ), 0 )
+
+    def __contains__(self, key):
+        """ Checks the key without transferring its value. """
+        try:
+            return self.backend.exists( self.prefix + key )
+
+        except SharedCacheError as error:
+            self._failed( error )
+            return False
+
+    def set(self, key, value, ttl, size=None):
+        """ The values are bytes, as the encoded results. """
+        try:
+            if ttl <= 0:
+                self.backend.delete( self.prefix + key )
+
+            else:
+                self.backend.set( self.prefix + key, b"%r\n%s" % ( self.clock(), value ), ttl )
+
+        except SharedCacheError as error:
+            self._failed( error )
+
+    def delete(self, key):
+        try:
+            self.backend.delete( self.prefix + key )
+
+        except SharedCacheError as error:
+            self._failed( error )
+
+    def claim(self, key, ttl):
+        """
+            Returns whether this process claimed `key` for the next `ttl` seconds, as a lock shared
+            by the processes, which is never released, but expires. When the backend fails, the
+            claim is granted, so the work is still done, at worst, by several processes.
+        """
+        try:
+            return self.backend.add( self.prefix + key, b"%d" % os.getpid(), ttl )
+
+        except SharedCacheError as error:
+            self._failed( error )
+            return True
+
+    def clear(self):
+        self.backend.clear( self.prefix )
+
+    def stats(self):
+        try:
+            backendstats = self.backend.stats()
+
+        except SharedCacheError as error:
+            self._failed( error )
+            backendstats = {}
+
+        with self.lock:
+            return dict( backendstats,
+                backend=self.backend.name,
+                hits=self.hits,
+                misses=self.misses,
+                errors=self.errors,
+                lastError=self.lasterror,
+            )
+
+    def close(self):
+        self.backend.close()
+
+
+class SharedBudgets(object):
+    """
+        Shares the `TokenPool` rate limit budgets through a `SharedCache` backend, so a worker
+        knows the budget spent by the other workers, and stops calling Github when another
+        worker was refused by its rate limit. Each budget change is published, and the budgets
+        published by other workers are read at most once each `interval` seconds, where the
+        most recently updated budget wins. The tokens are only identified by their hash.
+    """
+
+    def __init__(self, sharedcache, interval=1.0, clock=time.time):
+        self.sharedcache = sharedcache
+        self.interval = interval
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        self.pulledat = None
+        self.pushed = 0
+        self.pulled = 0
+
+    def key(self, token):
+        return f"{self.sharedcache.prefix}ratelimit:{hashlib.sha256( token.token.encode( 'UTF-8' ) ).hexdigest()[:16]}"
+
+    def push(self, token):
+        snapshot = token.budget.snapshot()
+
+        if snapshot["resetAt"] is None:
+            return
+
+        # Kept until a while after the reset, when the budget is not useful anymore
+        ttl = max( snapshot["resetAt"] - self.clock(), 0 ) + 60
+
+        try:
+            self.sharedcache.backend.set( self.key( token ), json.dumps( snapshot ).encode( "UTF-8" ), ttl )
+
+            with self.lock:
+                self.pushed += 1
+
+        except SharedCacheError as error:
+            self.sharedcache._failed( error )
+
+    def pull(self, tokens):
+        with self.lock:
+            now = self.clock()
+
+            if self.pulledat is not None and now - self.pulledat < self.interval:
+                return
+
+            self.pulledat = now
+
+        try:
+            snapshots = self.sharedcache.backend.get_many( [ self.key( token ) for token in tokens ] )
+
+        except SharedCacheError as error:
+            self.sharedcache._failed( error )
+            return
+
+        for token, snapshot in zip( tokens, snapshots ):
+            if snapshot is not None and token.budget.merge( json.loads( snapshot ) ):
+                with self.lock:
+                    self.pulled += 1
+
+    def stats(self):
+        with self.lock:
+            return { "interval": self.interval, "pushed": self.pushed, "pulled": self.pulled }
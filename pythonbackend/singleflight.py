@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import asyncio
+import functools
+import threading
+
+
+class InFlightCall(object):
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+        Collapse concurrent calls with the same key into a single call, where all the callers wait
+        for the first one (the leader) to finish, and then, get its result or its exception.
+        https://pkg.go.dev/golang.org/x/sync/singleflight
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.executed = 0
+        self.collapsed = 0
+
+    def do(self, key, function, *args, **kwargs):
+        with self.lock:
+            call = self.calls.get( key )
+
+            if call is None:
+                call = InFlightCall()
+                self.calls[key] = call
+                self.executed += 1
+                isleader = True
+
+            else:
+                self.collapsed += 1
+                isleader = False
+
+        if not isleader:
+            call.event.wait()
+
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function( *args, **kwargs )
+
+        except Exception as error:
+            call.error = error
+            raise
+
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.event.set()
+
+        return call.result
+
+    def stats(self):
+        with self.lock:
+            return {
+                "inFlight": len( self.calls ),
+                "executed": self.executed,
+                "collapsed": self.collapsed,
+            }
+
+
+class AsyncSingleFlight(object):
+    """
+        The same as `SingleFlight`, but for coroutines running on the same event loop, where the
+        call runs on its own task, and all the callers, including the first one, await for it.
+        A cancelled caller only stops waiting, while the call keeps running for the other callers.
+        https://docs.python.org/3/library/asyncio-task.html#shielding-from-cancellation
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.executed = 0
+        self.collapsed = 0
+
+    async def do(self, key, function, *args, **kwargs):
+        task = self.calls.get( key )
+
+        if task is None:
+            task = asyncio.ensure_future( function( *args, **kwargs ) )
+            task.add_done_callback( functools.partial( self._done, key ) )
+            self.calls[key] = task
+            self.executed += 1
+
+        else:
+            self.collapsed += 1
+
+        return await asyncio.shield( task )
+
+    def _done(self, key, task):
+
+        if self.calls.get( key ) is task:
+            del self.calls[key]
+
+        # Avoid the `Future exception was never retrieved` warning when all callers were cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        return {
+            "inFlight": len( self.calls ),
+            "executed": self.executed,
+            "collapsed": self.collapsed,
+        }
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import time
+import threading
+
+
+class LazyLogger(object):
+    """
+        The `debug_tools` logger, which is only imported and created when something is logged, so
+        importing the backend does not pay for it.
+    """
+
+    def __init__(self, level, name):
+        self.level = level
+        self.name = name
+        self.logger = None
+        self.lock = threading.Lock()
+
+    def get_logger(self):
+        if self.logger is None:
+            with self.lock:
+                if self.logger is None:
+                    from debug_tools import getLogger
+                    self.logger = getLogger( self.level, self.name )
+
+        return self.logger
+
+    def __call__(self, *args, **kwargs):
+        return self.get_logger()( *args, **kwargs )
+
+    def __getattr__(self, name):
+        return getattr( self.get_logger(), name )
+
+
+class StartupCheck(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.ready = False
+        self.attempts = 0
+        self.error = None
+        self.finishedat = None
+
+
+class Readiness(object):
+    """
+        The startup work each worker runs on background, after it starts accepting connections,
+        as warming up the search index and probing Github. The worker is ready when all of them
+        have succeeded. A failed check is retried after `retrydelay` seconds, doubled after each
+        failure, up to `maxretrydelay` seconds.
+        https://kubernetes.io/docs/tasks/configure-pod-container/configure-liveness-readiness-startup-probes/
+    """
+
+    def __init__(self, retrydelay=1, maxretrydelay=60, clock=time.time):
+        self.retrydelay = retrydelay
+        self.maxretrydelay = maxretrydelay
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        self.checks = {}
+        self.startedat = clock()
+
+    def start(self, name, function):
+        """ Runs `function` on a background thread until it succeeds, unless `name` was already started. """
+        with self.lock:
+            if name in self.checks:
+                return
+
+            check = self.checks[name] = StartupCheck( name )
+
+        threading.Thread( target=self._run, args=( check, function ), name=f"startup_{name}", daemon=True ).start()
+
+    def _run(self, check, function):
+        retrydelay = self.retrydelay
+
+        while True:
+            try:
+                function()
+
+            except Exception as error:
+                with self.lock:
+                    check.attempts += 1
+                    check.error = f"{type( error ).__name__}: {error}"
+
+                time.sleep( retrydelay )
+                retrydelay = min( retrydelay * 2, self.maxretrydelay )
+                continue
+
+            with self.lock:
+                check.attempts += 1
+                check.ready = True
+                check.error = None
+                check.finishedat = self.clock()
+            return
+
+    def is_ready(self):
+        with self.lock:
+            return all( check.ready for check in self.checks.values() )
+
+    def stats(self):
+        with self.lock:
+            return {
+                "ready": all( check.ready for check in self.checks.values() ),
+                "uptime": round( self.clock() - self.startedat, 3 ),
+                "checks": {
+                    check.name: {
+                        "ready": check.ready,
+                        "attempts": check.attempts,
+                        "error": check.error,
+                        "seconds": round( check.finishedat - self.startedat, 3 ) if check.finishedat else None,
+                    }
+                    for check in self.checks.values()
+                },
+            }
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+
+# https://github.com/evandrocoan/debugtools/blob/079eee5f9b028c4cd17dee0da6a803adcf7d061d/tests/testing/main_unit_tests.py#L69-L75
+def assert_path(*args):
+    module = os.path.realpath( os.path.join( *args ) )
+    if module not in sys.path:
+        sys.path.append( module )
+
+this_direcotory = os.path.dirname( os.path.realpath( __file__ ) )
+assert_path( os.path.dirname( this_direcotory ) )
+assert_path( os.path.dirname( this_direcotory ), "tests" )
+
+import json
+import asyncio
+import threading
+import unittest
+import unittest.mock
+
+from testutils import TimeSpentTestCase
+from tokenpool import TokenPool
+from repositorystore import RepositoryStore
+from endpointtests import graphql_detail_repository
+
+try:
+    import httpx
+    import asyncrun
+
+except ImportError:
+    httpx = None
+
+import run
+
+
+def main():
+    unittest.main()
+
+
+@unittest.skipIf( httpx is None, "The asynchronous engine requires `httpx` installed" )
+class AsyncBackendEndpointTests(TimeSpentTestCase):
+
+    def setUp(self):
+        super().setUp()
+        run.RESPONSE_CACHE.clear()
+
+    def post_concurrently(self, path, data, count):
+        """ https://www.python-httpx.org/advanced/transports/#asgi-transport """
+
+        async def post_all():
+            transport = httpx.ASGITransport( app=asyncrun.ASGI_APP )
+
+            async with httpx.AsyncClient( transport=transport, base_url="http://testserver" ) as client:
+                return await asyncio.gather( *[ client.post( path, json=data ) for index in range( count ) ] )
+
+        return asyncio.run( post_all() )
+
+    def test_invalid_detail_repository_request(self):
+        response, = self.post_concurrently( "/detail_repository", {}, 1 )
+
+        self.assertEqual( 400, response.status_code )
+        self.assertRegex( response.headers["content-type"], r"application/json" )
+        self.assertEqual( { "error": "invalid_request", "message": "Missing 'repositoryUser' on your post query!" }, response.json() )
+
+    def test_concurrent_detail_repository_requests_are_collapsed(self):
+
+        async def slow_graphql_query(client, graphqlquery, queryvariables={}, **kwargs):
+            await asyncio.sleep( 0.1 )
+            return graphql_detail_repository()
+
+        with unittest.mock.patch.object( asyncrun, "run_graphql_query", side_effect=slow_graphql_query ) as upstream:
+            responses = self.post_concurrently(
+                "/detail_repository", { "repositoryUser": "evandrocoan", "repositoryName": "ITE" }, 10 )
+
+        self.assertEqual( 1, upstream.call_count )
+        self.assertEqual( [ 200 ] * 10, [ response.status_code for response in responses ] )
+        self.assertEqual( 74, json.loads( responses[-1].content )["issues"]["totalCount"] )
+
+    def test_cache_is_used_outside_the_event_loop(self):
+        threads = []
+
+        def record_thread(function):
+            def wrapper(*args, **kwargs):
+                threads.append( threading.current_thread() )
+                return function( *args, **kwargs )
+            return wrapper
+
+        async def graphql_query(client, graphqlquery, queryvariables={}, **kwargs):
+            return graphql_detail_repository()
+
+        with unittest.mock.patch.object( asyncrun, "run_graphql_query", side_effect=graphql_query ), \
+                unittest.mock.patch.object( run, "get_cached_results", record_thread( run.get_cached_results ) ), \
+                unittest.mock.patch.object( run, "set_cached_results", record_thread( run.set_cached_results ) ), \
+                unittest.mock.patch.object( run, "save_fetched_repositories", record_thread( run.save_fetched_repositories ) ):
+            response, = self.post_concurrently( "/detail_repository", { "repositoryUser": "evandrocoan", "repositoryName": "ITE" }, 1 )
+
+        self.assertEqual( 200, response.status_code )
+        self.assertEqual( 3, len( threads ) )
+        self.assertNotIn( threading.main_thread(), threads )
+
+    def test_shared_budgets_are_published_outside_the_event_loop(self):
+        threads = []
+        tokenpool = TokenPool( [ "token1" ] )
+        tokenpool.sharedbudgets = unittest.mock.Mock()
+
+        def check_graphql_response(*args):
+            threads.append( threading.current_thread() )
+            return graphql_detail_repository()
+
+        async def post_graphql_query(*args):
+            return unittest.mock.Mock( status_code=200 )
+
+        with unittest.mock.patch.object( run, "TOKEN_POOL", tokenpool ), \
+                unittest.mock.patch.object( run, "check_graphql_response", side_effect=check_graphql_response ), \
+                unittest.mock.patch.object( asyncrun, "post_graphql_query", side_effect=post_graphql_query ):
+            results = asyncio.run( asyncrun.run_graphql_query( None, run.detail_repository_graphqlquery, { "user": "evandrocoan", "repo": "ITE" } ) )
+
+        self.assertEqual( graphql_detail_repository(), results )
+        self.assertEqual( 1, len( threads ) )
+        self.assertNotIn( threading.main_thread(), threads )
+
+    def test_stored_repository_is_served_after_a_restart(self):
+        store = RepositoryStore( ":memory:" )
+        store.save( "detail_repository", { "user": "evandrocoan", "repo": "ITE" }, graphql_detail_repository() )
+
+        with unittest.mock.patch.object( run, "REPOSITORY_STORE", store ), \
+                unittest.mock.patch.object( asyncrun, "run_graphql_query", side_effect=AssertionError ):
+            response, = self.post_concurrently( "/detail_repository", { "repositoryUser": "evandrocoan", "repositoryName": "ITE" }, 1 )
+
+        self.assertEqual( 200, response.status_code )
+        self.assertEqual( "2016-08-09T21:16:45Z", response.json()["createdAt"] )
+        self.assertEqual( 1, store.stats()["hits"] )
+
+    def test_unknown_path_request(self):
+        response, = self.post_concurrently( "/add_path", {}, 1 )
+        self.assertEqual( 404, response.status_code )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+
+# https://github.com/evandrocoan/debugtools/blob/079eee5f9b028c4cd17dee0da6a803adcf7d061d/tests/testing/main_unit_tests.py#L69-L75
+def assert_path(*args):
+    module = os.path.realpath( os.path.join( *args ) )
+    if module not in sys.path:
+        sys.path.append( module )
+
+this_direcotory = os.path.dirname( os.path.realpath( __file__ ) )
+assert_path( os.path.dirname( this_direcotory ) )
+assert_path( os.path.dirname( this_direcotory ), "tests" )
+
+
+import json
+import unittest
+import unittest.mock
+
+import requests
+
+from testutils import TimeSpentTestCase
+from testutils import FakeClock
+from circuitbreaker import CircuitBreaker
+from errors import UpstreamUnavailable
+
+from graphqlqueriestests import FakeResponse
+from endpointtests import graphql_ratelimit
+
+import run
+
+
+def main():
+    unittest.main()
+
+
+class CircuitBreakerTests(TimeSpentTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker( failurethreshold=3, resettimeout=30, clock=self.clock )
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.check()
+
+        self.breaker.record_failure()
+        self.clock.now += 10
+
+        with self.assertRaises( UpstreamUnavailable ) as error:
+            self.breaker.check()
+
+        self.assertEqual( 20, error.exception.retryafter )
+        self.assertEqual( { "state": "open", "failures": 3, "opened": 1, "refused": 1 }, self.breaker.stats() )
+
+    def test_half_open_lets_one_call_through(self):
+        for index in range( 3 ):
+            self.breaker.record_failure()
+
+        self.clock.now += 30
+        self.breaker.check()
+
+        with self.assertRaises( UpstreamUnavailable ):
+            self.breaker.check()
+
+        self.breaker.record_failure()
+        self.assertEqual( "open", self.breaker.stats()["state"] )
+
+        self.clock.now += 30
+        self.breaker.check()
+        self.breaker.record_success()
+        self.breaker.check()
+        self.assertEqual( "closed", self.breaker.stats()["state"] )
+
+    def test_disabled(self):
+        breaker = CircuitBreaker( failurethreshold=0 )
+
+        for index in range( 10 ):
+            breaker.record_failure()
+            breaker.check()
+
+
+class UpstreamErrorsEndpointTests(TimeSpentTestCase):
+
+    def setUp(self):
+        super().setUp()
+        run.RESPONSE_CACHE.clear()
+        self.client = run.APP.test_client()
+
+        patcher = unittest.mock.patch.object( run, "CIRCUIT_BREAKER", CircuitBreaker( failurethreshold=2, resettimeout=60 ) )
+        patcher.start()
+        self.addCleanup( patcher.stop )
+
+    def post(self, path, data):
+        return self.client.post( path, data=json.dumps( data ), headers={ 'Content-Type': 'application/json' } )
+
+    def test_timeouts_open_the_circuit(self):
+        data = { "repositoryUser": "evandrocoan", "repositoryName": "ITE" }
+
+        with unittest.mock.patch.object( run.CONNECTION_POOL, "post", side_effect=requests.exceptions.ReadTimeout ) as upstream:
+            responses = [ self.post( "/detail_repository", data ) for index in range( 3 ) ]
+
+        self.assertEqual( 2, upstream.call_count )
+        self.assertEqual( [ 504, 504, 503 ], [ response.status_code for response in responses ] )
+        self.assertEqual( "upstream_timeout", responses[0].json["error"] )
+        self.assertEqual( "application/json", responses[0].mimetype )
+        self.assertNotIn( "Traceback", responses[0].data.decode( "UTF-8" ) )
+
+        self.assertEqual( "upstream_unavailable", responses[2].json["error"] )
+        self.assertEqual( "60", responses[2].headers["Retry-After"] )
+
+    def test_server_errors_are_compact(self):
+
+        with unittest.mock.patch.object( run.CONNECTION_POOL, "post", return_value=FakeResponse( {}, status_code=502 ) ):
+            response = self.post( "/search_github", { "searchQuery": "stars:>1" } )
+
+        self.assertEqual( 502, response.status_code )
+        self.assertEqual( { "error": "upstream_error", "message": "Github answered with the status code 502!" }, response.json )
+        self.assertEqual( 1, run.CIRCUIT_BREAKER.stats()["failures"] )
+
+    def test_not_found(self):
+        data = graphql_ratelimit()
+        data["repository"] = None
+        result = { "data": data, "errors": [ { "type": "NOT_FOUND", "message": "Could not resolve to a Repository." } ] }
+
+        with unittest.mock.patch.object( run.CONNECTION_POOL, "post", return_value=FakeResponse( result ) ):
+            response = self.post( "/detail_repository", { "repositoryUser": "evandrocoan", "repositoryName": "missing" } )
+
+        self.assertEqual( 404, response.status_code )
+        self.assertEqual( { "error": "not_found", "message": "Could not resolve to a Repository." }, response.json )
+        self.assertEqual( 0, run.CIRCUIT_BREAKER.stats()["failures"] )
+
+    def test_unexpected_errors_are_only_logged(self):
+
+        with unittest.mock.patch.object( run, "run_graphql_query", side_effect=KeyError( "secret" ) ), \
+                unittest.mock.patch.object( run.log, "error" ) as logerror:
+            response = self.post( "/search_github", { "searchQuery": "stars:>1" } )
+
+        self.assertEqual( 500, response.status_code )
+        self.assertEqual( "internal_error", response.json["error"] )
+        self.assertNotIn( "secret", response.data.decode( "UTF-8" ) )
+        self.assertRegex( logerror.call_args[0][0], r"Traceback(.|\n)*KeyError: 'secret'" )
+
+
+if __name__ == "__main__":
+    main()
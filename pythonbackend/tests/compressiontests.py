@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+
+# https://github.com/evandrocoan/debugtools/blob/079eee5f9b028c4cd17dee0da6a803adcf7d061d/tests/testing/main_unit_tests.py#L69-L75
+def assert_path(*args):
+    module = os.path.realpath( os.path.join( *args ) )
+    if module not in sys.path:
+        sys.path.append( module )
+
+this_direcotory = os.path.dirname( os.path.realpath( __file__ ) )
+assert_path( os.path.dirname( this_direcotory ) )
+assert_path( os.path.dirname( this_direcotory ), "tests" )
+
+
+import gzip
+import json
+import unittest
+import unittest.mock
+
+import flask
+
+from testutils import TimeSpentTestCase
+from compression import ResponseCompressor
+
+from endpointtests import graphql_search_github
+
+import run
+
+
+def main():
+    unittest.main()
+
+
+class ResponseCompressorTests(TimeSpentTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.compressor = ResponseCompressor( minsize=100, memoizesize=1024 )
+        self.prefix = json.dumps( { "repositories": [ f"user/repository{index}" for index in range( 100 ) ] } )[:-1].encode( "UTF-8" )
+
+    def test_memoized_prefix_with_different_suffixes(self):
+
+        for suffix in ( b', "rateLimit": "cached 1 seconds ago"}', b', "rateLimit": "cached 2 seconds ago"}' ):
+            body = self.prefix + suffix
+            self.assertEqual( body, gzip.decompress( self.compressor.compress( body, "gzip", "etag", len( self.prefix ) ) ) )
+
+        self.assertEqual( 1, self.compressor.stats()["memoized"] )
+        self.assertLess( self.compressor.stats()["bytesOut"], self.compressor.stats()["bytesIn"] / 2 )
+
+    def test_choose_encoding(self):
+        application = flask.Flask( "compressiontests" )
+
+        with application.test_request_context( headers={ "Accept-Encoding": "gzip, deflate" } ):
+            self.assertEqual( "gzip", self.compressor.choose_encoding( flask.request.accept_encodings, self.prefix ) )
+            self.assertIsNone( self.compressor.choose_encoding( flask.request.accept_encodings, b"{}" ) )
+
+        with application.test_request_context( headers={ "Accept-Encoding": "identity" } ):
+            self.assertIsNone( self.compressor.choose_encoding( flask.request.accept_encodings, self.prefix ) )
+
+    def test_memoizable_bodies_prefer_gzip(self):
+        application = flask.Flask( "compressiontests" )
+
+        with unittest.mock.patch.object( self.compressor, "encodings", [ "br", "gzip" ] ), \
+                application.test_request_context( headers={ "Accept-Encoding": "br, gzip" } ):
+            self.assertEqual( "br", self.compressor.choose_encoding( flask.request.accept_encodings, self.prefix ) )
+            self.assertEqual( "gzip", self.compressor.choose_encoding( flask.request.accept_encodings, self.prefix, "etag", len( self.prefix ) ) )
+
+        with application.test_request_context( headers={ "Accept-Encoding": "identity" } ):
+            self.assertIsNone( self.compressor.choose_encoding( flask.request.accept_encodings, self.prefix, "etag", len( self.prefix ) ) )
+
+    def test_memoized_prefixes_are_charged_their_compressor_state(self):
+        compressor = ResponseCompressor( minsize=100, memoizesize=1024, maxbytes=3 * 256 * 1024 )
+
+        for index in range( 5 ):
+            body = self.prefix + b', "rateLimit": ""}'
+            compressor.compress( body, "gzip", f"etag{index}", len( self.prefix ) )
+
+        self.assertEqual( 2, compressor.stats()["prefixes"] )
+        self.assertGreater( compressor.stats()["prefixesBytes"], 2 * 256 * 1024 )
+
+    def test_small_prefixes_are_not_memoized(self):
+        compressor = ResponseCompressor( minsize=100, memoizesize=len( self.prefix ) + 1 )
+        application = flask.Flask( "compressiontests" )
+
+        for index in range( 2 ):
+            body = self.prefix + b', "rateLimit": ""}'
+            self.assertEqual( body, gzip.decompress( compressor.compress( body, "gzip", "etag", len( self.prefix ) ) ) )
+
+        self.assertEqual( 0, compressor.stats()["prefixes"] )
+        self.assertEqual( 0, compressor.stats()["memoized"] )
+
+        with unittest.mock.patch.object( compressor, "encodings", [ "br", "gzip" ] ), \
+                application.test_request_context( headers={ "Accept-Encoding": "br, gzip" } ):
+            self.assertEqual( "br", compressor.choose_encoding( flask.request.accept_encodings, self.prefix, "etag", len( self.prefix ) ) )
+
+    def test_endpoint_responses_are_compressed(self):
+        client = run.APP.test_client()
+        run.RESPONSE_CACHE.clear()
+
+        with unittest.mock.patch.object( run, "RESPONSE_COMPRESSOR", ResponseCompressor( minsize=100, memoizesize=100 ) ) as compressor, \
+                unittest.mock.patch.object( run, "run_graphql_query", side_effect=graphql_search_github ):
+            responses = [ client.get( "/search_github?searchQuery=repo&itemsPerPage=10", headers={ "Accept-Encoding": "gzip" } ) for index in range( 2 ) ]
+            plain = client.get( "/search_github?searchQuery=repo&itemsPerPage=10" )
+
+        for response in responses:
+            self.assertEqual( "gzip", response.headers["Content-Encoding"] )
+            self.assertEqual( plain.json["repositories"], json.loads( gzip.decompress( response.data ) )["repositories"] )
+
+        self.assertNotIn( "Content-Encoding", plain.headers )
+        self.assertEqual( "Accept-Encoding", plain.headers["Vary"] )
+        self.assertEqual( 1, compressor.stats()["memoized"] )
+
+    def test_streamed_responses_are_not_compressed(self):
+        client = run.APP.test_client()
+
+        with unittest.mock.patch.object( run, "RESPONSE_COMPRESSOR", ResponseCompressor( minsize=0 ) ), \
+                unittest.mock.patch.object( run, "run_graphql_query", side_effect=graphql_search_github ):
+            response = client.post( "/search_github_stream", json={ "searchQuery": "repo" }, headers={ "Accept-Encoding": "gzip" } )
+            response.get_data()
+
+        self.assertNotIn( "Content-Encoding", response.headers )
+
+
+if __name__ == "__main__":
+    main()
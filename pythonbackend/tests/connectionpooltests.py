@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+
+# https://github.com/evandrocoan/debugtools/blob/079eee5f9b028c4cd17dee0da6a803adcf7d061d/tests/testing/main_unit_tests.py#L69-L75
+def assert_path(*args):
+    module = os.path.realpath( os.path.join( *args ) )
+    if module not in sys.path:
+        sys.path.append( module )
+
+this_direcotory = os.path.dirname( os.path.realpath( __file__ ) )
+assert_path( os.path.dirname( this_direcotory ) )
+assert_path( os.path.dirname( this_direcotory ), "tests" )
+
+import json
+import threading
+import unittest
+import http.server
+
+from testutils import TimeSpentTestCase
+from connectionpool import ConnectionPool
+
+
+def main():
+    unittest.main()
+
+
+class KeepAliveHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read( int( self.headers.get( "Content-Length", 0 ) ) )
+        body = json.dumps( { "data": {} } ).encode( "UTF-8" )
+
+        self.send_response( 200 )
+        self.send_header( "Content-Type", "application/json" )
+        self.send_header( "Content-Length", str( len( body ) ) )
+        self.end_headers()
+        self.wfile.write( body )
+
+    def log_message(self, *args):
+        pass
+
+
+class ConnectionPoolUnitTests(TimeSpentTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server = http.server.ThreadingHTTPServer( ( "127.0.0.1", 0 ), KeepAliveHandler )
+        self.server_url = "http://127.0.0.1:%s/graphql" % self.server.server_address[1]
+        threading.Thread( target=self.server.serve_forever, daemon=True ).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()
+
+    def test_connections_are_reused_between_requests(self):
+        pool = ConnectionPool( poolsize=2 )
+
+        for index in range( 5 ):
+            response = pool.post( self.server_url, json={ "query": "{}" } )
+            self.assertEqual( 200, response.status_code )
+
+        stats = pool.stats()
+        pool.close()
+
+        self.assertEqual( 5, stats["requests"] )
+        self.assertEqual( 1, stats["connectionsOpened"] )
+        self.assertEqual( 4, stats["connectionsReused"] )
+        self.assertEqual( 1, stats["connectionsIdle"] )
+
+    def test_connections_are_bounded_across_threads(self):
+        pool = ConnectionPool( poolsize=2 )
+
+        def post_requests():
+            for index in range( 10 ):
+                pool.post( self.server_url, json={ "query": "{}" } )
+
+        threads = [ threading.Thread( target=post_requests ) for index in range( 6 ) ]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+
+        stats = pool.stats()
+        pool.close()
+
+        self.assertEqual( 60, stats["requests"] )
+        self.assertEqual( 6, stats["sessions"] )
+        self.assertLessEqual( stats["connectionsOpened"], 2 )
+        self.assertEqual( 60, stats["connectionsOpened"] + stats["connectionsReused"] )
+
+
+if __name__ == "__main__":
+    main()
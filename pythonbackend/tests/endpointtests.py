@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+
+# https://github.com/evandrocoan/debugtools/blob/079eee5f9b028c4cd17dee0da6a803adcf7d061d/tests/testing/main_unit_tests.py#L69-L75
+def assert_path(*args):
+    module = os.path.realpath( os.path.join( *args ) )
+    if module not in sys.path:
+        sys.path.append( module )
+
+this_direcotory = os.path.dirname( os.path.realpath( __file__ ) )
+assert_path( os.path.dirname( this_direcotory ) )
+assert_path( os.path.dirname( this_direcotory ), "tests" )
+
+import json
+import threading
+import unittest
+import unittest.mock
+
+from testutils import TimeSpentTestCase
+from testutils import FakeClock
+from testutils import wait_until
+from prefetcher import Prefetcher
+from revalidator import Revalidator
+from responsecache import ResponseCache
+from ratelimit import RateLimitBudget
+from repositorystore import RepositoryStore
+from searchindex import SearchIndex
+
+import run
+
+
+def main():
+    unittest.main()
+
+
+def graphql_ratelimit():
+    return {
+        "rateLimit": { "limit": 5000, "cost": 1, "remaining": 4999, "resetAt": "2020-01-01T00:00:00Z" },
+        "viewer": { "login": "evandrocoan" },
+    }
+
+
+def graphql_detail_repository(name="ITE"):
+    data = graphql_ratelimit()
+    data["repository"] = {
+        "createdAt": "2016-08-09T21:16:45Z",
+        "issues": { "totalCount": 74 },
+        "languages": { "nodes": [ { "name": "Shell" } ] },
+    }
+    return { "data": data }
+
+
+def graphql_search_github(graphqlquery, queryvariables, **kwargs):
+    """ Answer a search with 10 repositories in total, where each cursor is the last item index. """
+    first = int( queryvariables.get( "lastItem" ) or 0 )
+    last = min( first + queryvariables["items"], 10 )
+
+    data = graphql_ratelimit()
+    data["search"] = {
+        "pageInfo": { "hasNextPage": last < 10, "endCursor": str( last ) },
+        "repositoryCount": 10,
+        "nodes": [ { "nameWithOwner": f"user/repo{index}", "description": "", "stargazers": { "totalCount": 10 - index } }
+                for index in range( first, last ) ],
+    }
+    return { "data": data }
+
+
+def graphql_list_repositories(graphqlquery, queryvariables, **kwargs):
+    data = graphql_search_github( graphqlquery, { "items": queryvariables["items"], "lastItem": queryvariables["lastItem"] } )["data"]
+    data["repositoryOwner"] = { "repositories": {
+        "pageInfo": data["search"]["pageInfo"],
+        "nodes": [ { "name": node["nameWithOwner"].split( "/" )[1] } for node in data.pop( "search" )["nodes"] ],
+    } }
+    return { "data": data }
+
+
+def graphql_detail_repositories(graphqlquery, queryvariables, **kwargs):
+    """ Answer an aliased `/detail_repositories` query, where repositories named `missing` are not found. """
+    data = graphql_ratelimit()
+    errors = []
+
+    for index in range( len( queryvariables ) // 2 ):
+        if queryvariables[f"repo{index}"] == "missing":
+            data[f"repository{index}"] = None
+            errors.append( { "path": [ f"repository{index}" ], "message": "Could not resolve to a Repository" } )
+
+        else:
+            data[f"repository{index}"] = graphql_detail_repository()["data"]["repository"]
+
+    return { "data": data, "errors": errors } if errors else { "data": data }
+
+
+class PythonBackendEndpointTests(TimeSpentTestCase):
+
+    def setUp(self):
+        super().setUp()
+        run.RESPONSE_CACHE.clear()
+        self.client = run.APP.test_client()
+
+    def post(self, path, data):
+        return self.client.post( path, data=json.dumps( data ), headers={ 'Content-Type': 'application/json' } )
+
+    def test_detail_repository_is_served_from_cache(self):
+        with unittest.mock.patch.object( run, "run_graphql_query", return_value=graphql_detail_repository() ) as upstream:
+            first = self.post( "/detail_repository", { "repositoryUser": "evandrocoan", "repositoryName": "ITE" } )
+            second = self.post( "/detail_repository", { "repositoryUser": "evandrocoan", "repositoryName": "ITE" } )
+
+        self.assertEqual( 1, upstream.call_count )
+        self.assertEqual( 200, first.status_code )
+        self.assertEqual( 200, second.status_code )
+
+        self.assertNotIn( "stale", first.json["rateLimit"] )
+        self.assertRegex( second.json["rateLimit"], r"stale, cached \d+ seconds ago" )
+        self.assertEqual( first.json["issues"], second.json["issues"] )
+        self.assertEqual( 4, len( second.json ) )
+
+    def test_cache_ignores_different_variables(self):
+        with unittest.mock.patch.object( run, "run_graphql_query", return_value=graphql_detail_repository() ) as upstream:
+            self.post( "/detail_repository", { "repositoryUser": "evandrocoan", "repositoryName": "ITE" } )
+            self.post( "/detail_repository", { "repositoryUser": "evandrocoan", "repositoryName": "Other" } )
+
+        self.assertEqual( 2, upstream.call_count )
+
+    def test_detail_repositories_reports_partial_failures(self):
+        repositories = [
+            { "repositoryUser": "evandrocoan", "repositoryName": "ITE" },
+            { "repositoryUser": "evandrocoan", "repositoryName": "missing" },
+        ]
+
+        with unittest.mock.patch.object( run, "run_graphql_query", side_effect=graphql_detail_repositories ) as upstream:
+            response = self.post( "/detail_repositories", { "repositories": repositories } )
+
+        self.assertEqual( 1, upstream.call_count )
+        self.assertEqual( 200, response.status_code )
+        self.assertEqual( 74, response.json["repositories"]["evandrocoan/ITE"]["issues"]["totalCount"] )
+        self.assertRegex( response.json["repositories"]["evandrocoan/missing"]["error"], "Could not resolve" )
+        self.assertGreater( len( response.json["rateLimit"] ), 20 )
+
+    def test_detail_repositories_splits_chunks_and_reuses_cache(self):
+        repositories = [ { "repositoryUser": "user", "repositoryName": f"repo{index}" } for index in range( 120 ) ]
+
+        with unittest.mock.patch.object( run, "run_graphql_query", return_value=graphql_detail_repository() ):
+            self.post( "/detail_repository", { "repositoryUser": "user", "repositoryName": "repo0" } )
+
+        with unittest.mock.patch.object( run, "run_graphql_query", side_effect=graphql_detail_repositories ) as upstream:
+            response = self.post( "/detail_repositories", { "repositories": repositories } )
+            second = self.post( "/detail_repositories", { "repositories": repositories } )
+
+        # 119 missing repositories split into chunks of 50, then, all of them come from the cache
+        self.assertEqual( 3, upstream.call_count )
+        self.assertEqual( 120, len( response.json["repositories"] ) )
+        self.assertEqual( response.json["repositories"], second.json["repositories"] )
+        self.assertRegex( second.json["rateLimit"], "stale" )
+
+    def test_detail_repositories_isolates_failed_chunks(self):
+        repositories = [ { "repositoryUser": "user", "repositoryName": f"repo{index}" } for index in range( 120 ) ]
+
+        def graphql_failing_chunk(graphqlquery, queryvariables, **kwargs):
+            if queryvariables["repo0"] == "repo50":
+                raise run.UpstreamError( "Github is having problems!" )
+
+            return graphql_detail_repositories( graphqlquery, queryvariables, **kwargs )
+
+        with unittest.mock.patch.object( run, "run_graphql_query", side_effect=graphql_failing_chunk ) as upstream:
+            response = self.post( "/detail_repositories", { "repositories": repositories } )
+
+        failed = { name for name, details in response.json["repositories"].items() if "error" in details }
+
+        self.assertEqual( 3, upstream.call_count )
+        self.assertEqual( 200, response.status_code )
+        self.assertEqual( { f"user/repo{index}" for index in range( 50, 100 ) }, failed )
+        self.assertEqual( "Github is having problems!", response.json["repositories"]["user/repo50"]["error"] )
+        self.assertIn( "issues", response.json["repositories"]["user/repo100"] )
+
+    def test_detail_repositories_fails_when_every_chunk_fails(self):
+        repositories = [ { "repositoryUser": "user", "repositoryName": f"repo{index}" } for index in range( 60 ) ]
+
+        with unittest.mock.patch.object( run, "run_graphql_query", side_effect=run.UpstreamError( "Github is down!" ) ):
+            response = self.post( "/detail_repositories", { "repositories": repositories } )
+
+        self.assertEqual( 502, response.status_code )
+
+    def test_invalid_detail_repositories_request(self):
+        response = self.post( "/detail_repositories", { "repositories": [ "evandrocoan/ITE" ] } )
+
+        self.assertEqual( 400, response.status_code )
+        self.assertRegex( response.data.decode( "UTF-8" ), r"'repositories' item 'evandrocoan/ITE' must be of type" )
+
+    def test_search_github_stream_follows_pages(self):
+
+        with unittest.mock.patch.object( run, "run_graphql_query", side_effect=graphql_search_github ) as upstream:
+            response = self.post( "/search_github_stream", { "searchQuery": "stars:>1", "itemsPerPage": 3, "maxItems": 8 } )
+            lines = [ json.loads( line ) for line in response.data.decode( "UTF-8" ).splitlines() ]
+
+        self.assertEqual( 200, response.status_code )
+        self.assertRegex( response.headers.get( "Content-Type" ), r"application/x-ndjson" )
+
+        # Pages of 3, 3 and 2 items, as the last page is not fetched beyond `maxItems`
+        self.assertEqual( 3, upstream.call_count )
+        self.assertEqual( [ f"user/repo{index}" for index in range( 8 ) ],
+                [ line["repository"]["nameWithOwner"] for line in lines[:-1] ] )
+
+        self.assertEqual( "8", lines[-1]["lastItemId"] )
+        self.assertEqual( True, lines[-1]["hasMorePages"] )
+        self.assertEqual( 10, lines[-1]["repositoryCount"] )
+
+    def test_search_github_stream_server_sent_events(self):
+
+        with unittest.mock.patch.object( run, "run_graphql_query", side_effect=graphql_search_github ):
+            response = self.post( "/search_github_stream", { "searchQuery": "stars:>1", "format": "sse" } )
+            events = response.data.decode( "UTF-8" ).split( "\n\n" )
+
+        self.assertRegex( response.headers.get( "Content-Type" ), r"text/event-stream" )
+        self.assertEqual( 10, len( [ event for event in events if event.startswith( "event: repository" ) ] ) )
+        self.assertRegex( events[-2], r'event: end\ndata: .*"hasMorePages": ?false' )
+
+    def test_invalid_search_github_stream_format(self):
+        response = self.post( "/search_github_stream", { "searchQuery": "stars:>1", "format": "xml" } )
+        self.assertEqual( 400, response.status_code )
+
+    def test_owner_portfolio_unknown_user(self):
+        data = graphql_ratelimit()
+        data["repositoryOwner"] = None
+
+        with unittest.mock.patch.object( run, "run_graphql_query", return_value={ "data": data } ):
+            response = self.post( "/owner_portfolio", { "repositoryUser": "missinguser" } )
+
+        self.assertEqual( 404, response.status_code )
+        self.assertEqual( "not_found", response.json["error"] )
+
+    def test_detail_repository_is_served_from_store(self):
+        store = RepositoryStore( ":memory:", staleafter=3600 )
+
+        with unittest.mock.patch.object( run, "REPOSITORY_STORE", store ), \
+                unittest.mock.patch.object( run, "run_graphql_query", return_value=graphql_detail_repository() ) as upstream:
+            first = self.post( "/detail_repository", { "repositoryUser": "evandrocoan", "repositoryName": "ITE" } )
+            run.RESPONSE_CACHE.clear()
+            second = self.post( "/detail_repository", { "repositoryUser": "evandrocoan", "repositoryName": "ITE" } )
+
+        self.assertEqual( 1, upstream.call_count )
+        self.assertEqual( first.json["createdAt"], second.json["createdAt"] )
+        self.assertRegex( second.json["rateLimit"], "stale" )
+        self.assertEqual( 4, len( second.json ) )
+        self.assertEqual( 1, store.stats()["hits"] )
+
+    def test_stale_stored_repository_is_refreshed(self):
+        store = RepositoryStore( ":memory:", staleafter=0 )
+
+        with unittest.mock.patch.object( run, "REPOSITORY_STORE", store ), \
+                unittest.mock.patch.object( run, "run_graphql_query", return_value=graphql_detail_repository() ) as upstream:
+            self.post( "/detail_repository", { "repositoryUser": "evandrocoan", "repositoryName": "ITE" } )
+            run.RESPONSE_CACHE.clear()
+            response = self.post( "/detail_repository", { "repositoryUser": "evandrocoan", "repositoryName": "ITE" } )
+            wait_until( lambda: not run.STORE_REFRESHING )
+
+        self.assertEqual( 200, response.status_code )
+        self.assertEqual( 2, upstream.call_count )
+
+    def test_search_local_answers_from_fetched_pages(self):
+
+        with unittest.mock.patch.object( run, "SEARCH_INDEX", SearchIndex() ), \
+                unittest.mock.patch.object( run, "run_graphql_query", side_effect=graphql_search_github ) as upstream:
+            self.post( "/search_github", { "searchQuery": "stars:>1", "itemsPerPage": 5 } )
+            response = self.post( "/search_local", { "searchQuery": "user repo", "itemsPerPage": 2 } )
+
+        self.assertEqual( 1, upstream.call_count )
+        self.assertEqual( 5, response.json["repositoryCount"] )
+        self.assertEqual( [ "user/repo0", "user/repo1" ], [ node["nameWithOwner"] for node in response.json["repositories"] ] )
+
+    def test_search_github_merges_local_results(self):
+        index = SearchIndex()
+        index.add( [ { "nameWithOwner": "local/repo", "description": "Seen before", "stargazers": { "totalCount": 1 } } ] )
+
+        with unittest.mock.patch.object( run, "SEARCH_INDEX", index ), \
+                unittest.mock.patch.object( run, "run_graphql_query", side_effect=graphql_search_github ):
+            response = self.post( "/search_github", { "searchQuery": "repo", "itemsPerPage": 2, "mergeLocal": True } )
+
+        self.assertEqual( [ "user/repo0", "user/repo1", "local/repo" ], [ node["nameWithOwner"] for node in response.json["repositories"] ] )
+
+    def test_search_local_disabled(self):
+
+        with unittest.mock.patch.object( run, "SEARCH_INDEX", None ):
+            response = self.post( "/search_local", { "searchQuery": "repo" } )
+
+        self.assertEqual( 503, response.status_code )
+        self.assertEqual( "disabled", response.json["error"] )
+
+    def test_search_local_items_must_be_positive(self):
+
+        with unittest.mock.patch.object( run, "SEARCH_INDEX", SearchIndex() ):
+            response = self.post( "/search_local", { "searchQuery": "user", "itemsPerPage": -1 } )
+
+        self.assertEqual( 400, response.status_code )
+        self.assertEqual( "invalid_request", response.json["error"] )
+
+    def test_search_local_unexpected_error(self):
+        index = unittest.mock.Mock( search=unittest.mock.Mock( side_effect=ValueError( "secret" ) ) )
+
+        with unittest.mock.patch.object( run, "SEARCH_INDEX", index ), \
+                unittest.mock.patch.object( run.log, "error" ) as logerror:
+            response = self.post( "/search_local", { "searchQuery": "user" } )
+
+        self.assertEqual( 500, response.status_code )
+        self.assertEqual( "internal_error", response.json["error"] )
+        self.assertRegex( logerror.call_args[0][0], r"Traceback(.|\n)*ValueError: secret" )
+
+    def test_get_variant_and_not_modified_response(self):
+
+        with unittest.mock.patch.object( run, "run_graphql_query", side_effect=graphql_search_github ) as upstream:
+            first = self.post( "/search_github", { "searchQuery": "stars:>1", "itemsPerPage": 2 } )
+            second = self.client.get( "/search_github?searchQuery=stars:>1&itemsPerPage=2" )
+            third = self.client.get( "/search_github?searchQuery=stars:>1&itemsPerPage=2", headers={ "If-None-Match": first.headers["ETag"] } )
+
+        self.assertEqual( 1, upstream.call_count )
+        self.assertEqual( first.json["repositories"], second.json["repositories"] )
+        self.assertRegex( first.headers["ETag"], r'^W/"\w+"$' )
+        self.assertEqual( first.headers["ETag"], second.headers["ETag"] )
+        self.assertEqual( "public, max-age=60, stale-while-revalidate=30", second.headers["Cache-Control"] )
+        self.assertIn( "Age", second.headers )
+        self.assertNotIn( "Age", first.headers )
+
+        self.assertEqual( 304, third.status_code )
+        self.assertEqual( b"", third.data )
+
+    def test_invalid_get_variant_argument(self):
+        response = self.client.get( "/list_repositories?repositoryUser=evandrocoan&itemsPerPage=many" )
+
+        self.assertEqual( 400, response.status_code )
+        self.assertEqual( "application/json", response.mimetype )
+        self.assertEqual( { "error": "invalid_request", "message": "'itemsPerPage=many' must be of type <class 'int'>!" }, response.json )
+
+    def test_invalid_json_request(self):
+        response = self.client.post( "/search_github", data="{", headers={ 'Content-Type': 'application/json' } )
+
+        self.assertEqual( 400, response.status_code )
+        self.assertEqual( { "error": "invalid_request", "message": "Invalid JSON on your post query!" }, response.json )
+
+    def create_prefetcher(self, remaining):
+        budget = RateLimitBudget()
+        budget.update( { "limit": 5000, "cost": 1, "remaining": remaining, "resetAt": "2100-01-01T00:00:00Z" } )
+        return Prefetcher( budget, minremaining=1000 )
+
+    def test_search_github_next_page_is_prefetched(self):
+        prefetcher = self.create_prefetcher( 4000 )
+
+        with unittest.mock.patch.object( run, "PREFETCHER", prefetcher ), \
+                unittest.mock.patch.dict( run.CACHE_TTLS, { "search_github": 0 } ), \
+                unittest.mock.patch.object( run, "run_graphql_query", side_effect=graphql_search_github ) as upstream:
+
+            first = self.post( "/search_github", { "searchQuery": "stars:>1", "itemsPerPage": 3 } )
+            wait_until( lambda: not prefetcher.stats()["pending"] )
+            self.assertEqual( 2, upstream.call_count )
+
+            second = self.post( "/search_github", { "searchQuery": "stars:>1", "itemsPerPage": 3, "lastItemId": first.json["lastItemId"] } )
+            wait_until( lambda: not prefetcher.stats()["pending"] )
+
+        self.assertEqual( "user/repo3", second.json["repositories"][0]["nameWithOwner"] )
+        self.assertRegex( second.json["rateLimit"], "stale" )
+        self.assertEqual( 1, prefetcher.stats()["taken"] )
+
+    def test_cached_next_page_is_only_kept_by_the_cache(self):
+        prefetcher = self.create_prefetcher( 4000 )
+
+        with unittest.mock.patch.object( run, "PREFETCHER", prefetcher ), \
+                unittest.mock.patch.dict( run.CACHE_TTLS, { "search_github": 60 } ), \
+                unittest.mock.patch.object( run, "run_graphql_query", side_effect=graphql_search_github ) as upstream:
+
+            first = self.post( "/search_github", { "searchQuery": "stars:>1", "itemsPerPage": 3 } )
+            wait_until( lambda: not prefetcher.stats()["pending"] )
+            self.assertEqual( 0, prefetcher.stats()["entries"] )
+
+            second = self.post( "/search_github", { "searchQuery": "stars:>1", "itemsPerPage": 3, "lastItemId": first.json["lastItemId"] } )
+            wait_until( lambda: not prefetcher.stats()["pending"] )
+
+        self.assertEqual( "user/repo3", second.json["repositories"][0]["nameWithOwner"] )
+        self.assertEqual( 0, prefetcher.stats()["taken"] )
+        self.assertEqual( 3, upstream.call_count )
+
+    def test_prefetch_is_skipped_on_low_rate_limit(self):
+        prefetcher = self.create_prefetcher( 500 )
+
+        with unittest.mock.patch.object( run, "PREFETCHER", prefetcher ), \
+                unittest.mock.patch.object( run, "run_graphql_query", side_effect=graphql_list_repositories ) as upstream:
+            response = self.post( "/list_repositories", { "repositoryUser": "evandrocoan" } )
+
+        self.assertEqual( [ { "name": "repo0" }, { "name": "repo1" }, { "name": "repo2" } ], response.json["repositories"] )
+
+        self.assertEqual( 1, upstream.call_count )
+        self.assertEqual( 1, prefetcher.stats()["skipped"] )
+
+    def test_stale_results_are_served_while_refreshed_once(self):
+        clock = FakeClock()
+        revalidator = Revalidator( self.create_prefetcher( 4000 ).budget )
+        refreshing = threading.Event()
+
+        def blocked_search_github(*args, **kwargs):
+            if upstream.call_count > 1:
+                refreshing.wait( 5 )
+            return graphql_search_github( *args, **kwargs )
+
+        with unittest.mock.patch.object( run, "RESPONSE_CACHE", ResponseCache( clock=clock ) ), \
+                unittest.mock.patch.object( run, "REVALIDATOR", revalidator ), \
+                unittest.mock.patch.object( run, "run_graphql_query", side_effect=blocked_search_github ) as upstream:
+            self.post( "/search_github", { "searchQuery": "stars:>1" } )
+
+            # After the 60 seconds TTL, but within the 30 seconds stale window
+            clock.now += 70
+            second = self.post( "/search_github", { "searchQuery": "stars:>1" } )
+            third = self.post( "/search_github", { "searchQuery": "stars:>1" } )
+
+            refreshing.set()
+            wait_until( lambda: revalidator.stats()["pending"] == 0 )
+            fourth = self.post( "/search_github", { "searchQuery": "stars:>1" } )
+
+        self.assertEqual( 200, third.status_code )
+        self.assertRegex( second.json["rateLimit"], "stale, cached 70 seconds ago" )
+        self.assertEqual( "70", third.headers["Age"] )
+        self.assertEqual( "0", fourth.headers["Age"] )
+
+        self.assertEqual( 2, upstream.call_count )
+        self.assertEqual( { "pending": 0, "scheduled": 1, "collapsed": 1, "skipped": 0, "claimed": 0, "failed": 0 }, revalidator.stats() )
+
+    def test_expired_stale_results_are_not_refreshed(self):
+        clock = FakeClock()
+        revalidator = Revalidator( self.create_prefetcher( 4000 ).budget )
+
+        with unittest.mock.patch.object( run, "RESPONSE_CACHE", ResponseCache( clock=clock ) ), \
+                unittest.mock.patch.object( run, "REVALIDATOR", revalidator ), \
+                unittest.mock.patch.dict( run.STALE_TTLS, { "list_repositories": 10 } ), \
+                unittest.mock.patch.object( run, "run_graphql_query", side_effect=graphql_list_repositories ) as upstream:
+            self.post( "/list_repositories", { "repositoryUser": "evandrocoan" } )
+
+            # Nobody asked for it within its 120 seconds TTL plus 10 seconds stale window
+            clock.now += 131
+            response = self.post( "/list_repositories", { "repositoryUser": "evandrocoan" } )
+
+        self.assertNotIn( "Age", response.headers )
+        self.assertEqual( 2, upstream.call_count )
+        self.assertEqual( 0, revalidator.stats()["scheduled"] )
+        self.assertEqual( "public, max-age=120, stale-while-revalidate=10", response.headers["Cache-Control"] )
+
+    def test_rate_limited_request(self):
+
+        with unittest.mock.patch.object( run, "run_graphql_query", side_effect=run.RateLimitExceeded( 120 ) ):
+            response = self.post( "/search_github", { "searchQuery": "stars:>1" } )
+
+        self.assertEqual( 429, response.status_code )
+        self.assertEqual( "121", response.headers.get( "Retry-After" ) )
+        self.assertRegex( response.data.decode( "UTF-8" ), r"rate limit was exceeded, retry after 120 seconds" )
+
+    def test_rate_limit_budget(self):
+        response = self.client.get( "/rate_limit" )
+
+        self.assertEqual( 200, response.status_code )
+        self.assertIn( "remaining", response.json["rateLimit"] )
+        self.assertIn( "interactive", response.json["scheduler"]["shed"] )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+    A local stand-in for the Github GraphQL API, which answers the backend `search`,
+    `repositoryOwner` and `repository` queries with canned results made from their variables,
+    after `latency` seconds, and with the Github rate limit behavior.
+
+    python3 tests/fakegithub.py --port 8001 --latency 0.05
+
+    Then, start the backend with `GITHUB_RESEARCHER_GRAPHQL_URL=http://localhost:8001/graphql`.
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import threading
+import http.server
+
+
+SEARCH_RESULTS = 1000
+OWNER_REPOSITORIES = 200
+
+
+class FakeGithub(object):
+    """
+        Each query costs one rate limit point. When the `ratelimit` points are spent, the queries are
+        refused until `resetafter` seconds, as Github does with `ratelimitmode`:
+        1. `graphql`, a `200` response with a `RATE_LIMITED` error.
+        1. `http403`, a `403` response with `X-RateLimit-Remaining: 0`.
+        1. `http429`, a `429` response with `Retry-After`.
+
+        The queries sent only with their hash (Automatic Persisted Queries) are answered after the
+        query was sent once with its document, when `persistedqueries` is true.
+    """
+
+    def __init__(self, host="localhost", port=0, latency=0, jitter=0, ratelimit=5000, resetafter=3600,
+            ratelimitmode="graphql", persistedqueries=True):
+        self.latency = latency
+        self.jitter = jitter
+        self.ratelimit = ratelimit
+        self.resetafter = resetafter
+        self.ratelimitmode = ratelimitmode
+        self.persistedqueries = persistedqueries
+
+        self.lock = threading.Lock()
+        self.remaining = ratelimit
+        self.resetat = time.time() + resetafter
+        self.documents = {}
+        self.requests = 0
+
+        fakegithub = self
+
+        class RequestHandler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                payload = json.loads( self.rfile.read( int( self.headers.get( "Content-Length", 0 ) ) ) )
+                status, headers, result = fakegithub.answer( payload )
+                body = json.dumps( result ).encode( "UTF-8" )
+
+                self.send_response( status )
+                self.send_header( "Content-Type", "application/json" )
+                self.send_header( "Content-Length", str( len( body ) ) )
+
+                for name, value in headers.items():
+                    self.send_header( name, value )
+
+                self.end_headers()
+                self.wfile.write( body )
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer( ( host, port ), RequestHandler )
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}/graphql"
+
+    def start(self):
+        """ Serves on a background thread, returning itself, for `FakeGithub().start()`. """
+        threading.Thread( target=self.server.serve_forever, name="fake_github", daemon=True ).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def answer(self, payload):
+        """ Returns the `(status, headers, result)` of a `{"query", "variables", "extensions"}` payload. """
+        if self.latency or self.jitter:
+            time.sleep( self.latency + random.uniform( 0, self.jitter ) )
+
+        with self.lock:
+            self.requests += 1
+            now = time.time()
+
+            if now >= self.resetat:
+                self.remaining = self.ratelimit
+                self.resetat = now + self.resetafter
+
+            graphqlquery = self._document( payload )
+            if graphqlquery is None:
+                return 200, {}, { "errors": [ { "message": "PersistedQueryNotFound",
+                        "extensions": { "code": "PERSISTED_QUERY_NOT_FOUND" } } ] }
+
+            retryafter = str( int( self.resetat - now ) + 1 )
+
+            if self.remaining <= 0:
+                if self.ratelimitmode == "http403":
+                    return 403, { "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str( int( self.resetat ) ) }, \
+                            { "message": "API rate limit exceeded" }
+
+                if self.ratelimitmode == "http429":
+                    return 429, { "Retry-After": retryafter }, { "message": "API rate limit exceeded" }
+
+                return 200, {}, { "data": { "rateLimit": self._ratelimit() },
+                        "errors": [ { "type": "RATE_LIMITED", "message": "API rate limit exceeded" } ] }
+
+            self.remaining -= 1
+            data = { "rateLimit": self._ratelimit(), "viewer": { "login": "fakegithub" } }
+
+        variables = payload.get( "variables" ) or {}
+
+        if "search(" in graphqlquery:
+            data["search"] = search_results( variables )
+
+        elif "repositoryOwner(" in graphqlquery:
+            data["repositoryOwner"] = owner_repositories( variables, withdetails="createdAt" in graphqlquery )
+
+        elif "$user0" in graphqlquery:
+            for index in range( len( [ key for key in variables if key.startswith( "repo" ) ] ) ):
+                data[f"repository{index}"] = repository_details( variables[f"user{index}"], variables[f"repo{index}"] )
+
+        elif "repository(" in graphqlquery:
+            data["repository"] = repository_details( variables["user"], variables["repo"] )
+
+        return 200, {}, { "data": data }
+
+    def _document(self, payload):
+        sha256 = ( ( payload.get( "extensions" ) or {} ).get( "persistedQuery" ) or {} ).get( "sha256Hash" )
+
+        if "query" in payload:
+            if sha256 is not None and self.persistedqueries:
+                self.documents[sha256] = payload["query"]
+            return payload["query"]
+
+        return self.documents.get( sha256 )
+
+    def _ratelimit(self):
+        resetat = datetime.datetime.fromtimestamp( self.resetat, datetime.timezone.utc )
+        return {
+            "limit": self.ratelimit,
+            "cost": 1,
+            "remaining": max( self.remaining, 0 ),
+            "resetAt": resetat.strftime( "%Y-%m-%dT%H:%M:%SZ" ),
+        }
+
+
+def page_range(variables, total):
+    """ Each page cursor is the index of its last item. """
+    first = int( variables.get( "lastItem" ) or 0 )
+    last = min( first + variables["items"], total )
+    return first, last
+
+
+def search_results(variables):
+    first, last = page_range( variables, SEARCH_RESULTS )
+    words = re.findall( r"[^\W_]+", variables["query"].lower() ) or [ "repository" ]
+
+    return {
+        "pageInfo": { "hasNextPage": last < SEARCH_RESULTS, "endCursor": str( last ) },
+        "repositoryCount": SEARCH_RESULTS,
+        "nodes": [
+            {
+                "nameWithOwner": f"owner{index}/{words[0]}{index}",
+                "description": f"The {' '.join( words )} repository number {index}",
+                "stargazers": { "totalCount": SEARCH_RESULTS - index },
+            }
+            for index in range( first, last )
+        ],
+    }
+
+
+def owner_repositories(variables, withdetails=False):
+    """ With `withdetails`, each repository also has the `/owner_portfolio` fields. """
+    first, last = page_range( variables, OWNER_REPOSITORIES )
+    nodes = []
+
+    for index in range( first, last ):
+        node = { "name": f"{variables['user']}{index}" }
+
+        if withdetails:
+            node["nameWithOwner"] = f"{variables['user']}/{node['name']}"
+            node["description"] = f"The repository number {index}"
+            node["stargazers"] = { "totalCount": OWNER_REPOSITORIES - index }
+            node.update( repository_details( variables["user"], node["name"] ) )
+
+        nodes.append( node )
+
+    return {
+        "repositories": {
+            "totalCount": OWNER_REPOSITORIES,
+            "pageInfo": { "hasNextPage": last < OWNER_REPOSITORIES, "endCursor": str( last ) },
+            "nodes": nodes,
+        }
+    }
+
+
+def repository_details(user, repository):
+    return {
+        "createdAt": "2016-08-09T21:16:45Z",
+        "issues": { "totalCount": len( user ) + len( repository ) },
+        "languages": { "nodes": [ { "name": "Python" } ] },
+    }
+
+
+def main(arguments=sys.argv[1:]):
+    parser = argparse.ArgumentParser( description="A local stand-in for the Github GraphQL API." )
+    parser.add_argument( "--host", default="localhost" )
+    parser.add_argument( "--port", type=int, default=8001 )
+    parser.add_argument( "--latency", type=float, default=0, help="seconds before answering each query" )
+    parser.add_argument( "--jitter", type=float, default=0, help="up to how many random seconds are added to the latency" )
+    parser.add_argument( "--ratelimit", type=int, default=5000, help="rate limit points until the reset" )
+    parser.add_argument( "--resetafter", type=float, default=3600, help="seconds between the rate limit resets" )
+    parser.add_argument( "--ratelimitmode", default="graphql", choices=[ "graphql", "http403", "http429" ] )
+    arguments = parser.parse_args( arguments )
+
+    fakegithub = FakeGithub( arguments.host, arguments.port, arguments.latency, arguments.jitter,
+            arguments.ratelimit, arguments.resetafter, arguments.ratelimitmode )
+
+    print( f"Serving the fake Github GraphQL API on {fakegithub.url}", flush=True )
+
+    try:
+        fakegithub.server.serve_forever()
+
+    except KeyboardInterrupt:
+        fakegithub.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+
+# https://github.com/evandrocoan/debugtools/blob/079eee5f9b028c4cd17dee0da6a803adcf7d061d/tests/testing/main_unit_tests.py#L69-L75
+def assert_path(*args):
+    module = os.path.realpath( os.path.join( *args ) )
+    if module not in sys.path:
+        sys.path.append( module )
+
+this_direcotory = os.path.dirname( os.path.realpath( __file__ ) )
+assert_path( os.path.dirname( this_direcotory ) )
+assert_path( os.path.dirname( this_direcotory ), "tests" )
+
+
+import json
+import unittest
+import unittest.mock
+
+from testutils import TimeSpentTestCase
+from testutils import wait_until
+from tokenpool import TokenPool
+from scheduler import UpstreamScheduler
+from graphqlqueries import QueryRegistry
+from fakegithub import FakeGithub
+
+import run
+
+
+def main():
+    unittest.main()
+
+
+class FakeGithubEndpointTests(TimeSpentTestCase):
+    """ The backend endpoints, from the Flask test client to the Github API stand-in, without mocking the backend. """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.fakegithub = FakeGithub( latency=0.001 ).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fakegithub.stop()
+
+    def setUp(self):
+        super().setUp()
+        run.RESPONSE_CACHE.clear()
+        self.client = run.APP.test_client()
+        self.use_fake_github( self.fakegithub )
+
+    def use_fake_github(self, fakegithub):
+        tokenpool = TokenPool( [ "fake" ] )
+
+        for patcher in (
+                    unittest.mock.patch.object( run, "graphql_url", fakegithub.url ),
+                    unittest.mock.patch.object( run, "TOKEN_POOL", tokenpool ),
+                    unittest.mock.patch.object( run, "SCHEDULER", UpstreamScheduler( tokenpool ) ),
+                ):
+            patcher.start()
+            self.addCleanup( patcher.stop )
+
+    def post(self, path, data):
+        return self.client.post( path, data=json.dumps( data ), headers={ 'Content-Type': 'application/json' } )
+
+    def test_search_github(self):
+        response = self.post( "/search_github", { "searchQuery": "sublime text", "itemsPerPage": 3 } )
+        results = json.loads( response.data )
+
+        self.assertEqual( 200, response.status_code )
+        self.assertEqual( 1000, results["repositoryCount"] )
+        self.assertEqual( [ "owner0/sublime0", "owner1/sublime1", "owner2/sublime2" ],
+                [ node["nameWithOwner"] for node in results["repositories"] ] )
+
+        response = self.post( "/search_github", { "searchQuery": "sublime text", "itemsPerPage": 3, "lastItemId": results["lastItemId"] } )
+        self.assertEqual( "owner3/sublime3", json.loads( response.data )["repositories"][0]["nameWithOwner"] )
+
+    def test_list_and_detail_repositories(self):
+        response = self.post( "/list_repositories", { "repositoryUser": "evandrocoan", "itemsPerPage": 2 } )
+        results = json.loads( response.data )
+
+        self.assertEqual( 200, response.status_code )
+        self.assertEqual( 4, len( results ) )
+        self.assertEqual( [ "evandrocoan0", "evandrocoan1" ], [ node["name"] for node in results["repositories"] ] )
+
+        response = self.post( "/detail_repository", { "repositoryUser": "evandrocoan", "repositoryName": "ITE" } )
+        results = json.loads( response.data )
+
+        self.assertEqual( 200, response.status_code )
+        self.assertEqual( 4, len( results ) )
+        self.assertEqual( "Python", results["languages"]["nodes"][0]["name"] )
+
+    def test_detail_repositories_batch(self):
+        response = self.post( "/detail_repositories", { "repositories": [
+            { "repositoryUser": "evandrocoan", "repositoryName": "ITE" },
+            { "repositoryUser": "evandrocoan", "repositoryName": "SublimeTextStudio" },
+        ] } )
+        results = json.loads( response.data )
+
+        self.assertEqual( 200, response.status_code )
+        self.assertEqual( { "evandrocoan/ITE", "evandrocoan/SublimeTextStudio" }, set( results["repositories"] ) )
+
+    def test_exhausted_tokens_wait_for_their_reset(self):
+        # The scheduler waits for the reset within its `maxdelay`, instead of refusing the call
+        run.TOKEN_POOL.tokens[0].budget.exhaust( 0.2 )
+        response = self.post( "/detail_repository", { "repositoryUser": "evandrocoan", "repositoryName": "ITE" } )
+
+        self.assertEqual( 200, response.status_code )
+        self.assertEqual( 1, run.SCHEDULER.stats()["delayed"]["interactive"] )
+
+    def test_owner_portfolio(self):
+        requests = self.fakegithub.requests
+        response = self.post( "/owner_portfolio", { "repositoryUser": "evandrocoan", "maxItems": 150 } )
+        results = json.loads( response.data )
+
+        self.assertEqual( 200, response.status_code )
+        self.assertEqual( 200, results["repositoryCount"] )
+        self.assertEqual( 150, len( results["repositories"] ) )
+        self.assertTrue( results["hasMorePages"] )
+        self.assertEqual( "Python", results["repositories"][149]["languages"]["nodes"][0]["name"] )
+        self.assertEqual( 2, self.fakegithub.requests - requests )
+
+        # The repositories details were cached with the portfolio, on background
+        cachekey = run.make_cache_key( run.detail_repository_graphqlquery, { "user": "evandrocoan", "repo": "evandrocoan149" } )
+        wait_until( lambda: cachekey in run.RESPONSE_CACHE )
+
+        response = self.post( "/detail_repository", { "repositoryUser": "evandrocoan", "repositoryName": "evandrocoan149" } )
+        self.assertEqual( 4, len( json.loads( response.data ) ) )
+        self.assertEqual( 2, self.fakegithub.requests - requests )
+
+    def test_owner_portfolio_stream(self):
+        response = self.post( "/owner_portfolio", { "repositoryUser": "octocat", "itemsPerPage": 50, "format": "ndjson" } )
+        lines = [ json.loads( line ) for line in response.data.splitlines() ]
+
+        self.assertEqual( 200, response.status_code )
+        self.assertEqual( 200, len( [ line for line in lines if "repository" in line ] ) )
+        self.assertEqual( "octocat/octocat199", lines[199]["repository"]["nameWithOwner"] )
+        self.assertFalse( lines[-1]["hasMorePages"] )
+        self.assertIn( "rateLimit", lines[-1] )
+
+        response = self.post( "/owner_portfolio", { "repositoryUser": "octocat", "format": "xml" } )
+        self.assertEqual( 400, response.status_code )
+
+    def test_persisted_queries(self):
+        registry = QueryRegistry( persisted=True )
+
+        with unittest.mock.patch.object( run, "QUERY_REGISTRY", registry ):
+            for user in ( "evandrocoan", "octocat" ):
+                self.assertEqual( 200, self.post( "/list_repositories", { "repositoryUser": user, "itemsPerPage": 2 } ).status_code )
+
+        self.assertEqual( 1, registry.stats()["hashOnly"] )
+        self.assertTrue( registry.stats()["persisted"] )
+
+    def test_rate_limit_modes(self):
+
+        for ratelimitmode in ( "graphql", "http403", "http429" ):
+            with self.subTest( ratelimitmode=ratelimitmode ):
+                run.RESPONSE_CACHE.clear()
+                fakegithub = FakeGithub( ratelimit=1, resetafter=120, ratelimitmode=ratelimitmode ).start()
+                self.addCleanup( fakegithub.stop )
+                self.use_fake_github( fakegithub )
+
+                self.assertEqual( 200, self.post( "/detail_repository", { "repositoryUser": "evandrocoan", "repositoryName": "ITE" } ).status_code )
+                response = self.post( "/detail_repository", { "repositoryUser": "evandrocoan", "repositoryName": "SublimeTextStudio" } )
+
+                self.assertEqual( 429, response.status_code )
+                self.assertGreater( int( response.headers["Retry-After"] ), 0 )
+
+    def test_rate_limited_status_is_not_retried(self):
+        fakegithub = FakeGithub( ratelimit=0, resetafter=120, ratelimitmode="http429" ).start()
+        self.addCleanup( fakegithub.stop )
+        self.use_fake_github( fakegithub )
+
+        self.assertIsNone( run.TOKEN_POOL.remaining_budget() )
+        response = self.post( "/detail_repository", { "repositoryUser": "evandrocoan", "repositoryName": "ITE" } )
+
+        self.assertEqual( 429, response.status_code )
+        self.assertEqual( 1, fakegithub.requests )
+        self.assertEqual( 0, run.TOKEN_POOL.remaining_budget() )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+    A local stand-in for a Redis server, which answers the commands used by the `sharedcache.py`
+    backend, expiring the keys as Redis does.
+
+    python3 tests/fakeredis.py --port 6380
+
+    Then, start the backend with `GITHUB_RESEARCHER_SHARED_CACHE=redis://localhost:6380`.
+"""
+
+import sys
+import time
+import socket
+import fnmatch
+import argparse
+import threading
+import socketserver
+
+
+class FakeRedis(object):
+    """
+        Supports `PING`, `AUTH`, `SELECT`, `GET`, `MGET`, `SET` with `EX`, `PX` or `NX`, `DEL`, `PTTL`,
+        `SCAN` with `MATCH` and `FLUSHDB`, on 16 databases. When `password` is given, the other
+        commands are refused until `AUTH`.
+    """
+
+    def __init__(self, host="localhost", port=0, password=None, clock=time.time):
+        self.password = password
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        self.databases = [ {} for index in range( 16 ) ]
+        self.connections = set()
+        self.commands = 0
+
+        fakeredis = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+
+            def handle(self):
+                session = { "database": 0, "authenticated": fakeredis.password is None }
+
+                with fakeredis.lock:
+                    fakeredis.connections.add( self.connection )
+
+                while True:
+                    try:
+                        arguments = read_command( self.rfile )
+
+                    except ( ConnectionError, ValueError ):
+                        return
+
+                    if arguments is None:
+                        return
+
+                    if not arguments:
+                        continue
+
+                    self.wfile.write( fakeredis.answer( session, arguments ) )
+
+        self.server = socketserver.ThreadingTCPServer( ( host, port ), RequestHandler )
+        self.server.daemon_threads = True
+        self.url = f"redis://{host}:{self.server.server_address[1]}"
+
+    def start(self):
+        """ Serves on a background thread, returning itself, for `FakeRedis().start()`. """
+        threading.Thread( target=self.server.serve_forever, name="fake_redis", daemon=True ).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def disconnect(self):
+        """ Closes the clients connections, as Redis does when it restarts or after its `timeout`. """
+        with self.lock:
+            connections, self.connections = self.connections, set()
+
+        for connection in connections:
+            try:
+                connection.shutdown( socket.SHUT_RDWR )
+
+            except OSError:
+                pass
+
+    def answer(self, session, arguments):
+        """ Returns the encoded reply for a command, as a list of bytes arguments. """
+        command = arguments[0].upper().decode( "UTF-8" )
+        arguments = arguments[1:]
+
+        with self.lock:
+            self.commands += 1
+
+            if command == "AUTH":
+                if arguments[-1].decode( "UTF-8" ) != self.password:
+                    return b"-WRONGPASS invalid username-password pair\r\n"
+
+                session["authenticated"] = True
+                return b"+OK\r\n"
+
+            if not session["authenticated"]:
+                return b"-NOAUTH Authentication required.\r\n"
+
+            if command == "PING":
+                return b"+PONG\r\n"
+
+            if command == "SELECT":
+                session["database"] = int( arguments[0] )
+                return b"+OK\r\n"
+
+            database = self.databases[session["database"]]
+            self._expire( database )
+
+            if command == "GET":
+                return encode_bulk( database.get( arguments[0], ( None, None ) )[0] )
+
+            if command == "MGET":
+                return b"*%d\r\n" % len( arguments ) + b"".join(
+                        encode_bulk( database.get( key, ( None, None ) )[0] ) for key in arguments )
+
+            if command == "SET":
+                expiresat = None
+                options = [ argument.upper() for argument in arguments[2:] ]
+
+                if b"NX" in options and arguments[0] in database:
+                    return b"$-1\r\n"
+
+                if b"EX" in options:
+                    expiresat = self.clock() + int( arguments[2 + options.index( b"EX" ) + 1] )
+
+                if b"PX" in options:
+                    expiresat = self.clock() + int( arguments[2 + options.index( b"PX" ) + 1] ) / 1000
+
+                database[arguments[0]] = ( arguments[1], expiresat )
+                return b"+OK\r\n"
+
+            if command == "EXISTS":
+                return b":%d\r\n" % sum( key in database for key in arguments )
+
+            if command == "DEL":
+                return b":%d\r\n" % sum( database.pop( key, None ) is not None for key in arguments )
+
+            if command == "PTTL":
+                if arguments[0] not in database:
+                    return b":-2\r\n"
+
+                expiresat = database[arguments[0]][1]
+                return b":-1\r\n" if expiresat is None else b":%d\r\n" % int( ( expiresat - self.clock() ) * 1000 )
+
+            if command == "SCAN":
+                # All keys are returned on the first call, as Redis may do with small databases
+                options = [ argument.upper() for argument in arguments[1:] ]
+                pattern = arguments[1 + options.index( b"MATCH" ) + 1].decode( "UTF-8" ) if b"MATCH" in options else "*"
+                keys = [ key for key in database if fnmatch.fnmatchcase( key.decode( "UTF-8" ), pattern ) ]
+                return b"*2\r\n" + encode_bulk( b"0" ) + b"*%d\r\n" % len( keys ) + b"".join( encode_bulk( key ) for key in keys )
+
+            if command == "FLUSHDB":
+                database.clear()
+                return b"+OK\r\n"
+
+            return b"-ERR unknown command '%s'\r\n" % command.encode( "UTF-8" )
+
+    def _expire(self, database):
+        now = self.clock()
+
+        for key in [ key for key, ( value, expiresat ) in database.items() if expiresat is not None and expiresat <= now ]:
+            del database[key]
+
+
+def read_command(reader):
+    """ Returns the command arguments as bytes, or None when the connection was closed. """
+    line = reader.readline()
+
+    if not line:
+        return None
+
+    if not line.startswith( b"*" ):
+        # An inline command, as sent by `telnet` or `redis-cli` on a pipe
+        return line.split()
+
+    arguments = []
+    for index in range( int( line[1:] ) ):
+        length = int( reader.readline()[1:] )
+        arguments.append( reader.read( length + 2 )[:-2] )
+
+    return arguments
+
+
+def encode_bulk(value):
+    return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % ( len( value ), value )
+
+
+def main(arguments=sys.argv[1:]):
+    parser = argparse.ArgumentParser( description="A local stand-in for a Redis server." )
+    parser.add_argument( "--host", default="localhost" )
+    parser.add_argument( "--port", type=int, default=6380 )
+    parser.add_argument( "--password", help="require AUTH with this password" )
+    arguments = parser.parse_args( arguments )
+
+    fakeredis = FakeRedis( arguments.host, arguments.port, arguments.password )
+
+    print( f"Serving the fake Redis on {fakeredis.url}", flush=True )
+
+    try:
+        fakeredis.server.serve_forever()
+
+    except KeyboardInterrupt:
+        fakeredis.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+
+# https://github.com/evandrocoan/debugtools/blob/079eee5f9b028c4cd17dee0da6a803adcf7d061d/tests/testing/main_unit_tests.py#L69-L75
+def assert_path(*args):
+    module = os.path.realpath( os.path.join( *args ) )
+    if module not in sys.path:
+        sys.path.append( module )
+
+this_direcotory = os.path.dirname( os.path.realpath( __file__ ) )
+assert_path( os.path.dirname( this_direcotory ) )
+assert_path( os.path.dirname( this_direcotory ), "tests" )
+
+
+import json
+import unittest
+import unittest.mock
+
+from testutils import TimeSpentTestCase
+from graphqlqueries import QueryRegistry
+from responsecache import make_cache_key
+
+from endpointtests import graphql_detail_repository
+
+import run
+
+
+def main():
+    unittest.main()
+
+
+class FakeResponse(object):
+
+    def __init__(self, result, status_code=200):
+        self.result = result
+        self.status_code = status_code
+        self.headers = {}
+        self.content = json.dumps( result ).encode( "UTF-8" )
+
+    def json(self):
+        return self.result
+
+
+class PersistedQueriesUpstream(object):
+    """ Answers as an upstream supporting the Automatic Persisted Queries. """
+
+    def __init__(self):
+        self.documents = {}
+        self.payloads = []
+
+    def __call__(self, url, json, headers):
+        self.payloads.append( json )
+        sha256 = json["extensions"]["persistedQuery"]["sha256Hash"]
+
+        if "query" in json:
+            self.documents[sha256] = json["query"]
+
+        if sha256 not in self.documents:
+            return FakeResponse( { "errors": [ { "message": "PersistedQueryNotFound" } ] } )
+
+        return FakeResponse( graphql_detail_repository() )
+
+
+class QueryRegistryTests(TimeSpentTestCase):
+
+    def test_queries_are_minified_and_hashed(self):
+        registry = QueryRegistry()
+        graphqlquery = registry.register( "query GetViewer {\n    viewer {\n        login\n    }\n}\n" )
+
+        self.assertEqual( "query GetViewer { viewer { login } }", graphqlquery )
+        self.assertEqual( "GetViewer", graphqlquery.name )
+        self.assertIs( graphqlquery, registry.register( "query GetViewer { viewer { login } }" ) )
+        self.assertEqual( 1, registry.stats()["queries"] )
+
+    def test_registered_and_plain_queries_share_cache_keys(self):
+        graphqlquery = QueryRegistry().register( "query {\n  viewer { login }\n}" )
+
+        self.assertEqual(
+            make_cache_key( "query { viewer { login } }", { "a": 1 } ),
+            make_cache_key( graphqlquery, { "a": 1 } ),
+        )
+
+    def test_payload_without_persisted_queries(self):
+        registry = QueryRegistry()
+        graphqlquery = registry.register( "query GetViewer { viewer { login } }" )
+
+        self.assertEqual( { "query": graphqlquery, "variables": {} }, registry.payload( graphqlquery, {} ) )
+
+    def test_persisted_queries_send_the_hash_after_the_document(self):
+        registry = QueryRegistry( persisted=True )
+        graphqlquery = registry.register( "query GetViewer { viewer { login } }" )
+
+        self.assertIn( "query", registry.payload( graphqlquery, {} ) )
+        self.assertEqual(
+            { "variables": {}, "extensions": { "persistedQuery": { "version": 1, "sha256Hash": graphqlquery.sha256 } } },
+            registry.payload( graphqlquery, {} ),
+        )
+
+    def test_unsupported_persisted_queries_are_disabled(self):
+        registry = QueryRegistry( persisted=True )
+        graphqlquery = registry.register( "query GetViewer { viewer { login } }" )
+        registry.payload( graphqlquery, {} )
+
+        payload = registry.payload( graphqlquery, {} )
+        response = FakeResponse( { "errors": [ { "message": "A query attribute must be specified and must be a string." } ] } )
+
+        self.assertTrue( registry.needs_document( graphqlquery, payload, response ) )
+        self.assertFalse( registry.stats()["persisted"] )
+        self.assertIn( "query", registry.payload( graphqlquery, {} ) )
+
+        registry = QueryRegistry( persisted=True )
+        registry.payload( graphqlquery, {} )
+        response = FakeResponse( { "errors": [ { "message": "PersistedQueryNotSupported",
+                "extensions": { "code": "PERSISTED_QUERY_NOT_SUPPORTED" } } ] }, status_code=400 )
+
+        self.assertTrue( registry.needs_document( graphqlquery, registry.payload( graphqlquery, {} ), response ) )
+        self.assertFalse( registry.stats()["persisted"] )
+
+    def test_upstream_errors_keep_persisted_queries(self):
+        registry = QueryRegistry( persisted=True )
+        graphqlquery = registry.register( "query GetViewer { viewer { login } }" )
+        registry.payload( graphqlquery, {} )
+        payload = registry.payload( graphqlquery, {} )
+
+        for response in (
+                    FakeResponse( { "message": "Server Error" }, status_code=500 ),
+                    FakeResponse( { "message": "Bad credentials" }, status_code=401 ),
+                    FakeResponse( { "errors": [ { "message": "Something went wrong" } ] }, status_code=502 ),
+                    FakeResponse( [ "unexpected" ] ),
+                ):
+            with self.subTest( response=response.result ):
+                self.assertFalse( registry.needs_document( graphqlquery, payload, response ) )
+
+        response = FakeResponse( None, status_code=503 )
+        response.json = unittest.mock.Mock( side_effect=ValueError( "<html>Unavailable</html>" ) )
+        self.assertFalse( registry.needs_document( graphqlquery, payload, response ) )
+
+        self.assertTrue( registry.stats()["persisted"] )
+        self.assertEqual( 0, registry.stats()["notFound"] )
+        self.assertNotIn( "query", registry.payload( graphqlquery, {} ) )
+
+    def test_run_graphql_query_resends_unknown_hashes(self):
+        registry = QueryRegistry( persisted=True )
+        upstream = PersistedQueriesUpstream()
+        graphqlquery = registry.register( run.detail_repository_graphqlquery )
+        registry.registered.add( graphqlquery.sha256 )
+
+        with unittest.mock.patch.object( run, "QUERY_REGISTRY", registry ), \
+                unittest.mock.patch.object( run.CONNECTION_POOL, "post", side_effect=upstream ):
+            first = run.run_graphql_query( graphqlquery, { "user": "evandrocoan", "repo": "ITE" } )
+            second = run.run_graphql_query( graphqlquery, { "user": "evandrocoan", "repo": "ITE" } )
+
+        self.assertEqual( first, second )
+        self.assertEqual( [ False, True, False ], [ "query" in payload for payload in upstream.payloads ] )
+        self.assertTrue( registry.stats()["persisted"] )
+        self.assertEqual( 1, registry.stats()["notFound"] )
+
+
+if __name__ == "__main__":
+    main()
@@ -70,7 +70,8 @@ class PythonBackendIntegrationTests(TimeSpentTestCase):
         log( 4, 'response\n%s', decoded_response )
 
         self.assertRegex( decoded_response, r"Missing 'searchQuery' on your post query" )
-        self.assertRegex( response.headers.get( "Content-Type" ), r'text/plain' )
+        self.assertRegex( response.headers.get( "Content-Type" ), r'application/json' )
+        self.assertEqual( "invalid_request", json.loads( response.content )["error"] )
         self.assertEqual( 400, response.status_code )
 
     def test_invalid_server_search_github_request(self):
@@ -87,7 +88,8 @@ class PythonBackendIntegrationTests(TimeSpentTestCase):
         log( 4, 'response\n%s', decoded_response )
 
         self.assertRegex( decoded_response, r"'searchQuery=10' must be of type <class 'str'>" )
-        self.assertRegex( response.headers.get( "Content-Type" ), r'text/plain' )
+        self.assertRegex( response.headers.get( "Content-Type" ), r'application/json' )
+        self.assertEqual( "invalid_request", json.loads( response.content )["error"] )
         self.assertEqual( 400, response.status_code )
 
     def test_valid_server_search_github_request(self):
@@ -126,7 +128,8 @@ class PythonBackendIntegrationTests(TimeSpentTestCase):
         log( 4, 'response\n%s', decoded_response )
 
         self.assertRegex( decoded_response, r"Missing 'repositoryUser' on your post query" )
-        self.assertRegex( response.headers.get( "Content-Type" ), r'text/plain' )
+        self.assertRegex( response.headers.get( "Content-Type" ), r'application/json' )
+        self.assertEqual( "invalid_request", json.loads( response.content )["error"] )
         self.assertEqual( 400, response.status_code )
 
     def test_valid_server_list_repositories_request(self):
@@ -165,7 +168,8 @@ class PythonBackendIntegrationTests(TimeSpentTestCase):
         log( 4, 'response\n%s', decoded_response )
 
         self.assertRegex( decoded_response, r"Missing 'repositoryUser' on your post query" )
-        self.assertRegex( response.headers.get( "Content-Type" ), r'text/plain' )
+        self.assertRegex( response.headers.get( "Content-Type" ), r'application/json' )
+        self.assertEqual( "invalid_request", json.loads( response.content )["error"] )
         self.assertEqual( 400, response.status_code )
 
     def test_valid_server_detail_repositories_request(self):
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+
+# https://github.com/evandrocoan/debugtools/blob/079eee5f9b028c4cd17dee0da6a803adcf7d061d/tests/testing/main_unit_tests.py#L69-L75
+def assert_path(*args):
+    module = os.path.realpath( os.path.join( *args ) )
+    if module not in sys.path:
+        sys.path.append( module )
+
+this_direcotory = os.path.dirname( os.path.realpath( __file__ ) )
+assert_path( os.path.dirname( this_direcotory ) )
+assert_path( os.path.dirname( this_direcotory ), "tests" )
+
+
+import json
+import unittest
+import unittest.mock
+
+from testutils import TimeSpentTestCase
+from jsoncodec import orjson
+from jsoncodec import create_codec
+from jsoncodec import StandardCodec
+from jsoncodec import ResponseFragment
+
+from endpointtests import graphql_ratelimit
+from endpointtests import graphql_detail_repository
+
+import run
+
+
+def main():
+    unittest.main()
+
+
+RESULTS = {
+    "repositoryCount": 2,
+    "repositories": [ { "nameWithOwner": "user/café", "description": "Line\nbreak \"quoted\"", "stargazers": { "totalCount": 1 } } ],
+    "lastItemId": None,
+    "hasMorePages": False,
+}
+
+
+class JsonCodecTests(TimeSpentTestCase):
+
+    def test_standard_codec_is_the_same_as_json_dumps(self):
+        fragment = ResponseFragment.from_results( StandardCodec(), graphql_ratelimit(), RESULTS )
+
+        self.assertEqual( json.dumps( RESULTS ).encode( "UTF-8" ), fragment.fragment )
+        self.assertEqual( json.dumps( dict( RESULTS, rateLimit="evandrocoan, ü" ) ).encode( "UTF-8" ), fragment.body( "evandrocoan, ü" ) )
+
+    def test_append_field_to_empty_object(self):
+        self.assertEqual( b'{"rateLimit": ""}', StandardCodec().append_field( b"{}", "rateLimit", "" ) )
+
+    @unittest.skipIf( orjson is None, "The 'orjson' package is not installed!" )
+    def test_orjson_codec_body(self):
+        codec = create_codec( "orjson" )
+        fragment = ResponseFragment.from_results( codec, graphql_ratelimit(), RESULTS )
+
+        self.assertEqual( orjson.dumps( dict( RESULTS, rateLimit="evandrocoan" ) ), fragment.body( "evandrocoan" ) )
+        self.assertEqual( dict( RESULTS, rateLimit="evandrocoan" ), json.loads( fragment.body( "evandrocoan" ) ) )
+
+    def test_fragment_bytes_round_trip(self):
+
+        for codec in ( create_codec( "json" ), create_codec( "auto" ) ):
+            fragment = ResponseFragment.from_results( codec, graphql_ratelimit(), RESULTS )
+            decoded = ResponseFragment.from_bytes( codec, fragment.to_bytes() )
+
+            self.assertEqual( graphql_ratelimit(), decoded.ratelimitdata )
+            self.assertEqual( RESULTS, decoded.results() )
+
+    def test_unknown_codec(self):
+        self.assertRaises( ValueError, create_codec, "pickle" )
+
+    def test_detail_repository_response_is_the_same_as_json_dumps(self):
+        client = run.APP.test_client()
+        run.RESPONSE_CACHE.clear()
+
+        with unittest.mock.patch.object( run, "JSON_CODEC", StandardCodec() ), \
+                unittest.mock.patch.object( run, "run_graphql_query", return_value=graphql_detail_repository() ):
+            response = client.post( "/detail_repository", json={ "repositoryUser": "evandrocoan", "repositoryName": "ITE" } )
+
+        expected = graphql_detail_repository()["data"]["repository"]
+        expected["rateLimit"] = run.formatratelimit( graphql_ratelimit() )
+        self.assertEqual( json.dumps( expected ).encode( "UTF-8" ), response.data )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+
+# https://github.com/evandrocoan/debugtools/blob/079eee5f9b028c4cd17dee0da6a803adcf7d061d/tests/testing/main_unit_tests.py#L69-L75
+def assert_path(*args):
+    module = os.path.realpath( os.path.join( *args ) )
+    if module not in sys.path:
+        sys.path.append( module )
+
+this_direcotory = os.path.dirname( os.path.realpath( __file__ ) )
+assert_path( os.path.dirname( this_direcotory ) )
+assert_path( os.path.dirname( this_direcotory ), "tests" )
+
+
+import os
+import re
+import json
+import time
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+from testutils import TimeSpentTestCase
+from metrics import BackendMetrics, Histogram
+from compression import ResponseCompressor
+
+from endpointtests import graphql_search_github
+
+import run
+
+
+def main():
+    unittest.main()
+
+
+class HistogramTests(TimeSpentTestCase):
+
+    def test_cumulative_buckets(self):
+        histogram = Histogram( "duration", "A duration.", ( "endpoint", ), buckets=( 0.1, 1 ) )
+
+        for value in ( 0.05, 0.5, 0.7, 5 ):
+            histogram.observe( value, "search" )
+
+        samples = { ( name, labels.get( "le" ) ): value for name, labels, value in histogram.samples() }
+        self.assertEqual( 1, samples[("duration_bucket", 0.1)] )
+        self.assertEqual( 3, samples[("duration_bucket", 1)] )
+        self.assertEqual( 4, samples[("duration_bucket", "+Inf")] )
+        self.assertEqual( 4, samples[("duration_count", None)] )
+        self.assertAlmostEqual( 6.25, samples[("duration_sum", None)] )
+
+    def test_render_stats_as_gauges(self):
+        metrics = BackendMetrics( collect_stats=lambda: {
+            "responseCache": { "hits": 3, "enabled": True, "keys": [ "a" ] },
+            "scheduler": { "waiting": { "search": 2 } },
+            "prefetch": None,
+        } )
+        text = metrics.render()
+
+        self.assertIn( "githubresearcher_response_cache_hits 3\n", text )
+        self.assertIn( 'githubresearcher_scheduler_waiting{name="search"} 2\n', text )
+        self.assertNotIn( "enabled", text )
+        self.assertNotIn( "keys", text )
+
+
+class SharedMetricsTests(TimeSpentTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup( shutil.rmtree, self.directory )
+
+    def share_as(self, pid, metrics):
+        """ Writes `metrics` as if they were from another worker process `pid`. """
+        metrics.share( force=True )
+        os.replace( os.path.join( self.directory, f"{os.getpid()}.json" ), os.path.join( self.directory, f"{pid}.json" ) )
+
+    def test_workers_metrics_are_summed(self):
+        running = BackendMetrics( directory=self.directory )
+        running.results.inc( "search_github", "cache", amount=2 )
+        running.requestsinflight.inc()
+        running.requestduration.observe( 0.5, "search_github", "POST", "200" )
+        self.share_as( os.getppid(), running )
+
+        # A worker which already stopped, as there is no process with this pid
+        stopped = BackendMetrics( directory=self.directory )
+        stopped.results.inc( "search_github", "cache" )
+        stopped.requestsinflight.inc()
+        self.share_as( 2 ** 30, stopped )
+
+        current = BackendMetrics( directory=self.directory )
+        current.results.inc( "search_github", "cache" )
+        current.requestduration.observe( 0.5, "search_github", "POST", "200" )
+        text = current.render()
+
+        self.assertIn( 'githubresearcher_results_total{endpoint="search_github",source="cache"} 4\n', text )
+        self.assertIn( 'githubresearcher_request_duration_seconds_count{endpoint="search_github",method="POST",status="200"} 2\n', text )
+        self.assertIn( "githubresearcher_requests_in_flight 1\n", text )
+
+    def test_metrics_are_written_once_by_interval(self):
+        clock = unittest.mock.Mock( return_value=0 )
+        metrics = BackendMetrics( directory=self.directory, interval=5, clock=clock )
+        path = os.path.join( self.directory, f"{os.getpid()}.json" )
+
+        metrics.share()
+        metrics.results.inc( "search_github", "cache" )
+        metrics.share()
+
+        with open( path ) as file:
+            self.assertEqual( [], json.load( file )["githubresearcher_results_total"] )
+
+        clock.return_value = 5
+        metrics.share()
+
+        with open( path ) as file:
+            self.assertEqual( [ [ [ "search_github", "cache" ], 1 ] ], json.load( file )["githubresearcher_results_total"] )
+
+
+class MetricsEndpointTests(TimeSpentTestCase):
+
+    def setUp(self):
+        super().setUp()
+        run.RESPONSE_CACHE.clear()
+        self.client = run.APP.test_client()
+
+    def post(self, path, data):
+        return self.client.post( path, data=json.dumps( data ), headers={ 'Content-Type': 'application/json' } )
+
+    def test_metrics_disabled(self):
+        with unittest.mock.patch.object( run, "METRICS", None ):
+            response = self.client.get( "/metrics" )
+
+        self.assertEqual( 404, response.status_code )
+        self.assertEqual( "not_found", response.json["error"] )
+
+    def test_requests_and_results_by_source(self):
+        search = { "searchQuery": "metrics", "itemsPerPage": 2 }
+
+        with unittest.mock.patch.object( run, "METRICS", BackendMetrics( collect_stats=run.collect_stats ) ), \
+                unittest.mock.patch.object( run, "run_graphql_query", side_effect=graphql_search_github ):
+            self.assertEqual( 200, self.post( "/search_github", search ).status_code )
+            self.assertEqual( 200, self.post( "/search_github", search ).status_code )
+
+            response = self.client.get( "/metrics" )
+            text = response.data.decode( "UTF-8" )
+
+        self.assertEqual( "text/plain; version=0.0.4; charset=utf-8", response.headers["Content-Type"] )
+        self.assertIn( 'githubresearcher_results_total{endpoint="search_github",source="github"} 1', text )
+        self.assertIn( 'githubresearcher_results_total{endpoint="search_github",source="cache"} 1', text )
+        self.assertIn( 'githubresearcher_request_duration_seconds_count{endpoint="search_github",method="POST",status="200"} 2', text )
+        self.assertIn( 'githubresearcher_json_duration_seconds_count{operation="encode"} 1', text )
+
+        # The `/metrics` request itself is still in flight while it is rendered
+        self.assertRegex( text, r"githubresearcher_requests_in_flight 1(\.0)?\n" )
+        self.assertRegex( text, re.escape( "githubresearcher_response_cache_entries " ) + r"\d+" )
+
+    def test_request_duration_includes_the_compression(self):
+        compressor = ResponseCompressor( minsize=0 )
+        compress = compressor.compress
+
+        def slow_compress(*args, **kwargs):
+            time.sleep( 0.05 )
+            return compress( *args, **kwargs )
+
+        with unittest.mock.patch.object( run, "METRICS", BackendMetrics() ) as metrics, \
+                unittest.mock.patch.object( run, "RESPONSE_COMPRESSOR", compressor ), \
+                unittest.mock.patch.object( compressor, "compress", side_effect=slow_compress ), \
+                unittest.mock.patch.object( run, "run_graphql_query", side_effect=graphql_search_github ):
+            response = self.client.post( "/search_github", json={ "searchQuery": "metrics" }, headers={ "Accept-Encoding": "gzip" } )
+
+        samples = { name: value for name, labels, value in metrics.requestduration.samples() }
+        self.assertEqual( "gzip", response.headers["Content-Encoding"] )
+        self.assertGreaterEqual( samples["githubresearcher_request_duration_seconds_sum"], 0.05 )
+
+
+if __name__ == "__main__":
+    main()
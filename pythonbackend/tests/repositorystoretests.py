@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+
+# https://github.com/evandrocoan/debugtools/blob/079eee5f9b028c4cd17dee0da6a803adcf7d061d/tests/testing/main_unit_tests.py#L69-L75
+def assert_path(*args):
+    module = os.path.realpath( os.path.join( *args ) )
+    if module not in sys.path:
+        sys.path.append( module )
+
+this_direcotory = os.path.dirname( os.path.realpath( __file__ ) )
+assert_path( os.path.dirname( this_direcotory ) )
+assert_path( os.path.dirname( this_direcotory ), "tests" )
+
+
+import sqlite3
+import unittest
+
+from testutils import TimeSpentTestCase
+from testutils import FakeClock
+from repositorystore import RepositoryStore
+
+from endpointtests import graphql_detail_repository
+from endpointtests import graphql_search_github
+
+
+def main():
+    unittest.main()
+
+
+class RepositoryStoreTests(TimeSpentTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.clock = FakeClock()
+        self.store = RepositoryStore( ":memory:", staleafter=60, maxage=600, clock=self.clock )
+
+    def tearDown(self):
+        self.store.close()
+        super().tearDown()
+
+    def test_details_round_trip(self):
+        self.store.save( "detail_repository", { "user": "evandrocoan", "repo": "ITE" }, graphql_detail_repository() )
+        self.clock.now += 30
+
+        graphqlresults, age = self.store.get_details( "evandrocoan/ite" )
+        self.assertEqual( graphql_detail_repository(), graphqlresults )
+        self.assertEqual( 30, age )
+
+    def test_details_without_language(self):
+        graphqlresults = graphql_detail_repository()
+        graphqlresults["data"]["repository"]["languages"]["nodes"] = []
+        self.store.save( "detail_repository", { "user": "evandrocoan", "repo": "ITE" }, graphqlresults )
+
+        self.assertEqual( [], self.store.get_details( "evandrocoan/ITE" )[0]["data"]["repository"]["languages"]["nodes"] )
+
+    def test_details_expire_after_max_age(self):
+        self.store.save( "detail_repository", { "user": "evandrocoan", "repo": "ITE" }, graphql_detail_repository() )
+        self.clock.now += 601
+
+        self.assertIsNone( self.store.get_details( "evandrocoan/ITE" ) )
+        self.assertEqual( { "repositories": 1, "repositoriesWithDetails": 1, "hits": 0, "misses": 1 }, self.store.stats() )
+
+    def test_details_are_saved_together(self):
+        repository = graphql_detail_repository()["data"]["repository"]
+        self.store.save_details( [ ( "user/repo0", repository ), ( "user/repo1", repository ) ], graphql_detail_repository()["data"] )
+
+        self.assertEqual( graphql_detail_repository(), self.store.get_details( "user/repo1" )[0] )
+        self.assertEqual( 2, self.store.stats()["repositoriesWithDetails"] )
+
+    def test_failed_batch_saves_nothing(self):
+        repository = graphql_detail_repository()["data"]["repository"]
+        unsupported = dict( repository, createdAt=object() )
+
+        with self.assertRaises( sqlite3.Error ):
+            self.store.save_details( [ ( "user/repo0", repository ), ( "user/repo1", unsupported ) ], graphql_detail_repository()["data"] )
+
+        self.assertEqual( 0, self.store.stats()["repositories"] )
+
+    def test_search_and_list_results_do_not_have_details(self):
+        self.store.save( "search_github", {}, graphql_search_github( "", { "items": 3 } ) )
+        self.store.save( "list_repositories", { "user": "user" },
+                { "data": { "repositoryOwner": { "repositories": { "nodes": [ { "name": "repo0" }, { "name": "other" } ] } } } } )
+
+        self.assertIsNone( self.store.get_details( "user/repo0" ) )
+        self.assertEqual( 4, self.store.stats()["repositories"] )
+        self.assertEqual( 0, self.store.stats()["repositoriesWithDetails"] )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+
+# https://github.com/evandrocoan/debugtools/blob/079eee5f9b028c4cd17dee0da6a803adcf7d061d/tests/testing/main_unit_tests.py#L69-L75
+def assert_path(*args):
+    module = os.path.realpath( os.path.join( *args ) )
+    if module not in sys.path:
+        sys.path.append( module )
+
+this_direcotory = os.path.dirname( os.path.realpath( __file__ ) )
+assert_path( os.path.dirname( this_direcotory ) )
+assert_path( os.path.dirname( this_direcotory ), "tests" )
+
+import unittest
+
+from testutils import TimeSpentTestCase
+from testutils import FakeClock
+from responsecache import ResponseCache
+from responsecache import make_cache_key
+
+
+def main():
+    unittest.main()
+
+
+class ResponseCacheUnitTests(TimeSpentTestCase):
+
+    def test_cache_key_normalization(self):
+        self.assertEqual(
+            make_cache_key( "query {\n  viewer { login }\n}", { "a": 1, "b": 2 } ),
+            make_cache_key( "query { viewer { login } }", { "b": 2, "a": 1 } ),
+        )
+        self.assertNotEqual(
+            make_cache_key( "query { viewer { login } }", { "a": 1 } ),
+            make_cache_key( "query { viewer { login } }", { "a": 2 } ),
+        )
+
+    def test_entries_expire_after_their_ttl(self):
+        clock = FakeClock()
+        cache = ResponseCache( clock=clock )
+
+        cache.set( "key", b"value", ttl=10 )
+        clock.now += 4
+        self.assertEqual( ( b"value", 4 ), cache.get( "key" ) )
+
+        clock.now += 6
+        self.assertIsNone( cache.get( "key" ) )
+
+        stats = cache.stats()
+        self.assertEqual( 1, stats["hits"] )
+        self.assertEqual( 1, stats["misses"] )
+        self.assertEqual( 1, stats["expirations"] )
+        self.assertEqual( 0, stats["bytes"] )
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ResponseCache( maxentries=2 )
+
+        cache.set( "first", b"1", ttl=10 )
+        cache.set( "second", b"2", ttl=10 )
+        cache.get( "first" )
+        cache.set( "third", b"3", ttl=10 )
+
+        self.assertIsNone( cache.get( "second" ) )
+        self.assertIsNotNone( cache.get( "first" ) )
+        self.assertIsNotNone( cache.get( "third" ) )
+        self.assertEqual( 1, cache.stats()["evictions"] )
+
+    def test_cache_is_bounded_by_bytes(self):
+        cache = ResponseCache( maxbytes=30 )
+
+        cache.set( "a", b"x" * 10, ttl=10 )
+        cache.set( "b", b"x" * 10, ttl=10 )
+        cache.set( "c", b"x" * 10, ttl=10 )
+        cache.set( "huge", b"x" * 100, ttl=10 )
+
+        stats = cache.stats()
+        self.assertEqual( 2, stats["entries"] )
+        self.assertEqual( 22, stats["bytes"] )
+        self.assertIsNone( cache.get( "a" ) )
+        self.assertIsNone( cache.get( "huge" ) )
+
+
+if __name__ == "__main__":
+    main()
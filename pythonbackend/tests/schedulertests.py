@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+
+# https://github.com/evandrocoan/debugtools/blob/079eee5f9b028c4cd17dee0da6a803adcf7d061d/tests/testing/main_unit_tests.py#L69-L75
+def assert_path(*args):
+    module = os.path.realpath( os.path.join( *args ) )
+    if module not in sys.path:
+        sys.path.append( module )
+
+this_direcotory = os.path.dirname( os.path.realpath( __file__ ) )
+assert_path( os.path.dirname( this_direcotory ) )
+assert_path( os.path.dirname( this_direcotory ), "tests" )
+
+import threading
+import unittest
+
+from testutils import TimeSpentTestCase
+from testutils import FakeClock
+from testutils import wait_until
+from ratelimit import RateLimitBudget
+from ratelimit import RateLimitExceeded
+from tokenpool import TokenPool
+
+from scheduler import UpstreamScheduler
+from scheduler import INTERACTIVE_PRIORITY
+from scheduler import SEARCH_PRIORITY
+from scheduler import PREFETCH_PRIORITY
+
+
+def main():
+    unittest.main()
+
+
+class UpstreamSchedulerUnitTests(TimeSpentTestCase):
+
+    def create_budget(self, remaining, resetat="2020-01-01T01:00:00Z"):
+        budget = RateLimitBudget( clock=FakeClock() )
+        budget.update( { "limit": 5000, "cost": 1, "remaining": remaining, "resetAt": resetat } )
+        return budget
+
+    def test_waiting_calls_run_by_priority(self):
+        order = []
+        started = threading.Event()
+        release = threading.Event()
+        scheduler = UpstreamScheduler( RateLimitBudget(), maxconcurrent=1 )
+
+        def blocking_call():
+            started.set()
+            release.wait()
+
+        def queue_call(priority):
+            scheduler.run( priority, order.append, priority )
+
+        blocker = threading.Thread( target=scheduler.run, args=( INTERACTIVE_PRIORITY, blocking_call ) )
+        blocker.start()
+        started.wait()
+
+        threads = []
+        for priority in ( PREFETCH_PRIORITY, SEARCH_PRIORITY, INTERACTIVE_PRIORITY ):
+            threads.append( threading.Thread( target=queue_call, args=( priority, ) ) )
+            threads[-1].start()
+
+        wait_until( lambda: sum( scheduler.stats()["waiting"].values() ) == 3 )
+        release.set()
+
+        for thread in threads + [ blocker ]: thread.join()
+        self.assertEqual( [ INTERACTIVE_PRIORITY, SEARCH_PRIORITY, PREFETCH_PRIORITY ], order )
+
+    def test_low_priority_calls_are_shed(self):
+        scheduler = UpstreamScheduler( self.create_budget( 50 ), maxdelay=10 )
+
+        self.assertEqual( "interactive", scheduler.run( INTERACTIVE_PRIORITY, lambda: "interactive" ) )
+
+        with self.assertRaises( RateLimitExceeded ) as error:
+            scheduler.run( SEARCH_PRIORITY, lambda: "search" )
+
+        self.assertEqual( 3600, error.exception.retryafter )
+        self.assertEqual( 1, scheduler.stats()["shed"]["search"] )
+
+    def test_low_priority_calls_are_delayed_near_the_reset(self):
+        scheduler = UpstreamScheduler( self.create_budget( 50, "2020-01-01T00:00:05Z" ), maxdelay=10 )
+
+        self.assertEqual( 5, scheduler.admit( SEARCH_PRIORITY ) )
+        self.assertEqual( 0, scheduler.admit( INTERACTIVE_PRIORITY ) )
+        self.assertEqual( 1, scheduler.stats()["delayed"]["search"] )
+
+    def test_token_pool_reserves_are_enforced(self):
+        pool = TokenPool( [ "token1" ], clock=FakeClock() )
+        pool.tokens[0].budget.update( { "limit": 5000, "cost": 1, "remaining": 50, "resetAt": "2099-01-01T00:00:00Z" } )
+        scheduler = UpstreamScheduler( pool, maxdelay=10 )
+
+        self.assertEqual( 0, scheduler.admit( INTERACTIVE_PRIORITY ) )
+
+        for priority in ( SEARCH_PRIORITY, PREFETCH_PRIORITY ):
+            with self.assertRaises( RateLimitExceeded ):
+                scheduler.admit( priority )
+
+        self.assertEqual( { "interactive": 0, "search": 1, "prefetch": 1 }, scheduler.stats()["shed"] )
+
+    def test_token_pool_calls_are_delayed_until_the_first_reset(self):
+        pool = TokenPool( [ "token1", "token2" ], clock=FakeClock() )
+        pool.tokens[0].budget.update( { "limit": 5000, "cost": 1, "remaining": 50, "resetAt": "2020-01-01T01:00:00Z" } )
+        pool.tokens[1].budget.update( { "limit": 5000, "cost": 1, "remaining": 0, "resetAt": "2020-01-01T00:00:05Z" } )
+        scheduler = UpstreamScheduler( pool, maxdelay=10 )
+
+        self.assertEqual( 5, scheduler.admit( SEARCH_PRIORITY ) )
+        self.assertEqual( 0, scheduler.admit( INTERACTIVE_PRIORITY ) )
+
+    def test_exhausted_budget_sheds_all_calls(self):
+        scheduler = UpstreamScheduler( self.create_budget( 0 ) )
+
+        with self.assertRaises( RateLimitExceeded ):
+            scheduler.admit( INTERACTIVE_PRIORITY )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+
+# https://github.com/evandrocoan/debugtools/blob/079eee5f9b028c4cd17dee0da6a803adcf7d061d/tests/testing/main_unit_tests.py#L69-L75
+def assert_path(*args):
+    module = os.path.realpath( os.path.join( *args ) )
+    if module not in sys.path:
+        sys.path.append( module )
+
+this_direcotory = os.path.dirname( os.path.realpath( __file__ ) )
+assert_path( os.path.dirname( this_direcotory ) )
+assert_path( os.path.dirname( this_direcotory ), "tests" )
+
+
+import random
+import unittest
+import unittest.mock
+
+import searchindex
+
+from testutils import TimeSpentTestCase
+from searchindex import SearchIndex
+from searchindex import tokenize_query
+
+
+def main():
+    unittest.main()
+
+
+def repository(namewithowner, description, stars):
+    return { "nameWithOwner": namewithowner, "description": description, "stargazers": { "totalCount": stars } }
+
+
+class SearchIndexTests(TimeSpentTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.index = SearchIndex()
+        self.index.add( [
+            repository( "evandrocoan/ITE", "Integrated Test Environment", 10 ),
+            repository( "evandrocoan/SublimeTextStudio", "Sublime Text packages", 50 ),
+            repository( "sublimehq/Packages", "Syntax definitions for Sublime Text", 2000 ),
+            repository( "someone/nodescription", None, 1 ),
+        ] )
+
+    def names(self, searchquery, items=10):
+        return [ node["nameWithOwner"] for node in self.index.search( searchquery, items )[1] ]
+
+    def test_prefix_terms_ranked_by_stars(self):
+        self.assertEqual( [ "sublimehq/Packages", "evandrocoan/SublimeTextStudio" ], self.names( "subl" ) )
+        self.assertEqual( [ "evandrocoan/SublimeTextStudio", "evandrocoan/ITE" ], self.names( "evandro" ) )
+
+    def test_all_terms_must_match(self):
+        self.assertEqual( [ "evandrocoan/SublimeTextStudio" ], self.names( "evandrocoan sublime" ) )
+        self.assertEqual( [], self.names( "evandrocoan syntax" ) )
+
+    def test_items_limit_and_count(self):
+        self.assertEqual( ( 2, [ repository( "sublimehq/Packages", "Syntax definitions for Sublime Text", 2000 ) ] ),
+                self.index.search( "sublime", 1 ) )
+
+    def test_github_qualifiers_are_ignored(self):
+        self.assertEqual( [ "ite" ], tokenize_query( "ITE stars:>1 language:python" ) )
+        self.assertEqual( [], self.names( "stars:>1" ) )
+
+    def test_reindexed_repository_replaces_its_terms(self):
+        self.index.add( [ repository( "evandrocoan/ite", "Renamed", 11 ) ] )
+
+        self.assertEqual( [], self.names( "integrated" ) )
+        self.assertEqual( [ "evandrocoan/ite" ], self.names( "renamed" ) )
+        self.assertEqual( 4, self.index.stats()["repositories"] )
+
+    def test_least_recently_indexed_are_evicted(self):
+        index = SearchIndex( maxrepositories=2 )
+        index.add( [ repository( f"user/repo{index}", "", index ) for index in range( 3 ) ] )
+
+        self.assertEqual( [ "user/repo2", "user/repo1" ], [ node["nameWithOwner"] for node in index.search( "user" )[1] ] )
+        self.assertEqual( 1, index.stats()["evictions"] )
+        self.assertEqual( 3, index.stats()["terms"] )
+
+    def test_frequent_term_prefix_counts_each_repository_once(self):
+        index = SearchIndex()
+        index.add( [ repository( f"user/repo{index}", "python", index ) for index in range( 20 ) ] )
+        index.add( [ repository( "other/pythonic", "python", 100 ), repository( "other/pyramid", "", 5 ) ] )
+
+        self.assertEqual( 22, index.search( "py" )[0] )
+        self.assertEqual( [ "other/pythonic", "user/repo19", "user/repo18" ], [ node["nameWithOwner"] for node in index.search( "py", 3 )[1] ] )
+        self.assertEqual( [ "other/pyramid" ], [ node["nameWithOwner"] for node in index.search( "pyr" )[1] ] )
+
+    def test_removed_terms_are_indexed_again(self):
+        index = SearchIndex( maxrepositories=1 )
+        index.add( [ repository( "user/first", "", 1 ) ] )
+        self.assertEqual( 1, index.search( "first" )[0] )
+
+        index.add( [ repository( "user/second", "", 1 ) ] )
+        self.assertEqual( 0, index.search( "first" )[0] )
+
+        index.add( [ repository( "user/first", "", 1 ) ] )
+        self.assertEqual( [ "user/first" ], [ node["nameWithOwner"] for node in index.search( "fir" )[1] ] )
+        self.assertEqual( [ "first", "user" ], index.terms )
+
+    def test_no_items_still_counts_the_matches(self):
+        self.assertEqual( ( 2, [] ), self.index.search( "sublime", -1 ) )
+        self.assertEqual( ( 3, [] ), self.index.search( "s", 0 ) )
+
+    def test_frequent_terms_bitmaps_match_their_words(self):
+        generator = random.Random( 0 )
+        words = [ "sublime", "text", "python", "pythonic", "ite", "integrated", "test" ]
+        index = SearchIndex( maxrepositories=100 )
+        indexed = {}
+        frequent = set()
+
+        # The first words cross the bitmap size, and then, fall below it again, while they are evicted
+        with unittest.mock.patch.object( searchindex, "BITMAP_SIZE", 16 ):
+            for page in range( 10 ):
+                pagewords = words[:4] if page < 5 else words[3:]
+                repositories = [ repository( f"user{generator.randrange( 150 )}/repo",
+                        " ".join( generator.sample( pagewords, generator.randint( 1, 3 ) ) ), generator.randrange( 1000 ) ) for item in range( 30 ) ]
+                index.add( repositories )
+
+                for node in repositories:
+                    indexed.pop( node["nameWithOwner"], None )
+                    indexed[node["nameWithOwner"]] = node
+
+                while len( indexed ) > 100:
+                    indexed.pop( next( iter( indexed ) ) )
+
+                frequent.update( index.bitmaps )
+
+                for searchquery in ( "s", "py", "python", "te", "i test", "python sublime", "user1 t", "p i s" ):
+                    terms = tokenize_query( searchquery )
+                    expected = [ node for node in indexed.values() if all( any( word.startswith( term )
+                            for word in searchindex.tokenize( node["nameWithOwner"] + " " + node["description"] ) ) for term in terms ) ]
+
+                    count, nodes = index.search( searchquery, 5 )
+                    self.assertEqual( len( expected ), count, searchquery )
+                    self.assertEqual( sorted( node["stargazers"]["totalCount"] for node in expected )[::-1][:5],
+                            [ node["stargazers"]["totalCount"] for node in nodes ], searchquery )
+
+        self.assertIn( "sublime", frequent )
+        self.assertNotIn( "sublime", index.bitmaps )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+
+# https://github.com/evandrocoan/debugtools/blob/079eee5f9b028c4cd17dee0da6a803adcf7d061d/tests/testing/main_unit_tests.py#L69-L75
+def assert_path(*args):
+    module = os.path.realpath( os.path.join( *args ) )
+    if module not in sys.path:
+        sys.path.append( module )
+
+this_direcotory = os.path.dirname( os.path.realpath( __file__ ) )
+assert_path( os.path.dirname( this_direcotory ) )
+assert_path( os.path.dirname( this_direcotory ), "tests" )
+
+import socket
+import tempfile
+import threading
+import unittest
+import unittest.mock
+
+from testutils import TimeSpentTestCase
+from testutils import FakeClock
+from testutils import wait_until
+from fakeredis import FakeRedis
+from tokenpool import TokenPool
+from revalidator import Revalidator
+from ratelimit import RateLimitExceeded
+from sharedcache import RespClient
+from sharedcache import RespBackend
+from sharedcache import SqliteBackend
+from sharedcache import SharedCache
+from sharedcache import SharedBudgets
+from sharedcache import SharedCacheError
+from sharedcache import create_backend
+
+import run
+
+from endpointtests import graphql_search_github
+
+
+def main():
+    unittest.main()
+
+
+def ratelimit(remaining, resetat="2020-01-01T01:00:00Z"):
+    return { "limit": 5000, "cost": 1, "remaining": remaining, "resetAt": resetat }
+
+
+class RespClientUnitTests(TimeSpentTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.fakeredis = FakeRedis( password="secret" ).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fakeredis.stop()
+
+    def test_commands_reuse_the_connection(self):
+        client = create_backend( self.fakeredis.url.replace( "redis://", "redis://:secret@" ) + "/2" ).client
+        self.assertEqual( "PONG", client.execute( "PING" ) )
+        self.assertEqual( "OK", client.execute( "SET", "key", b"value" ) )
+        self.assertEqual( [ b"value", None ], client.execute( "MGET", "key", "missing" ) )
+        self.assertEqual( 1, client.connections )
+        self.assertEqual( {}, self.fakeredis.databases[0] )
+        self.assertIn( b"key", self.fakeredis.databases[2] )
+        client.close()
+
+    def test_refused_command_raises(self):
+        client = RespClient( port=self.fakeredis.server.server_address[1] )
+
+        with self.assertRaisesRegex( SharedCacheError, "NOAUTH" ):
+            client.execute( "GET", "key" )
+
+        client.close()
+
+    def test_broken_connections_are_not_reused(self):
+        client = create_backend( self.fakeredis.url.replace( "redis://", "redis://:secret@" ) ).client
+
+        for drop in ( lambda: client.idle[0][0].shutdown( socket.SHUT_RDWR ), self.fakeredis.disconnect ):
+            with self.subTest( drop=drop ):
+                self.assertEqual( "PONG", client.execute( "PING" ) )
+                drop()
+
+                # A connection dropped by the client fails its command, and a connection closed by
+                # the server answers nothing, but neither goes back to the pool
+                with self.assertRaises( SharedCacheError ):
+                    client.execute( "PING" )
+
+                self.assertEqual( [], client.idle )
+                self.assertEqual( "PONG", client.execute( "PING" ) )
+                self.assertEqual( 1, len( client.idle ) )
+
+        self.assertEqual( 3, client.connections )
+        client.close()
+
+    def test_error_replies_keep_the_connection(self):
+        client = create_backend( self.fakeredis.url.replace( "redis://", "redis://:secret@" ) ).client
+
+        with self.assertRaisesRegex( SharedCacheError, "unknown command" ):
+            client.execute( "UNKNOWN" )
+
+        self.assertEqual( "PONG", client.execute( "PING" ) )
+        self.assertEqual( 1, client.connections )
+        client.close()
+
+    def test_unreachable_server_raises(self):
+        client = RespClient( port=1 )
+
+        with self.assertRaisesRegex( SharedCacheError, "Could not reach" ):
+            client.execute( "PING" )
+
+    def test_unknown_scheme(self):
+        with self.assertRaisesRegex( ValueError, "Unknown shared cache" ):
+            create_backend( "memcached://localhost" )
+
+
+class SharedCacheTestsMixin(object):
+    """ The same tests for each backend, where two `SharedCache` stand for two worker processes. """
+
+    def create_backend(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        super().setUp()
+        self.clock = FakeClock()
+        self.first = SharedCache( self.create_backend(), clock=self.clock )
+        self.second = SharedCache( self.create_backend(), clock=self.clock )
+
+    def tearDown(self):
+        self.first.clear()
+        self.first.close()
+        self.second.close()
+        super().tearDown()
+
+    def test_values_are_shared_with_their_age(self):
+        self.assertIsNone( self.second.get( "key" ) )
+        self.first.set( "key", b'{"results": 1}', 60 )
+        self.clock.now += 10
+
+        self.assertIn( "key", self.second )
+        self.assertEqual( ( b'{"results": 1}', 10 ), self.second.get( "key" ) )
+        self.assertEqual( { "hits": 1, "misses": 1, "errors": 0 },
+                { key: value for key, value in self.second.stats().items() if key in ( "hits", "misses", "errors" ) } )
+
+    def test_contains_does_not_read_the_value(self):
+        self.first.set( "key", b"value", 1.5 )
+
+        with unittest.mock.patch.object( self.second.backend, "get", side_effect=AssertionError ):
+            self.assertIn( "key", self.second )
+            self.assertNotIn( "other", self.second )
+
+            self.clock.now += 2
+            self.assertNotIn( "key", self.second )
+
+    def test_zero_ttl_deletes(self):
+        self.first.set( "key", b"value", 60 )
+        self.second.set( "key", b"value", 0 )
+        self.assertIsNone( self.first.get( "key" ) )
+
+    def test_claims_are_exclusive_until_they_expire(self):
+        self.assertTrue( self.first.claim( "key", 1.5 ) )
+        self.assertFalse( self.second.claim( "key", 1.5 ) )
+        self.assertFalse( self.first.claim( "key", 1.5 ) )
+
+        self.clock.now += 2
+        self.assertTrue( self.second.claim( "key", 1.5 ) )
+
+    def test_clear_only_removes_its_prefix(self):
+        other = SharedCache( self.create_backend(), prefix="other:", clock=self.clock )
+        self.first.set( "key", b"value", 60 )
+        other.set( "key", b"other", 60 )
+
+        self.second.clear()
+        self.assertIsNone( self.first.get( "key" ) )
+        self.assertEqual( b"other", other.get( "key" )[0] )
+        other.clear()
+        other.close()
+
+
+class RespSharedCacheUnitTests(SharedCacheTestsMixin, TimeSpentTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.fakeredis = FakeRedis().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fakeredis.stop()
+
+    def setUp(self):
+        super().setUp()
+        # The server expires the keys by its own clock
+        self.fakeredis.clock = self.clock
+
+    def create_backend(self):
+        return create_backend( self.fakeredis.url )
+
+    def test_values_expire_after_their_ttl(self):
+        self.first.set( "key", b"value", 1.5 )
+        self.assertEqual( 1500, self.first.backend.client.execute( "PTTL", "githubresearcher:key" ) )
+
+        self.clock.now += 2
+        self.assertIsNone( self.second.get( "key" ) )
+
+    def test_unreachable_server_is_a_miss(self):
+        cache = SharedCache( RespBackend( RespClient( port=1 ) ) )
+        cache.set( "key", b"value", 60 )
+
+        self.assertIsNone( cache.get( "key" ) )
+        self.assertNotIn( "key", cache )
+        self.assertTrue( cache.claim( "key", 60 ) )
+        self.assertEqual( 4, cache.stats()["errors"] )
+        self.assertRegex( cache.stats()["lastError"], "Could not reach" )
+
+
+class SqliteSharedCacheUnitTests(SharedCacheTestsMixin, TimeSpentTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        self.directory.cleanup()
+
+    def create_backend(self):
+        return SqliteBackend( f"{self.directory.name}/sharedcache.db", clock=self.clock, purgeinterval=2 )
+
+    def test_values_expire_after_their_ttl(self):
+        self.first.set( "key", b"value", 1.5 )
+        self.clock.now += 2
+        self.assertIsNone( self.second.get( "key" ) )
+
+        # The second write purges the expired values
+        self.first.set( "other", b"value", 60 )
+        self.assertEqual( 1, self.first.stats()["entries"] )
+
+
+class SharedBudgetsUnitTests(TimeSpentTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.fakeredis = FakeRedis().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fakeredis.stop()
+
+    def setUp(self):
+        super().setUp()
+        self.clock = FakeClock()
+        self.fakeredis.clock = self.clock
+        self.first = self.create_pool()
+        self.second = self.create_pool()
+
+    def tearDown(self):
+        self.first.sharedbudgets.sharedcache.clear()
+        self.first.sharedbudgets.sharedcache.close()
+        self.second.sharedbudgets.sharedcache.close()
+        super().tearDown()
+
+    def create_pool(self):
+        pool = TokenPool( [ "token1", "token2" ], clock=self.clock )
+        pool.share( SharedBudgets( SharedCache( create_backend( self.fakeredis.url ), clock=self.clock ), clock=self.clock ) )
+        return pool
+
+    def test_budget_updates_are_shared(self):
+        self.first.tokens[0].budget.update( ratelimit( 1234 ) )
+        self.second.choose()
+
+        self.assertEqual( 1234, self.second.tokens[0].budget.remaining_budget() )
+        self.assertEqual( { "interval": 1.0, "pushed": 0, "pulled": 1 }, self.second.stats()["shared"] )
+        self.assertEqual( 1, self.first.stats()["shared"]["pushed"] )
+
+    def test_tokens_are_not_stored(self):
+        self.first.tokens[0].budget.update( ratelimit( 1234 ) )
+        keys = b"".join( self.fakeredis.databases[0] )
+
+        self.assertNotIn( b"token1", keys )
+        self.assertIn( b"githubresearcher:ratelimit:", keys )
+
+    def test_exhausted_tokens_are_shared(self):
+        for token in self.first.tokens:
+            token.budget.exhaust( 300 )
+
+        with self.assertRaises( RateLimitExceeded ):
+            self.second.choose()
+
+    def test_budgets_are_read_once_by_interval(self):
+        self.second.choose()
+        self.first.tokens[0].budget.update( ratelimit( 1234 ) )
+        self.second.choose()
+        self.assertIsNone( self.second.tokens[0].budget.remaining_budget() )
+
+        self.clock.now += 1
+        self.second.choose()
+        self.assertEqual( 1234, self.second.tokens[0].budget.remaining_budget() )
+
+    def test_older_budgets_are_ignored(self):
+        self.first.tokens[0].budget.update( ratelimit( 1234 ) )
+        self.clock.now += 1
+        self.second.tokens[0].budget.update( ratelimit( 1000 ) )
+        self.first.tokens[0].budget.listener = None
+
+        self.assertFalse( self.second.tokens[0].budget.merge( self.first.tokens[0].budget.snapshot() ) )
+        self.assertTrue( self.first.tokens[0].budget.merge( self.second.tokens[0].budget.snapshot() ) )
+        self.assertEqual( 1000, self.first.tokens[0].budget.remaining_budget() )
+
+
+class SharedCacheEndpointTests(TimeSpentTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.fakeredis = FakeRedis().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fakeredis.stop()
+
+    def test_results_are_shared_by_the_workers(self):
+        graphqlresults = { "data": {
+            "search": { "repositoryCount": 1, "pageInfo": { "endCursor": "Y3", "hasNextPage": False },
+                    "nodes": [ { "nameWithOwner": "a/b", "description": "", "stargazers": { "totalCount": 1 } } ] },
+            "rateLimit": ratelimit( 4999, "2020-01-01T00:00:00Z" ),
+            "viewer": { "login": "user" },
+        } }
+
+        # Each worker has its own connections to the shared cache
+        firstworker = SharedCache( create_backend( self.fakeredis.url ) )
+        secondworker = SharedCache( create_backend( self.fakeredis.url ) )
+        client = run.APP.test_client()
+
+        with unittest.mock.patch.object( run, "run_graphql_query", return_value=graphqlresults ) as run_graphql_query:
+            with unittest.mock.patch.object( run, "RESPONSE_CACHE", firstworker ):
+                first = client.post( "/search_github", json={ "searchQuery": "shared" } )
+
+            with unittest.mock.patch.object( run, "RESPONSE_CACHE", secondworker ):
+                second = client.post( "/search_github", json={ "searchQuery": "shared" } )
+
+        firstworker.clear()
+        firstworker.close()
+        secondworker.close()
+
+        self.assertEqual( 200, second.status_code )
+        self.assertEqual( first.json["repositories"], second.json["repositories"] )
+        self.assertEqual( 1, run_graphql_query.call_count )
+
+    def test_stale_results_are_refreshed_by_a_single_worker(self):
+        clock = FakeClock()
+        self.fakeredis.clock = clock
+        sharedcache = SharedCache( create_backend( self.fakeredis.url ), clock=clock )
+        revalidators = [ Revalidator( TokenPool( [ "token" ] ), claim=run.claim_revalidation ) for worker in range( 2 ) ]
+        client = run.APP.test_client()
+        refreshing = threading.Event()
+
+        def blocked_search_github(*args, **kwargs):
+            if run_graphql_query.call_count > 1:
+                refreshing.wait( 5 )
+            return graphql_search_github( *args, **kwargs )
+
+        with unittest.mock.patch.object( run, "RESPONSE_CACHE", sharedcache ), \
+                unittest.mock.patch.object( run, "run_graphql_query", side_effect=blocked_search_github ) as run_graphql_query:
+            client.post( "/search_github", json={ "searchQuery": "stale" } )
+            clock.now += 70
+
+            # Each worker serves the stale results, but only the first one claiming them refreshes them
+            for revalidator in revalidators:
+                with unittest.mock.patch.object( run, "REVALIDATOR", revalidator ):
+                    self.assertEqual( "70", client.post( "/search_github", json={ "searchQuery": "stale" } ).headers["Age"] )
+
+            refreshing.set()
+            wait_until( lambda: all( revalidator.stats()["pending"] == 0 for revalidator in revalidators ) )
+
+        sharedcache.clear()
+        sharedcache.close()
+
+        for revalidator in revalidators:
+            revalidator.shutdown()
+
+        self.assertEqual( 2, run_graphql_query.call_count )
+        self.assertEqual( [ 1, 0 ], [ revalidator.stats()["scheduled"] for revalidator in revalidators ] )
+        self.assertEqual( [ 0, 1 ], [ revalidator.stats()["claimed"] for revalidator in revalidators ] )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+
+# https://github.com/evandrocoan/debugtools/blob/079eee5f9b028c4cd17dee0da6a803adcf7d061d/tests/testing/main_unit_tests.py#L69-L75
+def assert_path(*args):
+    module = os.path.realpath( os.path.join( *args ) )
+    if module not in sys.path:
+        sys.path.append( module )
+
+this_direcotory = os.path.dirname( os.path.realpath( __file__ ) )
+assert_path( os.path.dirname( this_direcotory ) )
+assert_path( os.path.dirname( this_direcotory ), "tests" )
+
+import time
+import asyncio
+import threading
+import unittest
+
+from testutils import TimeSpentTestCase
+from singleflight import SingleFlight
+from singleflight import AsyncSingleFlight
+
+
+def main():
+    unittest.main()
+
+
+class SingleFlightUnitTests(TimeSpentTestCase):
+
+    def run_concurrently(self, singleflight, function, threadscount=8):
+        results = []
+        errors = []
+        barrier = threading.Barrier( threadscount )
+
+        def call():
+            barrier.wait()
+            try:
+                results.append( singleflight.do( "key", function ) )
+            except Exception as error:
+                errors.append( error )
+
+        threads = [ threading.Thread( target=call ) for index in range( threadscount ) ]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        return results, errors
+
+    def test_concurrent_calls_are_collapsed(self):
+        calls = []
+        singleflight = SingleFlight()
+
+        def slow_function():
+            calls.append( 1 )
+            time.sleep( 0.2 )
+            return "result"
+
+        results, errors = self.run_concurrently( singleflight, slow_function )
+
+        self.assertEqual( [], errors )
+        self.assertEqual( [ "result" ] * 8, results )
+        self.assertEqual( 1, len( calls ) )
+
+        stats = singleflight.stats()
+        self.assertEqual( 0, stats["inFlight"] )
+        self.assertEqual( 1, stats["executed"] )
+        self.assertEqual( 7, stats["collapsed"] )
+
+    def test_exceptions_are_shared_with_all_callers(self):
+        singleflight = SingleFlight()
+
+        def failing_function():
+            time.sleep( 0.2 )
+            raise ValueError( "upstream failure" )
+
+        results, errors = self.run_concurrently( singleflight, failing_function )
+
+        self.assertEqual( [], results )
+        self.assertEqual( 8, len( errors ) )
+        self.assertEqual( 1, singleflight.stats()["executed"] )
+
+    def test_sequential_calls_are_not_collapsed(self):
+        singleflight = SingleFlight()
+
+        self.assertEqual( 1, singleflight.do( "key", lambda: 1 ) )
+        self.assertEqual( 2, singleflight.do( "key", lambda: 2 ) )
+        self.assertEqual( 0, singleflight.stats()["collapsed"] )
+
+
+class AsyncSingleFlightUnitTests(TimeSpentTestCase):
+
+    def test_cancelled_leader_does_not_cancel_the_waiters(self):
+        singleflight = AsyncSingleFlight()
+        calls = []
+
+        async def slow_function():
+            calls.append( 1 )
+            await asyncio.sleep( 0.1 )
+            return "result"
+
+        async def call_all():
+            leader = asyncio.ensure_future( singleflight.do( "key", slow_function ) )
+            await asyncio.sleep( 0 )
+            waiters = [ asyncio.ensure_future( singleflight.do( "key", slow_function ) ) for index in range( 3 ) ]
+            await asyncio.sleep( 0 )
+
+            leader.cancel()
+            return leader, await asyncio.gather( *waiters )
+
+        leader, results = asyncio.run( call_all() )
+
+        self.assertTrue( leader.cancelled() )
+        self.assertEqual( [ "result" ] * 3, results )
+        self.assertEqual( 1, len( calls ) )
+        self.assertEqual( { "inFlight": 0, "executed": 1, "collapsed": 3 }, singleflight.stats() )
+
+    def test_exceptions_are_shared_with_all_callers(self):
+        singleflight = AsyncSingleFlight()
+
+        async def failing_function():
+            await asyncio.sleep( 0.01 )
+            raise ValueError( "upstream failure" )
+
+        async def call_all():
+            return await asyncio.gather( *[ singleflight.do( "key", failing_function ) for index in range( 4 ) ], return_exceptions=True )
+
+        errors = asyncio.run( call_all() )
+
+        self.assertEqual( [ ValueError ] * 4, [ type( error ) for error in errors ] )
+        self.assertEqual( 1, singleflight.stats()["executed"] )
+
+
+if __name__ == "__main__":
+    main()
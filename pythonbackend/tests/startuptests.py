@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+
+# https://github.com/evandrocoan/debugtools/blob/079eee5f9b028c4cd17dee0da6a803adcf7d061d/tests/testing/main_unit_tests.py#L69-L75
+def assert_path(*args):
+    module = os.path.realpath( os.path.join( *args ) )
+    if module not in sys.path:
+        sys.path.append( module )
+
+this_direcotory = os.path.dirname( os.path.realpath( __file__ ) )
+assert_path( os.path.dirname( this_direcotory ) )
+assert_path( os.path.dirname( this_direcotory ), "tests" )
+
+
+import asyncio
+import threading
+import unittest
+import unittest.mock
+
+import httpx
+
+from testutils import TimeSpentTestCase
+from testutils import wait_until
+from startup import LazyLogger
+from startup import Readiness
+
+from endpointtests import graphql_ratelimit
+
+import run
+import asyncrun
+
+
+def main():
+    unittest.main()
+
+
+class LazyLoggerTests(TimeSpentTestCase):
+
+    def test_logger_is_created_on_first_use(self):
+        log = LazyLogger( 1, "startuptests" )
+        self.assertIsNone( log.logger )
+
+        log( 1, "first message" )
+        self.assertIsNotNone( log.logger )
+        self.assertIs( log.logger, log.error.__self__ )
+
+
+class ReadinessTests(TimeSpentTestCase):
+
+    def test_failed_checks_are_retried(self):
+        readiness = Readiness( retrydelay=0.01 )
+        attempts = []
+
+        def flaky_check():
+            attempts.append( 1 )
+
+            if len( attempts ) < 3:
+                raise ConnectionError( "Github is down" )
+
+        readiness.start( "githubProbe", flaky_check )
+        readiness.start( "githubProbe", flaky_check )
+        wait_until( readiness.is_ready )
+
+        stats = readiness.stats()
+        self.assertEqual( 3, len( attempts ) )
+        self.assertEqual( 3, stats["checks"]["githubProbe"]["attempts"] )
+        self.assertIsNone( stats["checks"]["githubProbe"]["error"] )
+
+    def test_not_ready_while_a_check_runs(self):
+        readiness = Readiness()
+        finish = threading.Event()
+
+        readiness.start( "searchIndex", finish.wait )
+        self.assertFalse( readiness.is_ready() )
+
+        finish.set()
+        wait_until( readiness.is_ready )
+
+
+class HealthEndpointsTests(TimeSpentTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = run.APP.test_client()
+
+    def test_health_does_not_wait_for_the_startup(self):
+        readiness = Readiness()
+        finish = threading.Event()
+        readiness.start( "githubProbe", finish.wait )
+
+        with unittest.mock.patch.object( run, "READINESS", readiness ):
+            health = self.client.get( "/health" )
+            notready = self.client.get( "/ready" )
+
+            finish.set()
+            wait_until( readiness.is_ready )
+            ready = self.client.get( "/ready" )
+
+        self.assertEqual( 200, health.status_code )
+        self.assertEqual( 503, notready.status_code )
+        self.assertFalse( notready.json["checks"]["githubProbe"]["ready"] )
+        self.assertEqual( 200, ready.status_code )
+        self.assertEqual( "closed", ready.json["circuitBreaker"] )
+
+    def test_startup_probe_retries_github(self):
+        readiness = Readiness( retrydelay=0.01 )
+        responses = [ ConnectionError( "Github is down" ), { "data": graphql_ratelimit() } ]
+
+        with unittest.mock.patch.object( run, "READINESS", readiness ), \
+                unittest.mock.patch.object( run, "run_graphql_query", side_effect=responses ) as upstream, \
+                unittest.mock.patch.object( run.log, "error" ):
+            run.start_startup_probe()
+            wait_until( readiness.is_ready )
+
+        self.assertEqual( 2, upstream.call_count )
+        self.assertEqual( 2, readiness.stats()["checks"]["githubProbe"]["attempts"] )
+
+    def test_asynchronous_health_endpoints(self):
+
+        async def get_all():
+            transport = httpx.ASGITransport( app=asyncrun.ASGI_APP )
+
+            async with httpx.AsyncClient( transport=transport, base_url="http://testserver" ) as client:
+                return await client.get( "/health" ), await client.get( "/ready" )
+
+        with unittest.mock.patch.object( run, "READINESS", Readiness() ):
+            health, ready = asyncio.run( get_all() )
+
+        self.assertEqual( 200, health.status_code )
+        self.assertEqual( 200, ready.status_code )
+        self.assertEqual( {}, ready.json()["checks"] )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@
 
 import re
 import os
+import time
 
 import datetime
 import unittest
@@ -11,6 +12,26 @@ from debug_tools import getLogger
 log = getLogger( os.environ.get( 'REACT_APP_GITHUB_RESEARCHER_DEBUG_LEVEL', 1 ), __name__ )
 
 
+class FakeClock(object):
+    """ A clock only moving when the test changes its `now`, as `clock.now += 10`. """
+
+    def __init__(self, now=1577836800.0):  # 2020-01-01T00:00:00Z
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def wait_until(condition, timeout=5):
+    """ Waits for a background thread, failing the test when `condition()` is still false after `timeout` seconds. """
+    deadline = time.time() + timeout
+
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError( f"Timed out after {timeout} seconds!" )
+        time.sleep( 0.01 )
+
+
 class TimeSpentTestCase(unittest.TestCase):
     """
         https://stackoverflow.com/questions/9502516/how-to-know-time-spent-on-each-test-when-using-unittest
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+
+# https://github.com/evandrocoan/debugtools/blob/079eee5f9b028c4cd17dee0da6a803adcf7d061d/tests/testing/main_unit_tests.py#L69-L75
+def assert_path(*args):
+    module = os.path.realpath( os.path.join( *args ) )
+    if module not in sys.path:
+        sys.path.append( module )
+
+this_direcotory = os.path.dirname( os.path.realpath( __file__ ) )
+assert_path( os.path.dirname( this_direcotory ) )
+assert_path( os.path.dirname( this_direcotory ), "tests" )
+
+import unittest
+
+from testutils import TimeSpentTestCase
+from testutils import FakeClock
+from tokenpool import TokenPool
+from ratelimit import RateLimitExceeded
+
+
+def main():
+    unittest.main()
+
+
+def ratelimit(remaining, resetat="2020-01-01T01:00:00Z"):
+    return { "limit": 5000, "cost": 1, "remaining": remaining, "resetAt": resetat }
+
+
+class TokenPoolUnitTests(TimeSpentTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.clock = FakeClock()
+        self.pool = TokenPool( [ "token1", "token2", "token3" ], clock=self.clock )
+
+    def test_tokens_from_environment(self):
+        self.assertEqual( [ "a", "b" ], [ token.token for token in TokenPool.from_environment( " a, b," ).tokens ] )
+        self.assertEqual( 1, len( TokenPool.from_environment( None ).tokens ) )
+
+    def test_unused_tokens_are_chosen_first(self):
+        self.pool.tokens[0].budget.update( ratelimit( 4000 ) )
+        chosen = { self.pool.choose().token for index in range( 2 ) }
+        self.assertNotIn( "token1", chosen )
+
+    def test_token_with_most_budget_is_chosen(self):
+        for token, remaining in zip( self.pool.tokens, ( 100, 3000, 2000 ) ):
+            token.budget.update( ratelimit( remaining ) )
+
+        self.assertEqual( "token2", self.pool.choose().token )
+        self.assertEqual( 5099, self.pool.remaining_budget() )
+        self.assertEqual( 15000, self.pool.stats()["limit"] )
+
+    def test_exhausted_tokens_are_skipped_until_reset(self):
+        self.pool.tokens[0].budget.update( ratelimit( 10, "2020-01-01T00:10:00Z" ) )
+        self.pool.tokens[1].budget.update( ratelimit( 0, "2020-01-01T00:10:00Z" ) )
+        self.pool.tokens[2].budget.exhaust( 300 )
+
+        self.assertEqual( "token1", self.pool.choose().token )
+        self.assertEqual( 300, self.pool.seconds_to_reset() )
+
+        self.pool.tokens[0].budget.exhaust( 60 )
+        with self.assertRaises( RateLimitExceeded ) as error:
+            self.pool.choose()
+        self.assertEqual( 60, error.exception.retryafter )
+
+        self.clock.now += 600
+        self.assertIsNotNone( self.pool.choose() )
+        self.assertEqual( 15000, self.pool.remaining_budget() )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import time
+import functools
+import itertools
+import threading
+
+from ratelimit import RateLimitBudget
+from ratelimit import RateLimitExceeded
+
+
+class GithubToken(object):
+
+    def __init__(self, token, clock=time.time):
+        self.token = token
+        self.headers = { "Authorization": f"Bearer {token}" }
+        self.budget = RateLimitBudget( clock=clock )
+
+    def __str__(self):
+        return f"...{self.token[-4:]}"
+
+
+class TokenPool(object):
+    """
+        Routes each Github call to the token with the most remaining budget, where the tokens without
+        budget are skipped until their rate limit reset. The tokens never used yet are tried first.
+
+        It has the same `remaining_budget()` and `seconds_to_reset()` as `RateLimitBudget`, so the
+        `UpstreamScheduler` and `Prefetcher` use the budget of all tokens together.
+
+        With `share()`, the budgets are also shared with the other worker processes.
+    """
+
+    def __init__(self, tokens, clock=time.time):
+        self.tokens = [ GithubToken( token, clock=clock ) for token in tokens ]
+        self.lock = threading.Lock()
+        self.rotation = itertools.count()
+        self.sharedbudgets = None
+
+    def share(self, sharedbudgets):
+        """ Publishes each budget change to a `sharedcache.SharedBudgets`, and reads the others before choosing. """
+        self.sharedbudgets = sharedbudgets
+
+        for token in self.tokens:
+            token.budget.listener = functools.partial( sharedbudgets.push, token )
+
+    @classmethod
+    def from_environment(cls, tokens):
+        """ Several tokens are given separated by commas. """
+        return cls( [ token.strip() for token in ( tokens or "" ).split( "," ) if token.strip() ] or [ "" ] )
+
+    def choose(self):
+        """ Returns the `GithubToken` to use on the next call, or raises `RateLimitExceeded`. """
+        if self.sharedbudgets is not None:
+            self.sharedbudgets.pull( self.tokens )
+
+        with self.lock:
+            offset = next( self.rotation ) % len( self.tokens )
+
+        # Rotate the tokens, so the tokens with the same budget take turns
+        candidates = self.tokens[offset:] + self.tokens[:offset]
+        remainings = [ ( token.budget.remaining_budget(), token ) for token in candidates ]
+        remainings = [ ( float( "inf" ) if remaining is None else remaining, token )
+                for remaining, token in remainings if remaining is None or remaining > 0 ]
+
+        if not remainings:
+            raise RateLimitExceeded( self.seconds_to_reset() )
+
+        remaining, token = max( remainings, key=lambda item: item[0] )
+        token.budget.spend()
+        return token
+
+    def remaining_budget(self):
+        """ Returns None while no token was used yet. """
+        remainings = [ token.budget.remaining_budget() for token in self.tokens ]
+        known = [ remaining for remaining in remainings if remaining is not None ]
+
+        if not known:
+            return None
+
+        # The tokens not used yet are assumed to have the same budget as the largest known one
+        return sum( known ) + ( len( remainings ) - len( known ) ) * max( known )
+
+    def seconds_to_reset(self):
+        """
+            How many seconds until the first token with a known budget is reset, refilling the pool,
+            so the `UpstreamScheduler` also waits for it while the pool is below a priority reserve.
+        """
+        resets = [ token.budget.seconds_to_reset() for token in self.tokens if token.budget.remaining_budget() is not None ]
+        return min( resets ) if resets else 0
+
+    def stats(self):
+        tokens = []
+
+        for token in self.tokens:
+            stats = token.budget.stats()
+            stats["token"] = str( token )
+            tokens.append( stats )
+
+        return {
+            "limit": sum( token["limit"] or 0 for token in tokens ),
+            "remaining": self.remaining_budget(),
+            "tokens": tokens,
+            "shared": self.sharedbudgets.stats() if self.sharedbudgets else None,
+        }
@@ -20,16 +20,25 @@ fi
 
 : ${REACT_APP_GITHUB_RESEARCHER_TOKEN=""}; export REACT_APP_GITHUB_RESEARCHER_TOKEN;
 : ${REACT_APP_GITHUB_RESEARCHER_BACKEND_PORT="9000"}; export REACT_APP_GITHUB_RESEARCHER_BACKEND_PORT;
+: ${GITHUB_RESEARCHER_SERVER="development"}; export GITHUB_RESEARCHER_SERVER;
+
+# The production server master process does not import `run.py`, which each forked worker imports
+if [[ "${GITHUB_RESEARCHER_SERVER}" == "production" ]];
+then
+    GITHUB_RESEARCHER_BACKEND_SCRIPT="productionserver.py"
+else
+    GITHUB_RESEARCHER_BACKEND_SCRIPT="run.py"
+fi
 
 
 # https://stackoverflow.com/questions/23513045/how-to-check-if-a-process-is-running-inside-docker-container
 if [[ -f /.dockerenv ]];
 then
     "${GITHUB_RESEARCHER_PYTHON_PATH}" \
-        "${SCRIPT_FOLDER_PATH}/pythonbackend/run.py"
+        "${SCRIPT_FOLDER_PATH}/pythonbackend/${GITHUB_RESEARCHER_BACKEND_SCRIPT}"
 
 else
     "${GITHUB_RESEARCHER_PYTHON_PATH}" \
-        "${SCRIPT_FOLDER_PATH}/pythonbackend/run.py" \
+        "${SCRIPT_FOLDER_PATH}/pythonbackend/${GITHUB_RESEARCHER_BACKEND_SCRIPT}" \
         # >> "${SCRIPT_FOLDER_PATH}/console_backend.log" 2>&1
 fi